@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Packet-in microbenchmark for simple_controller.py
+
+Feeds synthetic OpenFlow 1.3 packet-ins straight into SimpleSwitch13's
+handler (no switch, no network) and reports packet-ins handled per second
+for the default and the fast learning path.
+
+Usage:
+    python3 bench_packet_in.py [packet_ins] [hosts]
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ryu.lib.packet import arp, ethernet, packet
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+
+from simple_controller import (SimpleSwitch13, encode_arp_reply,
+                               encode_learned_flow, encode_packet_out)
+
+
+class FakeDatapath(object):
+    """Just enough of ryu's Datapath for the handlers to serialize into."""
+
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self, dpid):
+        self.id = dpid
+        self.xid = 0
+        self.sent_bytes = 0
+        self.writes = 0
+        self.sent_types = []
+
+    def set_xid(self, msg):
+        self.xid = (self.xid + 1) & self.ofproto.MAX_XID
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send(self, buf, close_socket=False):
+        self.sent_bytes += len(buf)
+        self.writes += 1
+        # A single write may carry several messages (FlowMod + PacketOut)
+        offset = 0
+        while offset < len(buf):
+            self.sent_types.append(buf[offset + 1])
+            offset += struct.unpack_from("!H", buf, offset + 2)[0]
+        return True
+
+    def send_msg(self, msg, close_socket=False):
+        if msg.xid is None:
+            self.set_xid(msg)
+        msg.serialize()
+        return self.send(msg.buf)
+
+
+class FakeEvent(object):
+    def __init__(self, msg):
+        self.msg = msg
+
+
+def make_frame(src, dst):
+    # Ethernet header + a minimal IPv4-sized payload
+    return struct.pack("!6s6sH", dst, src, 0x0800) + b"\x00" * 46
+
+
+def make_events(datapaths, count, hosts):
+    macs = [struct.pack("!HI", 0x0200, i + 1) for i in range(hosts)]
+    host_ports = {mac: (i % 24) + 1 for i, mac in enumerate(macs)}
+    rng = random.Random(42)
+    events = []
+    for _ in range(count):
+        datapath = rng.choice(datapaths)
+        src, dst = rng.sample(macs, 2)
+        msg = ofproto_v1_3_parser.OFPPacketIn(
+            datapath,
+            buffer_id=ofproto_v1_3.OFP_NO_BUFFER,
+            total_len=60,
+            reason=ofproto_v1_3.OFPR_NO_MATCH,
+            table_id=0,
+            match=ofproto_v1_3_parser.OFPMatch(in_port=host_ports[src]),
+            data=make_frame(src, dst),
+        )
+        msg.msg_len = msg.total_len
+        events.append(FakeEvent(msg))
+    return events
+
+
+def check_encoders():
+    """The hand-packed fast path messages must match ryu's serializer."""
+    ofp = ofproto_v1_3
+    parser = ofproto_v1_3_parser
+    datapath = FakeDatapath(1)
+    src = b"\x02\x00\x00\x00\x00\x01"
+    dst = b"\x02\x00\x00\x00\x00\x02"
+    actions = [parser.OFPActionOutput(7)]
+
+    flow = parser.OFPFlowMod(
+        datapath=datapath, priority=1, idle_timeout=60, buffer_id=5,
+        match=parser.OFPMatch(in_port=3, eth_dst="02:00:00:00:00:02",
+                              eth_src="02:00:00:00:00:01"),
+        instructions=[parser.OFPInstructionActions(
+            ofp.OFPIT_APPLY_ACTIONS, actions)])
+    flow.set_xid(11)
+    flow.serialize()
+    assert bytes(flow.buf) == encode_learned_flow(11, 3, src, dst, 7, 1, 60, 5)
+
+    data = make_frame(src, dst)
+    out = parser.OFPPacketOut(datapath=datapath, buffer_id=ofp.OFP_NO_BUFFER,
+                              in_port=3, actions=actions, data=data)
+    out.set_xid(12)
+    out.serialize()
+    assert bytes(out.buf) == encode_packet_out(12, ofp.OFP_NO_BUFFER, 3, 7,
+                                               data)
+
+    reply = packet.Packet()
+    reply.add_protocol(ethernet.ethernet("02:00:00:00:00:01",
+                                         "02:00:00:00:00:02", 0x0806))
+    reply.add_protocol(arp.arp(opcode=arp.ARP_REPLY,
+                               src_mac="02:00:00:00:00:02", src_ip="10.0.0.2",
+                               dst_mac="02:00:00:00:00:01", dst_ip="10.0.0.1"))
+    reply.serialize()
+    frame = encode_arp_reply(src, b"\x0a\x00\x00\x01", dst,
+                             b"\x0a\x00\x00\x02")
+    # ryu pads to the 60 byte minimum, the switch does that on the wire
+    assert bytes(reply.data)[:len(frame)] == frame
+
+
+def make_arp_request(datapath, in_port, sender_mac, sender_ip, target_ip):
+    frame = encode_arp_reply(b"\x00" * 6, target_ip, sender_mac, sender_ip)
+    # Same layout as a reply: broadcast it and flip the opcode to a request
+    frame = (b"\xff" * 6 + frame[6:20] + struct.pack("!H", 1) + frame[22:])
+    msg = ofproto_v1_3_parser.OFPPacketIn(
+        datapath,
+        buffer_id=ofproto_v1_3.OFP_NO_BUFFER,
+        total_len=len(frame),
+        reason=ofproto_v1_3.OFPR_ACTION,
+        table_id=0,
+        match=ofproto_v1_3_parser.OFPMatch(in_port=in_port),
+        data=frame,
+    )
+    msg.msg_len = msg.total_len
+    return FakeEvent(msg)
+
+
+def check_compact_arp_punt():
+    """Punted ARP requests the responder misses must still be forwarded."""
+    ofp = ofproto_v1_3
+    app = SimpleSwitch13()
+    app.compact = True
+    app.arp_proxy = True
+    app.arp_punt = True
+    datapath = FakeDatapath(1)
+    mac1 = b"\x02\x00\x00\x00\x00\x01"
+    mac2 = b"\x02\x00\x00\x00\x00\x02"
+    ip1 = b"\x0a\x00\x00\x01"
+    ip2 = b"\x0a\x00\x00\x02"
+
+    # Cache miss: learn the sender (two FlowMods), then flood the request
+    app.packet_in_handler(make_arp_request(datapath, 1, mac1, ip1, ip2))
+    assert datapath.sent_types == [ofp.OFPT_FLOW_MOD, ofp.OFPT_FLOW_MOD,
+                                   ofp.OFPT_PACKET_OUT], datapath.sent_types
+
+    # Cache hit: answered by the controller, and the sender is still learned
+    datapath.sent_types = []
+    app.packet_in_handler(make_arp_request(datapath, 2, mac2, ip2, ip1))
+    assert datapath.sent_types == [ofp.OFPT_PACKET_OUT, ofp.OFPT_FLOW_MOD,
+                                   ofp.OFPT_FLOW_MOD], datapath.sent_types
+    assert app.learned[1][mac2][1] == 2
+
+
+def check_compact_arp_flooded():
+    """Without the punt flow the switch floods requests: learn, never answer."""
+    ofp = ofproto_v1_3
+    app = SimpleSwitch13()
+    app.compact = True
+    app.arp_proxy = True
+    app.arp_punt = False
+    datapath = FakeDatapath(1)
+    mac1 = b"\x02\x00\x00\x00\x00\x01"
+    mac2 = b"\x02\x00\x00\x00\x00\x02"
+    ip1 = b"\x0a\x00\x00\x01"
+    ip2 = b"\x0a\x00\x00\x02"
+
+    app.packet_in_handler(make_arp_request(datapath, 1, mac1, ip1, ip2))
+    datapath.sent_types = []
+    # ip1 is cached now, but the target hears this request and replies itself
+    app.packet_in_handler(make_arp_request(datapath, 2, mac2, ip2, ip1))
+    assert datapath.sent_types == [ofp.OFPT_FLOW_MOD, ofp.OFPT_FLOW_MOD], \
+        datapath.sent_types
+    assert app.learned[1][mac2][1] == 2 and app.arp_answered == 0
+
+
+def check_arp_answer_learns():
+    """An answered request still teaches the learning switch its sender."""
+    for fast_path in (False, True):
+        app = SimpleSwitch13()
+        app.fast_path = fast_path
+        app.arp_proxy = True
+        datapath = FakeDatapath(1)
+        mac1 = b"\x02\x00\x00\x00\x00\x01"
+        mac2 = b"\x02\x00\x00\x00\x00\x02"
+        app.packet_in_handler(make_arp_request(datapath, 1, mac1,
+                                               b"\x0a\x00\x00\x01",
+                                               b"\x0a\x00\x00\x02"))
+        app.packet_in_handler(make_arp_request(datapath, 2, mac2,
+                                               b"\x0a\x00\x00\x02",
+                                               b"\x0a\x00\x00\x01"))
+        assert app.arp_answered == 1
+        if fast_path:
+            assert app.mac_tables[1][mac2][0] == 2
+        else:
+            assert app.mac_to_port[1]["02:00:00:00:00:02"] == 2
+
+
+def run(fast_path, count, hosts, switches=8):
+    app = SimpleSwitch13()
+    app.fast_path = fast_path
+    datapaths = [FakeDatapath(dpid) for dpid in range(1, switches + 1)]
+    events = make_events(datapaths, count, hosts)
+
+    start = time.perf_counter()
+    for ev in events:
+        app.packet_in_handler(ev)
+    elapsed = time.perf_counter() - start
+
+    writes = sum(dp.writes for dp in datapaths)
+    return count / elapsed, writes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    hosts = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    check_encoders()
+    check_compact_arp_punt()
+    check_compact_arp_flooded()
+    check_arp_answer_learns()
+    print("Packet-in benchmark: %d packet-ins, %d hosts" % (count, hosts))
+    for label, fast_path in (("default", False), ("fast path", True)):
+        rate, writes = run(fast_path, count, hosts)
+        print("  %-10s %10.0f packet-ins/s  (%d socket writes)"
+              % (label, rate, writes))
+
+
+if __name__ == "__main__":
+    main()
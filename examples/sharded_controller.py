@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Sharded launcher for simple_controller.py
+
+Runs one ryu-manager worker per shard (default: one per CPU core), each
+listening on its own OpenFlow port, and points every OVS bridge at the worker
+that owns it by DPID hash. Workers replicate the ARP cache between each other
+over Unix datagram sockets (see simple_controller.py).
+
+Usage:
+1. Start workers: python3 sharded_controller.py --workers 4
+   (extra ryu-manager options go after "--", SIMPLE_SWITCH_* settings are
+   passed through the environment)
+2. Start mininet with any controller, e.g. the pa2 multi-controller setup
+3. Assign switches: sudo python3 sharded_controller.py assign --workers 4
+
+Topology scripts can also pick the controller themselves:
+    port = controller_port(int(switch.dpid, 16), workers)
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from simple_controller import SHARD_DIR, shard_for_dpid
+
+
+BASE_PORT = 6653
+CONTROLLER_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "simple_controller.py")
+
+
+def controller_port(dpid, workers, base_port=BASE_PORT):
+    """OpenFlow port of the worker that owns this datapath."""
+    return base_port + shard_for_dpid(dpid, workers)
+
+
+def start_workers(workers, base_port, ryu_args):
+    procs = []
+    for shard in range(workers):
+        env = dict(os.environ,
+                   SIMPLE_SWITCH_SHARDS=str(workers),
+                   SIMPLE_SWITCH_SHARD=str(shard),
+                   SIMPLE_SWITCH_SHARD_DIR=SHARD_DIR)
+        cmd = ["ryu-manager", "--ofp-tcp-listen-port", str(base_port + shard)]
+        cmd += ryu_args + [CONTROLLER_APP]
+        procs.append(subprocess.Popen(cmd, env=env))
+        print("Shard %d: port %d (pid %d)" % (shard, base_port + shard,
+                                              procs[-1].pid))
+    return procs
+
+
+def run_workers(args):
+    procs = start_workers(args.workers, args.base_port, args.ryu_args)
+
+    def stop(signum, frame):
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # A worker that dies takes its switches with it: stop the rest too
+    while all(proc.poll() is None for proc in procs):
+        time.sleep(0.5)
+    stop(None, None)
+    for proc in procs:
+        proc.wait()
+    return max(proc.returncode or 0 for proc in procs)
+
+
+def assign_bridges(args):
+    """Point every OVS bridge at the worker that owns its DPID."""
+    bridges = subprocess.run(["ovs-vsctl", "list-br"], capture_output=True,
+                             text=True, check=True).stdout.split()
+    if not bridges:
+        print("No OVS bridges found")
+        return 1
+
+    # One ovs-vsctl call for the lookups and one for all the assignments
+    lookup = ["ovs-vsctl"]
+    for bridge in bridges:
+        lookup += ["--", "get", "Bridge", bridge, "datapath_id"]
+    dpids = subprocess.run(lookup, capture_output=True, text=True,
+                           check=True).stdout.split()
+
+    assign = ["ovs-vsctl"]
+    per_shard = [0] * args.workers
+    for bridge, dpid in zip(bridges, dpids):
+        shard = shard_for_dpid(int(dpid.strip('"'), 16), args.workers)
+        per_shard[shard] += 1
+        assign += ["--", "set-controller", bridge,
+                   "tcp:%s:%d" % (args.ip, args.base_port + shard)]
+    subprocess.run(assign, check=True)
+
+    for shard, count in enumerate(per_shard):
+        print("Shard %d (port %d): %d switches"
+              % (shard, args.base_port + shard, count))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("command", nargs="?", default="run",
+                        choices=["run", "assign"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--ip", default="127.0.0.1",
+                        help="controller address used by 'assign'")
+    parser.add_argument("ryu_args", nargs=argparse.REMAINDER,
+                        help="extra ryu-manager arguments after --")
+    args = parser.parse_args()
+    if args.ryu_args and args.ryu_args[0] == "--":
+        args.ryu_args = args.ryu_args[1:]
+
+    if args.command == "assign":
+        return assign_bridges(args)
+    return run_workers(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,16 +10,191 @@ Usage:
 2. Start controller: ryu-manager simple_controller.py
 3. Start mininet: sudo mn --controller remote,ip=127.0.0.1,port=6653
 4. Test: mininet> pingall
+
+Fast learning mode (parses only the Ethernet header, ages MAC entries and
+installs flows with an idle timeout):
+    SIMPLE_SWITCH_FAST_PATH=1 ryu-manager simple_controller.py
+Tunables: SIMPLE_SWITCH_IDLE_TIMEOUT (seconds, default 60) and
+SIMPLE_SWITCH_MAC_AGING (seconds, default 300).
+Benchmark: python3 bench_packet_in.py
+
+Proactive mode (learns where hosts attach, e.g. from their ARP traffic, and
+pushes a shortest-path flow for each host to every switch at once, so the
+first packet towards a known host never reaches the controller again):
+    SIMPLE_SWITCH_PROACTIVE=1 ryu-manager --observe-links simple_controller.py
+Broadcasts and unknown destinations are sent straight out of the host ports
+of every switch instead of OFPP_FLOOD, so they cause one packet-in in total.
+Until link discovery has settled (SIMPLE_SWITCH_TOPOLOGY_SETTLE seconds,
+default 5) the switch keeps learning reactively.
+
+Compact mode (two-table learning: table 0 matches in_port/eth_src of known
+sources, table 1 forwards on eth_dst only, so a switch holds two flows per
+host instead of one per host pair; unknown sources still reach table 1 and
+are copied to the controller for learning, unknown destinations are flooded
+by the switch itself):
+    SIMPLE_SWITCH_COMPACT=1 ryu-manager simple_controller.py
+Every learned host gets its own cookie. Flows use SIMPLE_SWITCH_IDLE_TIMEOUT
+and SIMPLE_SWITCH_HARD_TIMEOUT (seconds, default 0 = none). A switch holds at
+most SIMPLE_SWITCH_FLOW_BUDGET learned flows (default 2000); beyond that the
+least recently used host is evicted, where "used" comes from the packet
+counters of periodic FlowStats requests (SIMPLE_SWITCH_STATS_INTERVAL,
+default 10 seconds), which also report per-table occupancy.
+
+ARP responder (keeps an IP -> MAC cache from the ARP traffic it sees and
+answers requests for cached addresses itself, so they are not flooded):
+    SIMPLE_SWITCH_ARP_PROXY=1 ryu-manager simple_controller.py
+Cache entries expire after SIMPLE_SWITCH_ARP_TIMEOUT seconds (default 300).
+With SIMPLE_SWITCH_ARP_PUNT=1 every switch also gets a flow that sends ARP
+requests (and nothing else) to the controller, so the responder still sees
+them after the learning flows are in place. Requests it cannot answer are
+sent on with a PacketOut, in compact mode as well. Without the punt flow,
+compact mode only learns from ARP: its switches flood requests themselves,
+so an answer from the controller would duplicate the target's own reply.
+
+Sharded mode (one ryu-manager process per core, switches spread over them by
+a hash of their DPID; see sharded_controller.py, which sets these):
+    SIMPLE_SWITCH_SHARDS=4 SIMPLE_SWITCH_SHARD=0 ryu-manager \
+        --ofp-tcp-listen-port 6653 simple_controller.py
+MAC tables are per datapath, so each shard owns its switches' tables
+outright. The ARP cache is network-wide and is replicated between shards
+as datagrams on Unix sockets in SIMPLE_SWITCH_SHARD_DIR.
 """
 
+import logging
+import os
+import socket
+import struct
+import time
+import zlib
+from collections import OrderedDict
+
 from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
+from ryu.controller.handler import DEAD_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
 from ryu.lib.packet import packet
 from ryu.lib.packet import ethernet
 from ryu.lib.packet import ether_types
+from ryu.lib import addrconv
+from ryu.lib import hub
+
+
+FAST_PATH = os.environ.get("SIMPLE_SWITCH_FAST_PATH", "0") != "0"
+FLOW_IDLE_TIMEOUT = int(os.environ.get("SIMPLE_SWITCH_IDLE_TIMEOUT", "60"))
+MAC_AGING_SECONDS = int(os.environ.get("SIMPLE_SWITCH_MAC_AGING", "300"))
+PROACTIVE = os.environ.get("SIMPLE_SWITCH_PROACTIVE", "0") != "0"
+TOPOLOGY_SETTLE = float(os.environ.get("SIMPLE_SWITCH_TOPOLOGY_SETTLE", "5"))
+TOPOLOGY_POLL_INTERVAL = 2
+
+if PROACTIVE:
+    # Pulls in ryu.topology.switches (link discovery needs --observe-links)
+    from ryu.topology import api as topology_api
+
+# Proactive host flows: the top 16 bits tag the flow, the rest is a host id
+PROACTIVE_PRIORITY = 2
+PROACTIVE_COOKIE = 0x5057 << 48
+EXACT_COOKIE_MASK = 0xFFFFFFFFFFFFFFFF
+
+COMPACT = os.environ.get("SIMPLE_SWITCH_COMPACT", "0") != "0"
+FLOW_HARD_TIMEOUT = int(os.environ.get("SIMPLE_SWITCH_HARD_TIMEOUT", "0"))
+FLOW_BUDGET = int(os.environ.get("SIMPLE_SWITCH_FLOW_BUDGET", "2000"))
+STATS_INTERVAL = int(os.environ.get("SIMPLE_SWITCH_STATS_INTERVAL", "10"))
+
+ARP_PROXY = os.environ.get("SIMPLE_SWITCH_ARP_PROXY", "0") != "0"
+ARP_PUNT = os.environ.get("SIMPLE_SWITCH_ARP_PUNT", "0") != "0"
+ARP_CACHE_TIMEOUT = int(os.environ.get("SIMPLE_SWITCH_ARP_TIMEOUT", "300"))
+ARP_PUNT_PRIORITY = 3
+
+SHARDS = int(os.environ.get("SIMPLE_SWITCH_SHARDS", "1"))
+SHARD = int(os.environ.get("SIMPLE_SWITCH_SHARD", "0"))
+SHARD_DIR = os.environ.get("SIMPLE_SWITCH_SHARD_DIR",
+                           "/tmp/simple_switch_shards")
+
+# Compact mode flows: the top 16 bits tag the flow, the rest is an entry id
+COMPACT_COOKIE = 0x434D << 48
+COMPACT_COOKIE_MASK = 0xFFFF << 48
+SOURCE_TABLE = 0
+FORWARD_TABLE = 1
+
+# dst MAC, src MAC, ethertype
+ETH_HEADER = struct.Struct("!6s6sH")
+ETH_TYPE_ARP_BYTES = struct.pack("!H", ether_types.ETH_TYPE_ARP)
+
+# Ethernet/IPv4 ARP body: htype, ptype, hlen, plen, op, sha, spa, tha, tpa
+ARP_BODY = struct.Struct("!HHBBH6s4s6s4s")
+ARP_REQUEST = 1
+ARP_REPLY = 2
+UNSPECIFIED_IP = b"\x00\x00\x00\x00"
+
+# Shard channel datagram: tag, IPv4 address, MAC address
+ARP_SHARE = struct.Struct("!c4s6s")
+
+# Pre-packed OpenFlow 1.3 pieces for the fast path. The messages are byte for
+# byte what ryu's parser produces (bench_packet_in.py checks this), without
+# building OFPMatch objects for every packet-in.
+OFP_HEADER = struct.Struct("!BBHI")
+FLOW_MOD_BODY = struct.Struct("!QQBBHHHIIIH2x")
+LEARNED_MATCH = struct.Struct("!HHIII6sI6s")
+APPLY_OUTPUT = struct.Struct("!HH4xHHIH6x")
+PACKET_OUT_BODY = struct.Struct("!IIH6x")
+OUTPUT_ACTION = struct.Struct("!HHIH6x")
+OXM_IN_PORT = 0x80000004
+OXM_ETH_DST = 0x80000606
+OXM_ETH_SRC = 0x80000806
+FLOW_MOD_LEN = (OFP_HEADER.size + FLOW_MOD_BODY.size + LEARNED_MATCH.size +
+                APPLY_OUTPUT.size)
+PACKET_OUT_PREFIX_LEN = (OFP_HEADER.size + PACKET_OUT_BODY.size +
+                         OUTPUT_ACTION.size)
+
+
+def encode_learned_flow(xid, in_port, src, dst, out_port, priority,
+                        idle_timeout, buffer_id):
+    """FlowMod(ADD) matching in_port/eth_dst/eth_src with one output action."""
+    ofp = ofproto_v1_3
+    return b"".join((
+        OFP_HEADER.pack(ofp.OFP_VERSION, ofp.OFPT_FLOW_MOD, FLOW_MOD_LEN, xid),
+        FLOW_MOD_BODY.pack(0, 0, 0, ofp.OFPFC_ADD, idle_timeout, 0, priority,
+                           buffer_id, 0, 0, 0),
+        LEARNED_MATCH.pack(ofp.OFPMT_OXM, LEARNED_MATCH.size,
+                           OXM_IN_PORT, in_port, OXM_ETH_DST, dst,
+                           OXM_ETH_SRC, src),
+        APPLY_OUTPUT.pack(ofp.OFPIT_APPLY_ACTIONS, APPLY_OUTPUT.size,
+                          ofp.OFPAT_OUTPUT, OUTPUT_ACTION.size, out_port,
+                          ofp.OFPCML_MAX),
+    ))
+
+
+def shard_for_dpid(dpid, shards):
+    """Shard index owning a datapath (stable across processes and runs)."""
+    return zlib.crc32(struct.pack("!Q", dpid)) % shards
+
+
+def shard_socket_path(shard, shard_dir=SHARD_DIR):
+    return os.path.join(shard_dir, "shard-%d.sock" % shard)
+
+
+def encode_arp_reply(requester_mac, requester_ip, target_mac, target_ip):
+    """Ethernet frame answering requester_ip's question about target_ip."""
+    return b"".join((
+        ETH_HEADER.pack(requester_mac, target_mac, ether_types.ETH_TYPE_ARP),
+        ARP_BODY.pack(1, ether_types.ETH_TYPE_IP, 6, 4, ARP_REPLY,
+                      target_mac, target_ip, requester_mac, requester_ip),
+    ))
+
+
+def encode_packet_out(xid, buffer_id, in_port, out_port, data):
+    """PacketOut with a single output action (data may be empty)."""
+    ofp = ofproto_v1_3
+    return b"".join((
+        OFP_HEADER.pack(ofp.OFP_VERSION, ofp.OFPT_PACKET_OUT,
+                        PACKET_OUT_PREFIX_LEN + len(data), xid),
+        PACKET_OUT_BODY.pack(buffer_id, in_port, OUTPUT_ACTION.size),
+        OUTPUT_ACTION.pack(ofp.OFPAT_OUTPUT, OUTPUT_ACTION.size, out_port,
+                           ofp.OFPCML_MAX),
+        data,
+    ))
 
 
 class SimpleSwitch13(app_manager.RyuApp):
@@ -30,6 +205,61 @@ class SimpleSwitch13(app_manager.RyuApp):
         # MAC address table: {dpid: {mac: port}}
         self.mac_to_port = {}
 
+        # Fast path state: {dpid: {raw_mac: [port, last_seen]}}
+        self.fast_path = FAST_PATH
+        self.idle_timeout = FLOW_IDLE_TIMEOUT
+        self.mac_aging = MAC_AGING_SECONDS
+        self.mac_tables = {}
+        self.next_aging = {}
+        self.mac_text = {}
+
+        # Proactive state: hosts are {raw_mac: (dpid, port)} and adjacency is
+        # {dpid: {neighbour_dpid: out_port}} over non-blocked links
+        self.proactive = PROACTIVE
+        self.datapaths = {}
+        self.links = frozenset()
+        self.link_ports = set()
+        self.blocked_ports = set()
+        self.adjacency = {}
+        self.towards = {}
+        self.hosts = {}
+        self.host_cookies = {}
+        self.topology_ready = False
+        self.started = time.monotonic()
+        if self.proactive:
+            if not self.CONF.observe_links:
+                self.logger.warning("Proactive mode without --observe-links: "
+                                    "switches will keep learning reactively")
+            self.threads.append(hub.spawn(self.topology_loop))
+
+        # Compact state: {dpid: OrderedDict(raw_mac: [cookie, port, packets])}
+        # in least to most recently used order
+        self.compact = COMPACT
+        self.hard_timeout = FLOW_HARD_TIMEOUT
+        self.max_learned = max(1, FLOW_BUDGET // 2)
+        self.learned = {}
+        self.learned_cookies = {}
+        self.next_cookie = 0
+        self.flow_stats = {}
+        self.table_occupancy = {}
+        if self.compact:
+            self.threads.append(hub.spawn(self.flow_stats_loop))
+
+        # ARP responder state: {raw_ip: [raw_mac, last_seen, last_shared]}
+        self.arp_proxy = ARP_PROXY
+        self.arp_punt = ARP_PUNT
+        self.arp_timeout = ARP_CACHE_TIMEOUT
+        self.arp_cache = {}
+        self.arp_answered = 0
+
+        self.shards = SHARDS
+        self.shard = SHARD
+        self.shard_socket = None
+        self.shard_sender = None
+        self.shard_peers = []
+        if self.shards > 1:
+            self.open_shard_channel()
+
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
         """Handle switch features and install table-miss flow entry."""
@@ -37,6 +267,21 @@ class SimpleSwitch13(app_manager.RyuApp):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
+        if (self.shards > 1 and
+                shard_for_dpid(datapath.id, self.shards) != self.shard):
+            self.logger.warning("Switch %s belongs to shard %d, not %d",
+                                datapath.id,
+                                shard_for_dpid(datapath.id, self.shards),
+                                self.shard)
+
+        if self.arp_proxy and self.arp_punt:
+            self.install_arp_punt(datapath)
+
+        if self.compact:
+            self.install_compact_pipeline(datapath)
+            self.logger.info("Switch %s connected", datapath.id)
+            return
+
         # Install table-miss flow entry
         match = parser.OFPMatch()
         actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER,
@@ -45,7 +290,8 @@ class SimpleSwitch13(app_manager.RyuApp):
         
         self.logger.info("Switch %s connected", datapath.id)
 
-    def add_flow(self, datapath, priority, match, actions, buffer_id=None):
+    def add_flow(self, datapath, priority, match, actions, buffer_id=None,
+                 idle_timeout=0):
         """Add a flow entry to the switch."""
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
@@ -55,15 +301,73 @@ class SimpleSwitch13(app_manager.RyuApp):
         if buffer_id:
             mod = parser.OFPFlowMod(datapath=datapath, buffer_id=buffer_id,
                                     priority=priority, match=match,
-                                    instructions=inst)
+                                    instructions=inst,
+                                    idle_timeout=idle_timeout)
         else:
             mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
-                                    match=match, instructions=inst)
+                                    match=match, instructions=inst,
+                                    idle_timeout=idle_timeout)
         datapath.send_msg(mod)
 
+    @staticmethod
+    def next_xid(datapath):
+        """Allocate an xid the same way Datapath.set_xid() does."""
+        datapath.xid = (datapath.xid + 1) & datapath.ofproto.MAX_XID
+        return datapath.xid
+
+    @set_ev_cls(ofp_event.EventOFPStateChange,
+                [MAIN_DISPATCHER, DEAD_DISPATCHER])
+    def state_change_handler(self, ev):
+        """Keep track of connected datapaths for proactive installs."""
+        datapath = ev.datapath
+        if ev.state == MAIN_DISPATCHER:
+            self.datapaths[datapath.id] = datapath
+        elif ev.state == DEAD_DISPATCHER and datapath.id is not None:
+            self.datapaths.pop(datapath.id, None)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        """STP blocking/unblocking or link loss changes the usable paths."""
+        if not self.proactive:
+            return
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        key = (msg.datapath.id, msg.desc.port_no)
+        unusable = (msg.reason == ofproto.OFPPR_DELETE or
+                    msg.desc.state & (ofproto.OFPPS_BLOCKED |
+                                      ofproto.OFPPS_LINK_DOWN))
+        if bool(unusable) == (key in self.blocked_ports):
+            return
+        if unusable:
+            self.blocked_ports.add(key)
+        else:
+            self.blocked_ports.discard(key)
+        if key in self.link_ports:
+            self.apply_topology()
+
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
         """Handle packet-in events - core learning switch logic."""
+        if self.arp_proxy and ev.msg.data[12:14] == ETH_TYPE_ARP_BYTES:
+            # The compact table-miss has already flooded what it copies here,
+            # so only punted requests may be answered by the controller
+            punted = not self.compact or self.arp_punt
+            if self.arp_packet_in(ev.msg, answer=punted):
+                self.learn_source(ev.msg)
+                return
+        if self.proactive and self.topology_ready:
+            self.proactive_packet_in(ev.msg)
+            return
+        if self.compact:
+            self.compact_packet_in(ev.msg)
+            if (self.arp_proxy and self.arp_punt and
+                    ev.msg.data[12:14] == ETH_TYPE_ARP_BYTES):
+                self.forward_punted_arp(ev.msg)
+            return
+        if self.fast_path or self.proactive:
+            self.fast_packet_in(ev.msg)
+            return
+
         if ev.msg.msg_len < ev.msg.total_len:
             self.logger.debug("packet truncated: only %s of %s bytes",
                               ev.msg.msg_len, ev.msg.total_len)
@@ -120,4 +424,574 @@ class SimpleSwitch13(app_manager.RyuApp):
         datapath.send_msg(out)
         
         if out_port != ofproto.OFPP_FLOOD:
-            self.logger.info("Flow installed: %s -> %s via port %s", src, dst, out_port)
\ No newline at end of file
+            self.logger.info("Flow installed: %s -> %s via port %s", src, dst, out_port)
+
+    def text_mac(self, raw_mac):
+        """Cached bytes -> "aa:bb:..." conversion for OFPMatch fields."""
+        text = self.mac_text.get(raw_mac)
+        if text is None:
+            text = addrconv.mac.bin_to_text(raw_mac)
+            self.mac_text[raw_mac] = text
+        return text
+
+    def age_mac_table(self, dpid, table, now):
+        """Drop MAC entries not refreshed within the aging time."""
+        self.next_aging[dpid] = now + self.mac_aging / 2.0
+        expired = [mac for mac, entry in table.items()
+                   if now - entry[1] > self.mac_aging]
+        for mac in expired:
+            del table[mac]
+        if expired and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Aged out %d MAC entries on %s",
+                              len(expired), dpid)
+
+    def fast_learn(self, dpid, src, in_port, now):
+        """Age and update the fast path MAC table; return it."""
+        table = self.mac_tables.get(dpid)
+        if table is None:
+            table = self.mac_tables[dpid] = {}
+            self.next_aging[dpid] = now + self.mac_aging / 2.0
+        elif now >= self.next_aging[dpid]:
+            self.age_mac_table(dpid, table, now)
+
+        # Learn source MAC address (multicast sources are never learned)
+        if not src[0] & 1:
+            entry = table.get(src)
+            if entry is not None and entry[0] == in_port:
+                entry[1] = now
+            else:
+                table[src] = [in_port, now]
+        return table
+
+    def fast_packet_in(self, msg):
+        """Learning switch that only looks at the raw Ethernet header."""
+        data = msg.data
+        if len(data) < ETH_HEADER.size:
+            return
+        dst, src, ethertype = ETH_HEADER.unpack_from(data)
+        if ethertype == ether_types.ETH_TYPE_LLDP:
+            return
+
+        datapath = msg.datapath
+        dpid = datapath.id
+        ofproto = datapath.ofproto
+        in_port = msg.match['in_port']
+        now = time.monotonic()
+
+        table = self.fast_learn(dpid, src, in_port, now)
+        entry = table.get(dst)
+        if entry is not None and now - entry[1] <= self.mac_aging:
+            out_port = entry[0]
+        else:
+            out_port = ofproto.OFPP_FLOOD
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("packet in %s %s %s %s", dpid,
+                              self.text_mac(src), self.text_mac(dst), in_port)
+
+        buffer_id = msg.buffer_id
+        if out_port == ofproto.OFPP_FLOOD:
+            payload = data if buffer_id == ofproto.OFP_NO_BUFFER else b""
+            datapath.send(encode_packet_out(self.next_xid(datapath), buffer_id,
+                                            in_port, out_port, payload))
+            return
+
+        if buffer_id != ofproto.OFP_NO_BUFFER:
+            # The switch releases the buffered packet through the new flow
+            datapath.send(encode_learned_flow(
+                self.next_xid(datapath), in_port, src, dst, out_port, 1,
+                self.idle_timeout, buffer_id))
+            return
+
+        # FlowMod and PacketOut go out in a single socket write
+        datapath.send(
+            encode_learned_flow(self.next_xid(datapath), in_port, src, dst,
+                                out_port, 1, self.idle_timeout,
+                                ofproto.OFP_NO_BUFFER) +
+            encode_packet_out(self.next_xid(datapath), ofproto.OFP_NO_BUFFER,
+                              in_port, out_port, data))
+
+    def topology_loop(self):
+        """Poll the discovered links and re-plan host flows when they change."""
+        while True:
+            hub.sleep(TOPOLOGY_POLL_INTERVAL)
+            try:
+                self.refresh_topology()
+            except Exception:
+                self.logger.exception("Topology refresh failed")
+
+    def refresh_topology(self):
+        links = frozenset(
+            (link.src.dpid, link.src.port_no, link.dst.dpid, link.dst.port_no)
+            for link in topology_api.get_link(self))
+        if links != self.links:
+            self.links = links
+            self.apply_topology()
+        elif (not self.topology_ready and
+              time.monotonic() - self.started >= TOPOLOGY_SETTLE):
+            self.topology_ready = True
+            self.logger.info("Topology settled: %d switches, %d links",
+                             len(self.datapaths), len(links) // 2)
+
+    def apply_topology(self):
+        """Rebuild the switch graph and re-push every known host's flows."""
+        adjacency = {}
+        link_ports = set()
+        for src_dpid, src_port, dst_dpid, dst_port in self.links:
+            link_ports.add((src_dpid, src_port))
+            link_ports.add((dst_dpid, dst_port))
+            if ((src_dpid, src_port) in self.blocked_ports or
+                    (dst_dpid, dst_port) in self.blocked_ports):
+                continue
+            neighbours = adjacency.setdefault(src_dpid, {})
+            if neighbours.get(dst_dpid, src_port) >= src_port:
+                neighbours[dst_dpid] = src_port
+
+        # towards[v] lists (u, port on u) for every link u -> v
+        towards = {}
+        for src_dpid, neighbours in adjacency.items():
+            for dst_dpid, port in neighbours.items():
+                towards.setdefault(dst_dpid, []).append((src_dpid, port))
+        for entries in towards.values():
+            entries.sort()
+
+        self.adjacency = adjacency
+        self.towards = towards
+        self.link_ports = link_ports
+
+        # A "host" seen on what turned out to be an inter-switch port
+        for mac, location in list(self.hosts.items()):
+            if location in link_ports:
+                del self.hosts[mac]
+                self.remove_host_flows(mac)
+        for mac in self.hosts:
+            self.install_host_flows(mac)
+
+    def shortest_path_tree(self, root):
+        """{dpid: out_port} for every switch that can reach root (BFS)."""
+        out_ports = {}
+        frontier = [root]
+        seen = {root}
+        while frontier:
+            next_frontier = []
+            for dpid in frontier:
+                for neighbour, port in self.towards.get(dpid, ()):
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        out_ports[neighbour] = port
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return out_ports
+
+    def host_cookie(self, mac):
+        cookie = self.host_cookies.get(mac)
+        if cookie is None:
+            cookie = PROACTIVE_COOKIE | (len(self.host_cookies) + 1)
+            self.host_cookies[mac] = cookie
+        return cookie
+
+    def install_host_flows(self, mac):
+        """Push eth_dst=mac flows along the shortest paths to every switch."""
+        root, host_port = self.hosts[mac]
+        out_ports = self.shortest_path_tree(root)
+        out_ports[root] = host_port
+        cookie = self.host_cookie(mac)
+        text = self.text_mac(mac)
+
+        # BFS order: the switches nearest the host are programmed first
+        installed = 0
+        for dpid, out_port in sorted(out_ports.items(),
+                                     key=lambda item: item[0] != root):
+            datapath = self.datapaths.get(dpid)
+            if datapath is None:
+                continue
+            parser = datapath.ofproto_parser
+            inst = [parser.OFPInstructionActions(
+                datapath.ofproto.OFPIT_APPLY_ACTIONS,
+                [parser.OFPActionOutput(out_port)])]
+            datapath.send_msg(parser.OFPFlowMod(
+                datapath=datapath, cookie=cookie, priority=PROACTIVE_PRIORITY,
+                match=parser.OFPMatch(eth_dst=text), instructions=inst))
+            installed += 1
+
+        # Switches cut off from the host must not keep an old path
+        for dpid, datapath in self.datapaths.items():
+            if dpid not in out_ports:
+                self.delete_cookie(datapath, cookie, EXACT_COOKIE_MASK)
+
+        self.logger.info("Proactive flows for %s at %s:%s on %d switches",
+                         text, root, host_port, installed)
+
+    def remove_host_flows(self, mac):
+        cookie = self.host_cookies.get(mac)
+        if cookie is None:
+            return
+        for datapath in self.datapaths.values():
+            self.delete_cookie(datapath, cookie, EXACT_COOKIE_MASK)
+
+    @staticmethod
+    def delete_cookie(datapath, cookie, cookie_mask):
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath, cookie=cookie, cookie_mask=cookie_mask,
+            table_id=ofproto.OFPTT_ALL, command=ofproto.OFPFC_DELETE,
+            out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY))
+
+    def edge_flood(self, ingress, in_port, data):
+        """Send a frame out of every host-facing port in the network."""
+        for dpid, datapath in self.datapaths.items():
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            actions = [
+                parser.OFPActionOutput(port_no)
+                for port_no in sorted(datapath.ports)
+                if port_no <= ofproto.OFPP_MAX and
+                (dpid, port_no) not in self.link_ports and
+                (dpid, port_no) not in self.blocked_ports and
+                not (dpid == ingress and port_no == in_port)
+            ]
+            if not actions:
+                continue
+            datapath.send_msg(parser.OFPPacketOut(
+                datapath=datapath, buffer_id=ofproto.OFP_NO_BUFFER,
+                in_port=in_port if dpid == ingress else ofproto.OFPP_CONTROLLER,
+                actions=actions, data=data))
+
+    def learn_host(self, dpid, in_port, src):
+        """Record where a host attaches; False for inter-switch ports."""
+        if (dpid, in_port) in self.link_ports:
+            # Only edge ports carry new information; anything arriving from
+            # another switch was already handled where it entered
+            return False
+        if not src[0] & 1 and self.hosts.get(src) != (dpid, in_port):
+            self.hosts[src] = (dpid, in_port)
+            self.install_host_flows(src)
+        return True
+
+    def proactive_packet_in(self, msg):
+        """Learn host locations at edge ports and answer from the global view."""
+        data = msg.data
+        if len(data) < ETH_HEADER.size:
+            return
+        dst, src, ethertype = ETH_HEADER.unpack_from(data)
+        if ethertype == ether_types.ETH_TYPE_LLDP:
+            return
+
+        dpid = msg.datapath.id
+        in_port = msg.match['in_port']
+        if not self.learn_host(dpid, in_port, src):
+            return
+
+        location = self.hosts.get(dst)
+        if location is None:
+            self.edge_flood(dpid, in_port, data)
+            return
+
+        # The host's flows are in place; deliver this one packet at its edge
+        edge = self.datapaths.get(location[0])
+        if edge is not None:
+            edge_ofproto = edge.ofproto
+            edge.send(encode_packet_out(
+                self.next_xid(edge), edge_ofproto.OFP_NO_BUFFER,
+                edge_ofproto.OFPP_CONTROLLER, location[1], data))
+
+    def install_compact_pipeline(self, datapath):
+        """Table 0 misses copy to the controller, table 1 misses flood."""
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath, table_id=SOURCE_TABLE, priority=0,
+            match=parser.OFPMatch(),
+            instructions=[
+                parser.OFPInstructionActions(
+                    ofproto.OFPIT_APPLY_ACTIONS,
+                    [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER,
+                                            ofproto.OFPCML_NO_BUFFER)]),
+                parser.OFPInstructionGotoTable(FORWARD_TABLE),
+            ]))
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath, table_id=FORWARD_TABLE, priority=0,
+            match=parser.OFPMatch(),
+            instructions=[parser.OFPInstructionActions(
+                ofproto.OFPIT_APPLY_ACTIONS,
+                [parser.OFPActionOutput(ofproto.OFPP_FLOOD)])]))
+
+    def install_learned_host(self, datapath, mac, cookie, port):
+        """The source check in table 0 and the eth_dst forward in table 1."""
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        text = self.text_mac(mac)
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath, table_id=SOURCE_TABLE, cookie=cookie,
+            priority=1, idle_timeout=self.idle_timeout,
+            hard_timeout=self.hard_timeout,
+            match=parser.OFPMatch(in_port=port, eth_src=text),
+            instructions=[parser.OFPInstructionGotoTable(FORWARD_TABLE)]))
+        # Only the forward entry reports its removal; the source entry of the
+        # same cookie is cleaned up with it
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath, table_id=FORWARD_TABLE, cookie=cookie,
+            priority=1, idle_timeout=self.idle_timeout,
+            hard_timeout=self.hard_timeout, flags=ofproto.OFPFF_SEND_FLOW_REM,
+            match=parser.OFPMatch(eth_dst=text),
+            instructions=[parser.OFPInstructionActions(
+                ofproto.OFPIT_APPLY_ACTIONS,
+                [parser.OFPActionOutput(port)])]))
+
+    def compact_packet_in(self, msg):
+        """Learn an unknown source; the switch has already forwarded it."""
+        data = msg.data
+        if len(data) < ETH_HEADER.size:
+            return
+        dst, src, ethertype = ETH_HEADER.unpack_from(data)
+        if ethertype == ether_types.ETH_TYPE_LLDP or src[0] & 1:
+            return
+
+        datapath = msg.datapath
+        dpid = datapath.id
+        in_port = msg.match['in_port']
+        table = self.learned.get(dpid)
+        if table is None:
+            table = self.learned[dpid] = OrderedDict()
+
+        entry = table.get(src)
+        if entry is None:
+            while len(table) >= self.max_learned:
+                self.evict_learned(datapath, table)
+            self.next_cookie += 1
+            entry = table[src] = [COMPACT_COOKIE | self.next_cookie, in_port, 0]
+            self.learned_cookies[entry[0]] = src
+        else:
+            # Moved host, or its source entry expired before the forward one
+            entry[1] = in_port
+            entry[2] = 0
+            table.move_to_end(src)
+
+        self.install_learned_host(datapath, src, entry[0], in_port)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("learned %s on %s port %s (%d/%d hosts)",
+                              self.text_mac(src), dpid, in_port, len(table),
+                              self.max_learned)
+
+    def evict_learned(self, datapath, table):
+        """Remove the least recently used host from a switch."""
+        mac, entry = table.popitem(last=False)
+        self.learned_cookies.pop(entry[0], None)
+        self.delete_cookie(datapath, entry[0], EXACT_COOKIE_MASK)
+        self.logger.info("Evicted %s from switch %s (budget %d hosts)",
+                         self.text_mac(mac), datapath.id, self.max_learned)
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        """A forward entry timed out: forget the host and its source entry."""
+        msg = ev.msg
+        if (msg.cookie & COMPACT_COOKIE_MASK != COMPACT_COOKIE or
+                msg.table_id != FORWARD_TABLE or
+                msg.reason == msg.datapath.ofproto.OFPRR_DELETE):
+            return
+        datapath = msg.datapath
+        mac = self.learned_cookies.get(msg.cookie)
+        table = self.learned.get(datapath.id, {})
+        entry = table.get(mac)
+        if entry is not None and entry[0] == msg.cookie:
+            del table[mac]
+            del self.learned_cookies[msg.cookie]
+        self.delete_cookie(datapath, msg.cookie, EXACT_COOKIE_MASK)
+
+    def flow_stats_loop(self):
+        """Ask every switch for its flows to refresh LRU order and occupancy."""
+        while True:
+            hub.sleep(STATS_INTERVAL)
+            for datapath in list(self.datapaths.values()):
+                parser = datapath.ofproto_parser
+                datapath.send_msg(parser.OFPFlowStatsRequest(
+                    datapath, table_id=datapath.ofproto.OFPTT_ALL))
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_reply_handler(self, ev):
+        msg = ev.msg
+        datapath = msg.datapath
+        dpid = datapath.id
+        self.flow_stats.setdefault(dpid, []).extend(msg.body)
+        if msg.flags & datapath.ofproto.OFPMPF_REPLY_MORE:
+            return
+        stats = self.flow_stats.pop(dpid)
+
+        occupancy = {}
+        for stat in stats:
+            occupancy[stat.table_id] = occupancy.get(stat.table_id, 0) + 1
+        self.table_occupancy[dpid] = occupancy
+
+        table = self.learned.get(dpid)
+        if table is None:
+            return
+        # Forward entries that moved packets since the last poll were used
+        for stat in stats:
+            if (stat.table_id != FORWARD_TABLE or
+                    stat.cookie & COMPACT_COOKIE_MASK != COMPACT_COOKIE):
+                continue
+            mac = self.learned_cookies.get(stat.cookie)
+            entry = table.get(mac)
+            if entry is not None and stat.packet_count != entry[2]:
+                entry[2] = stat.packet_count
+                table.move_to_end(mac)
+
+        while len(table) > self.max_learned:
+            self.evict_learned(datapath, table)
+
+        self.logger.info("Switch %s flow tables: %s (%d/%d learned hosts)",
+                         dpid, " ".join("t%d=%d" % item
+                                        for item in sorted(occupancy.items())),
+                         len(table), self.max_learned)
+
+    def install_arp_punt(self, datapath):
+        """Send ARP requests to the controller ahead of any learned flow."""
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_ARP,
+                                arp_op=ARP_REQUEST)
+        actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER,
+                                          ofproto.OFPCML_NO_BUFFER)]
+        self.add_flow(datapath, ARP_PUNT_PRIORITY, match, actions)
+
+    def forward_punted_arp(self, msg):
+        """Forward an ARP request the responder could not answer.
+
+        The compact table-miss copies packets to the controller and still
+        forwards them; the punt flow only sends them here.
+        """
+        data = msg.data
+        if len(data) < ETH_HEADER.size + ARP_BODY.size:
+            return
+        datapath = msg.datapath
+        ofproto = datapath.ofproto
+        if ARP_BODY.unpack_from(data, ETH_HEADER.size)[4] != ARP_REQUEST:
+            return
+        # Unicast requests (neighbour reachability probes) go where table 1
+        # would have sent them
+        entry = self.learned.get(datapath.id, {}).get(data[:6])
+        out_port = entry[1] if entry is not None else ofproto.OFPP_FLOOD
+        buffer_id = msg.buffer_id
+        payload = data if buffer_id == ofproto.OFP_NO_BUFFER else b""
+        datapath.send(encode_packet_out(self.next_xid(datapath), buffer_id,
+                                        msg.match['in_port'], out_port,
+                                        payload))
+
+    def learn_source(self, msg):
+        """Learn the sender of a packet the mode's own handler will not see."""
+        data = msg.data
+        if len(data) < ETH_HEADER.size:
+            return
+        src = data[6:12]
+        dpid = msg.datapath.id
+        in_port = msg.match['in_port']
+        if self.proactive and self.topology_ready:
+            self.learn_host(dpid, in_port, src)
+        elif self.compact:
+            self.compact_packet_in(msg)
+        elif self.fast_path or self.proactive:
+            self.fast_learn(dpid, src, in_port, time.monotonic())
+        elif not src[0] & 1:
+            self.mac_to_port.setdefault(dpid, {})[self.text_mac(src)] = in_port
+
+    def arp_packet_in(self, msg, answer=True):
+        """Learn from an ARP packet; return True if it was answered here.
+
+        With answer=False (the request was also forwarded by the switch) it
+        only updates the cache.
+        """
+        data = msg.data
+        if len(data) < ETH_HEADER.size + ARP_BODY.size:
+            return False
+        (htype, ptype, hlen, plen, opcode, sender_mac, sender_ip, _,
+         target_ip) = ARP_BODY.unpack_from(data, ETH_HEADER.size)
+        if (htype != 1 or ptype != ether_types.ETH_TYPE_IP or hlen != 6 or
+                plen != 4):
+            return False
+
+        now = time.monotonic()
+        if sender_ip != UNSPECIFIED_IP and not sender_mac[0] & 1:
+            entry = self.arp_cache.get(sender_ip)
+            if entry is None:
+                entry = self.arp_cache[sender_ip] = [sender_mac, now, 0.0]
+            else:
+                if entry[0] != sender_mac:
+                    entry[2] = 0.0
+                entry[0] = sender_mac
+                entry[1] = now
+            # Peers hear about new bindings, and refreshes before they expire
+            if (self.shard_socket is not None and
+                    now - entry[2] > self.arp_timeout / 2.0):
+                entry[2] = now
+                self.share_arp_entry(sender_ip, sender_mac)
+
+        if not answer or opcode != ARP_REQUEST or target_ip == sender_ip:
+            # Replies and gratuitous ARP still go where they are addressed
+            return False
+        entry = self.arp_cache.get(target_ip)
+        if (entry is None or now - entry[1] > self.arp_timeout or
+                entry[0] == sender_mac):
+            return False
+
+        datapath = msg.datapath
+        ofproto = datapath.ofproto
+        in_port = msg.match['in_port']
+        datapath.send(encode_packet_out(
+            self.next_xid(datapath), ofproto.OFP_NO_BUFFER,
+            ofproto.OFPP_CONTROLLER, in_port,
+            encode_arp_reply(sender_mac, sender_ip, entry[0], target_ip)))
+        self.arp_answered += 1
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("ARP reply to %s on %s port %s: %s is at %s "
+                              "(%d answered)", self.text_mac(sender_mac),
+                              datapath.id, in_port,
+                              addrconv.ipv4.bin_to_text(target_ip),
+                              self.text_mac(entry[0]), self.arp_answered)
+        return True
+
+    def open_shard_channel(self):
+        """Bind this shard's datagram socket and start listening to peers."""
+        os.makedirs(SHARD_DIR, exist_ok=True)
+        path = shard_socket_path(self.shard)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self.shard_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.shard_socket.bind(path)
+        # Sends never wait on a slow peer; the listening socket blocks
+        self.shard_sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.shard_sender.setblocking(False)
+        self.shard_peers = [shard_socket_path(shard)
+                            for shard in range(self.shards)
+                            if shard != self.shard]
+        self.threads.append(hub.spawn(self.shard_receive_loop))
+        self.logger.info("Shard %d of %d listening on %s",
+                         self.shard, self.shards, path)
+
+    def share_arp_entry(self, ip, mac):
+        message = ARP_SHARE.pack(b"A", ip, mac)
+        for peer in self.shard_peers:
+            try:
+                self.shard_sender.sendto(message, peer)
+            except OSError:
+                # Peer not started yet or its queue is full: it will learn
+                # the binding from the next refresh
+                pass
+
+    def shard_receive_loop(self):
+        while True:
+            try:
+                message = self.shard_socket.recv(ARP_SHARE.size)
+            except OSError:
+                self.logger.exception("Shard channel receive failed")
+                hub.sleep(1)
+                continue
+            if len(message) != ARP_SHARE.size:
+                continue
+            tag, ip, mac = ARP_SHARE.unpack(message)
+            if tag == b"A":
+                # Marked as shared so it is not echoed back to the peers
+                now = time.monotonic()
+                self.arp_cache[ip] = [mac, now, now]
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Port/flow statistics collector for the Ryu examples
+
+A companion app that runs next to simple_controller.py and serves switch
+counters over REST in the same JSON shapes as Floodlight, so the DAC monitor
+(projects/dac_project) can run on Ryu without a Floodlight instance.
+
+Usage:
+1. Start controller: ryu-manager simple_controller.py stats_collector.py
+   (REST API on --wsapi-port, default 8080, the same as Floodlight)
+2. Point "floodlight_controller_url" and "floodlight_controller_shards" in
+   projects/dac_project/data.json at it
+
+Every STATS_COLLECTOR_INTERVAL seconds (default 10) port and flow stats
+requests go out to all datapaths at once; replies are aggregated in memory.
+Hosts are learned from the ARP and IPv4 packet-ins the controller already
+receives.
+
+Endpoints:
+  GET /wm/device/                          hosts and their attachment points
+  GET /wm/core/controller/switches/json    connected switches
+  GET /wm/core/switch/<dpid>/port/json     raw port counters ("all": every switch)
+  GET /stats/rates/json                    per-port and per-host rates
+  GET /stats/flows/json                    flow table occupancy per switch
+Only monitoring is provided; the ACL endpoints stay Floodlight-only.
+"""
+
+import json
+import os
+import struct
+import time
+
+from ryu.app.wsgi import ControllerBase
+from ryu.app.wsgi import Response
+from ryu.app.wsgi import WSGIApplication
+from ryu.app.wsgi import route
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller.handler import DEAD_DISPATCHER, MAIN_DISPATCHER
+from ryu.controller.handler import set_ev_cls
+from ryu.lib import addrconv
+from ryu.lib import hub
+from ryu.lib.packet import ether_types
+from ryu.ofproto import ofproto_v1_3
+
+
+STATS_INTERVAL = int(os.environ.get("STATS_COLLECTOR_INTERVAL", "10"))
+COLLECTOR_INSTANCE = "stats_collector_app"
+
+# dst MAC, src MAC, ethertype
+ETH_HEADER = struct.Struct("!6s6sH")
+ARP_SENDER_IP = struct.Struct("!4s")
+ARP_SENDER_OFFSET = ETH_HEADER.size + 14
+IPV4_SRC_OFFSET = ETH_HEADER.size + 12
+
+PORT_COUNTERS = (
+    ("receive_packets", "rx_packets"),
+    ("transmit_packets", "tx_packets"),
+    ("receive_bytes", "rx_bytes"),
+    ("transmit_bytes", "tx_bytes"),
+    ("receive_dropped", "rx_dropped"),
+    ("transmit_dropped", "tx_dropped"),
+    ("receive_errors", "rx_errors"),
+    ("transmit_errors", "tx_errors"),
+)
+
+
+def floodlight_dpid(dpid):
+    """00:00:00:00:00:00:00:01 style DPID, as Floodlight reports it."""
+    raw = "%016x" % dpid
+    return ":".join(raw[i:i + 2] for i in range(0, 16, 2))
+
+
+def parse_dpid(text):
+    return int(text.replace(":", ""), 16)
+
+
+def port_name(port_no):
+    return "local" if port_no == ofproto_v1_3.OFPP_LOCAL else str(port_no)
+
+
+class StatsCollector(app_manager.RyuApp):
+    OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
+    _CONTEXTS = {"wsgi": WSGIApplication}
+
+    def __init__(self, *args, **kwargs):
+        super(StatsCollector, self).__init__(*args, **kwargs)
+        self.datapaths = {}
+        self.connected_since = {}
+
+        # {dpid: {port_no: OFPPortStats}} plus the time of the last complete
+        # reply, and {dpid: {port_no: {"rx_pps": ...}}} derived from two polls
+        self.port_stats = {}
+        self.port_times = {}
+        self.port_rates = {}
+        self.flow_tables = {}
+        self.pending = {}
+
+        # Hosts: {mac: {"ips": set, "ports": {(dpid, port): last_seen_ms}}}
+        # and the MACs seen behind each port (trunk ports see many)
+        self.hosts = {}
+        self.port_macs = {}
+
+        wsgi = kwargs["wsgi"]
+        wsgi.register(StatsController, {COLLECTOR_INSTANCE: self})
+        self.threads.append(hub.spawn(self.poll_loop))
+
+    @set_ev_cls(ofp_event.EventOFPStateChange,
+                [MAIN_DISPATCHER, DEAD_DISPATCHER])
+    def state_change_handler(self, ev):
+        datapath = ev.datapath
+        if ev.state == MAIN_DISPATCHER:
+            self.datapaths[datapath.id] = datapath
+            self.connected_since[datapath.id] = int(time.time() * 1000)
+        elif ev.state == DEAD_DISPATCHER and datapath.id is not None:
+            self.datapaths.pop(datapath.id, None)
+            self.connected_since.pop(datapath.id, None)
+            for table in (self.port_stats, self.port_times, self.port_rates,
+                          self.flow_tables):
+                table.pop(datapath.id, None)
+
+    def poll_loop(self):
+        while True:
+            self.request_stats()
+            hub.sleep(STATS_INTERVAL)
+
+    def request_stats(self):
+        """Fire port and flow stats requests at every datapath at once."""
+        for datapath in list(self.datapaths.values()):
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            datapath.send_msg(parser.OFPPortStatsRequest(
+                datapath, 0, ofproto.OFPP_ANY))
+            datapath.send_msg(parser.OFPFlowStatsRequest(
+                datapath, table_id=ofproto.OFPTT_ALL))
+
+    def collect_parts(self, kind, msg):
+        """Multipart replies: return the full body once the last part is in."""
+        key = (kind, msg.datapath.id)
+        parts = self.pending.setdefault(key, [])
+        parts.extend(msg.body)
+        if msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE:
+            return None
+        return self.pending.pop(key)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    def port_stats_reply_handler(self, ev):
+        body = self.collect_parts("port", ev.msg)
+        if body is None:
+            return
+        dpid = ev.msg.datapath.id
+        now = time.monotonic()
+        previous = self.port_stats.get(dpid, {})
+        interval = now - self.port_times.get(dpid, now)
+
+        current = {stat.port_no: stat for stat in body}
+        rates = {}
+        if interval > 0:
+            for port_no, stat in current.items():
+                last = previous.get(port_no)
+                if last is None:
+                    continue
+                if (stat.rx_packets < last.rx_packets or
+                        stat.tx_packets < last.tx_packets):
+                    # Counters were reset: this poll is the new baseline
+                    continue
+                deltas = [getattr(stat, field) - getattr(last, field)
+                          for field in ("rx_packets", "rx_bytes",
+                                        "tx_packets", "tx_bytes")]
+                rates[port_no] = {
+                    "rx_pps": deltas[0] / interval,
+                    "rx_bps": deltas[1] * 8 / interval,
+                    "tx_pps": deltas[2] / interval,
+                    "tx_bps": deltas[3] * 8 / interval,
+                }
+
+        self.port_stats[dpid] = current
+        self.port_times[dpid] = now
+        self.port_rates[dpid] = rates
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_reply_handler(self, ev):
+        body = self.collect_parts("flow", ev.msg)
+        if body is None:
+            return
+        tables = {}
+        packets = 0
+        byte_count = 0
+        for stat in body:
+            tables[stat.table_id] = tables.get(stat.table_id, 0) + 1
+            packets += stat.packet_count
+            byte_count += stat.byte_count
+        self.flow_tables[ev.msg.datapath.id] = {
+            "flows": len(body),
+            "tables": tables,
+            "packets": packets,
+            "bytes": byte_count,
+        }
+
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    def packet_in_handler(self, ev):
+        """Learn host MAC/IP and where it was seen from ARP and IPv4."""
+        data = ev.msg.data
+        if len(data) < ETH_HEADER.size:
+            return
+        _, src, ethertype = ETH_HEADER.unpack_from(data)
+        if src[0] & 1:
+            return
+        if ethertype == ether_types.ETH_TYPE_ARP:
+            offset = ARP_SENDER_OFFSET
+        elif ethertype == ether_types.ETH_TYPE_IP:
+            offset = IPV4_SRC_OFFSET
+        else:
+            return
+        if len(data) < offset + ARP_SENDER_IP.size:
+            return
+        ip, = ARP_SENDER_IP.unpack_from(data, offset)
+
+        host = self.hosts.get(src)
+        if host is None:
+            host = self.hosts[src] = {"ips": set(), "ports": {}}
+        if ip != b"\x00\x00\x00\x00":
+            host["ips"].add(ip)
+        port_key = (ev.msg.datapath.id, ev.msg.match["in_port"])
+        host["ports"][port_key] = int(time.time() * 1000)
+        self.port_macs.setdefault(port_key, set()).add(src)
+
+    def attachment_point(self, host):
+        """The port with the fewest MACs behind it, then the latest seen."""
+        return min(host["ports"].items(),
+                   key=lambda item: (len(self.port_macs[item[0]]), -item[1]))
+
+    def devices_json(self):
+        devices = []
+        for mac, host in self.hosts.items():
+            (dpid, port_no), last_seen = self.attachment_point(host)
+            if dpid not in self.datapaths:
+                continue
+            devices.append({
+                "mac": [addrconv.mac.bin_to_text(mac)],
+                "ipv4": sorted(addrconv.ipv4.bin_to_text(ip)
+                               for ip in host["ips"]),
+                "attachmentPoint": [{"switch": floodlight_dpid(dpid),
+                                     "port": port_no}],
+                "lastSeen": last_seen,
+            })
+        return {"devices": devices}
+
+    def switches_json(self):
+        return [{"switchDPID": floodlight_dpid(dpid),
+                 "connectedSince": self.connected_since.get(dpid)}
+                for dpid in sorted(self.datapaths)]
+
+    def ports_json(self, dpid):
+        ports = []
+        for port_no, stat in sorted(self.port_stats.get(dpid, {}).items()):
+            entry = {"port_number": port_name(port_no)}
+            for name, field in PORT_COUNTERS:
+                entry[name] = str(getattr(stat, field))
+            entry["duration_sec"] = str(stat.duration_sec)
+            ports.append(entry)
+        return {"port_reply": [{"version": "OF_13", "port": ports}]}
+
+    def rates_json(self):
+        ports = {}
+        for dpid, rates in self.port_rates.items():
+            for port_no, rate in rates.items():
+                key = "%s:%s" % (floodlight_dpid(dpid), port_name(port_no))
+                ports[key] = rate
+        hosts = {}
+        for mac, host in self.hosts.items():
+            (dpid, port_no), _ = self.attachment_point(host)
+            rate = self.port_rates.get(dpid, {}).get(port_no)
+            if rate is None:
+                continue
+            key = "%s:%s" % (floodlight_dpid(dpid), port_name(port_no))
+            for ip in host["ips"]:
+                hosts[addrconv.ipv4.bin_to_text(ip)] = dict(rate, port=key)
+        return {"interval": STATS_INTERVAL, "ports": ports, "hosts": hosts}
+
+    def flows_json(self):
+        return {floodlight_dpid(dpid): table
+                for dpid, table in self.flow_tables.items()}
+
+
+class StatsController(ControllerBase):
+    def __init__(self, req, link, data, **config):
+        super(StatsController, self).__init__(req, link, data, **config)
+        self.collector = data[COLLECTOR_INSTANCE]
+
+    @staticmethod
+    def json_response(body):
+        return Response(content_type="application/json",
+                        body=json.dumps(body))
+
+    @route("stats", "/wm/device/", methods=["GET"])
+    def devices(self, req, **kwargs):
+        return self.json_response(self.collector.devices_json())
+
+    @route("stats", "/wm/core/controller/switches/json", methods=["GET"])
+    def switches(self, req, **kwargs):
+        return self.json_response(self.collector.switches_json())
+
+    @route("stats", "/wm/core/switch/{dpid}/port/json", methods=["GET"])
+    def ports(self, req, **kwargs):
+        if kwargs["dpid"] == "all":
+            return self.json_response({
+                floodlight_dpid(dpid): self.collector.ports_json(dpid)
+                for dpid in self.collector.datapaths
+            })
+        try:
+            dpid = parse_dpid(kwargs["dpid"])
+        except ValueError:
+            return Response(status=400)
+        if dpid not in self.collector.datapaths:
+            return Response(status=404)
+        return self.json_response(self.collector.ports_json(dpid))
+
+    @route("stats", "/stats/rates/json", methods=["GET"])
+    def rates(self, req, **kwargs):
+        return self.json_response(self.collector.rates_json())
+
+    @route("stats", "/stats/flows/json", methods=["GET"])
+    def flows(self, req, **kwargs):
+        return self.json_response(self.collector.flows_json())
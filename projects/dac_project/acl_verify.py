@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+ACL verification matrix across all hosts and protocols.
+
+Builds the expected allow/deny matrix from the users.json roles, the
+data.json role and time policies and the current policy hour (see
+policy.py), then probes it from every host at once: one probe process per
+source host, all of its TCP connects in parallel with a short timeout.
+  connected / refused  -> the ACL let the SYN through (allowed)
+  timed out            -> dropped on the way (blocked)
+No servers are needed; a refused connection already proves the path is open.
+
+Run from a root terminal while topology.py and dac_app.py are up:
+    sudo python3 acl_verify.py
+    sudo python3 acl_verify.py --targets 3 --timeout 0.5 --json acl.json
+Exits non-zero when any probe disagrees with the policy.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import policy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sdn_utils import hosts as mn_hosts
+
+
+DEFAULT_TIMEOUT = 1.0
+
+
+async def probe(ip, port, timeout):
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        writer.close()
+        return "connected"
+    except asyncio.TimeoutError:
+        return "timeout"
+    except ConnectionRefusedError:
+        return "refused"
+    except OSError as e:
+        return f"error: {e.strerror or e}"
+
+
+async def run_probes(targets, timeout):
+    results = await asyncio.gather(*(probe(t["ip"], t["port"], timeout) for t in targets))
+    return [dict(target, result=result) for target, result in zip(targets, results)]
+
+
+def build_matrix(names, ips, roles, config, protocols, targets, hour):
+    """Probes per source host: targets destinations for every protocol"""
+    probes = {}
+    for idx, source in enumerate(names):
+        role = roles.get(ips[source])
+        for p_idx, protocol in enumerate(protocols):
+            port = int(config["protocols"][protocol]["port"])
+            allowed, reason = policy.expected_allowed(config, role, protocol, hour)
+            for t in range(min(targets, len(names) - 1)):
+                # Spread destinations so each (protocol, target) pair hits other hosts
+                offset = 1 + (p_idx * targets + t) % (len(names) - 1)
+                dest = names[(idx + offset) % len(names)]
+                probes.setdefault(source, []).append({
+                    "source": source, "role": role, "dest": dest, "ip": ips[dest],
+                    "protocol": protocol, "port": port,
+                    "expected": "allow" if allowed else "deny", "reason": reason,
+                })
+    return probes
+
+
+def run_matrix(probes, host_pids, timeout):
+    outputs = mn_hosts.run_in_hosts(
+        host_pids, [sys.executable, os.path.abspath(__file__), "probe", "--timeout", timeout],
+        probes)
+    results = []
+    for source, (output, error) in outputs.items():
+        if error is not None:
+            output = [dict(target, result=f"error: {error}") for target in probes[source]]
+        results.extend(output)
+    return results
+
+
+def coverage(results, names, roles_in_use, config, protocols):
+    sources = {r["source"] for r in results}
+    dests = {r["dest"] for r in results}
+    combos = {(r["role"], r["protocol"]) for r in results}
+    wanted = {(role, protocol) for role in roles_in_use for protocol in protocols}
+    return {
+        "sources": f"{len(sources)}/{len(names)}",
+        "destinations": f"{len(dests)}/{len(names)}",
+        "role_protocol": f"{len(combos & wanted)}/{len(wanted)}",
+        "missing_role_protocol": sorted(f"{role}:{protocol}" for role, protocol in wanted - combos),
+    }
+
+
+def print_report(results, mismatches, cover, timings, hour, config):
+    print("\n" + "=" * 72)
+    window = "business hours" if policy.business_hours(config, hour) else "outside business hours"
+    print(f"ACL verification: {len(results)} probes at policy hour {hour:02d}:00 ({window})")
+    print("=" * 72)
+
+    table = {}
+    for r in results:
+        row = table.setdefault((r["role"] or "-", r["protocol"]), [0, 0, 0, r["expected"]])
+        row[0] += 1
+        row[1] += r["actual"] == "allow"
+        row[2] += r["actual"] != r["expected"]
+    print(f"{'Role':<10} {'Protocol':<8} {'Expected':>9} {'Probes':>7} {'Allowed':>8} {'Mismatch':>9}")
+    for (role, protocol), (count, allowed, wrong, expected) in sorted(table.items()):
+        flag = "  ❌" if wrong else ""
+        print(f"{role:<10} {protocol:<8} {expected:>9} {count:>7} {allowed:>8} {wrong:>9}{flag}")
+
+    print("-" * 72)
+    print(f"Coverage: sources {cover['sources']}, destinations {cover['destinations']}, "
+          f"role x protocol {cover['role_protocol']}")
+    if cover["missing_role_protocol"]:
+        print(f"  Not covered: {', '.join(cover['missing_role_protocol'])}")
+    print(f"Time: {timings['total']:.2f}s total ({timings['discover']:.2f}s host discovery, "
+          f"{timings['probe']:.2f}s probing)")
+    print("=" * 72)
+
+    leaks = [r for r in mismatches if r["actual"] == "allow"]
+    policy.print_mismatches(
+        sorted(mismatches, key=lambda r: (r["actual"] != "allow", mn_hosts.host_order(r["source"]))),
+        "probe",
+        lambda r: (f"{r['source']} ({r['role'] or '-'}) -> {r['dest']} {r['protocol']}:{r['port']}: "
+                   f"{r['result']}, expected {r['expected']} ({r['reason']})"),
+        f"{len(mismatches)} mismatches ({len(leaks)} allowed but should be blocked, "
+        f"{len(mismatches) - len(leaks)} blocked but should be allowed)")
+
+
+def verify(args):
+    start = time.time()
+    config = policy.load_config()
+    host_pids = mn_hosts.find_hosts()
+    if len(host_pids) < 2:
+        print("[ACL] No running Mininet hosts found; start topology.py first")
+        return 1
+    names = sorted(host_pids, key=mn_hosts.host_order)
+    ips = mn_hosts.host_ips(host_pids)
+    names = [name for name in names if name in ips]
+    roles = policy.ip_to_role()
+    protocols = args.protocols.split(",") if args.protocols else policy.tcp_protocols(config)
+    discovered = time.time()
+
+    hour = args.hour if args.hour is not None else policy.policy_hour(config)
+    probes = build_matrix(names, ips, roles, config, protocols, args.targets, hour)
+    results = run_matrix(probes, host_pids, args.timeout)
+    probed = time.time()
+    if args.hour is None and policy.policy_hour(config) != hour:
+        print("[ACL] Warning: the policy hour changed while probing; re-run to be sure")
+
+    mismatches = []
+    for r in results:
+        if r["result"].startswith("error"):
+            r["actual"] = "error"
+        else:
+            r["actual"] = "deny" if r["result"] == "timeout" else "allow"
+        if r["actual"] != r["expected"]:
+            mismatches.append(r)
+
+    roles_in_use = {roles.get(ips[name]) for name in names}
+    cover = coverage(results, names, roles_in_use, config, protocols)
+    timings = {"discover": discovered - start, "probe": probed - discovered,
+               "total": time.time() - start}
+    print_report(results, mismatches, cover, timings, hour, config)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"hour": hour, "coverage": cover, "timings": timings,
+                       "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 1 if mismatches else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Verify DAC ACLs across all hosts and protocols")
+    sub = parser.add_subparsers(dest="command")
+    probe_parser = sub.add_parser("probe", help="(internal) probe targets from stdin")
+    probe_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+
+    parser.add_argument("--protocols", help="comma separated names from data.json (default: all TCP)")
+    parser.add_argument("--targets", type=int, default=1,
+                        help="destinations per source host and protocol")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="connect timeout; a timed out probe counts as blocked")
+    parser.add_argument("--hour", type=int, help="policy hour to expect (default: now)")
+    parser.add_argument("--json", help="write all probe results here")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "probe":
+        targets = json.load(sys.stdin)
+        print(json.dumps(asyncio.run(run_probes(targets, args.timeout))))
+    else:
+        sys.exit(verify(args))
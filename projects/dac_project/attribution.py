@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Host traffic attribution strategies for switch port counters.
+
+Which port counters count as a host's traffic:
+  rx        RX of the primary attachment port (what the host sent; dac_app default)
+  tx        TX of the primary attachment port (what the host received: download floods)
+  rxtx      RX + TX of the primary attachment port
+  all       RX + TX of every attachment point that is not an inter-switch port
+  all-rx    RX of every attachment point that is not an inter-switch port
+  all-tx    TX of every attachment point that is not an inter-switch port
+
+Inter-switch ports come from the controller's /wm/topology/links/json. In the
+"all" strategies a port claimed by several hosts is split evenly between them,
+so nothing is counted twice.
+
+An AttributionPlan is built once per cycle from the snapshot (O(ports + hosts))
+and then applied to counters or to rates in O(hosts). Port traffic that ends up
+on no host is accounted explicitly: inter-switch ports, host attachment ports
+the strategy skips (secondary attachments) and ports with no known host.
+
+    python3 attribution.py                          # the strategy in data.json
+    python3 attribution.py --strategy all           # compare against the live network
+    python3 attribution.py --compare                # every strategy side by side
+"""
+
+import argparse
+import json
+import sys
+from collections import namedtuple
+
+from rate_engine import PortRate
+from snapshot_client import SnapshotClient, load_config
+
+# Indexes into PortCounters: (packet counters, byte counters) per direction
+DIRECTIONS = {
+    "rx": ((0,), (2,)),
+    "tx": ((1,), (3,)),
+    "rxtx": ((0, 1), (2, 3)),
+}
+
+# name -> (direction, every attachment point)
+STRATEGIES = {
+    "rx": ("rx", False),
+    "tx": ("tx", False),
+    "rxtx": ("rxtx", False),
+    "all": ("rxtx", True),
+    "all-rx": ("rx", True),
+    "all-tx": ("tx", True),
+}
+DEFAULT_STRATEGY = "rx"
+
+Accounting = namedtuple(
+    "Accounting",
+    ["total", "attributed", "claimed", "inter_switch", "secondary", "unowned", "overlap"],
+)
+
+
+def configured_strategy(config=None):
+    """monitoring.attribution from data.json: the strategy dac_app.py uses"""
+    config = config or load_config()
+    return config.get("monitoring", {}).get("attribution", DEFAULT_STRATEGY)
+
+
+def needs_links(strategy):
+    """True for the strategies that skip inter-switch ports"""
+    return STRATEGIES[strategy][1]
+
+
+def link_ports(links):
+    """Set of dpid:port keys on either end of an inter-switch link"""
+    ports = set()
+    for src, dst in links:
+        ports.add(src)
+        ports.add(dst)
+    return ports
+
+
+class AttributionPlan:
+    """Per-cycle mapping of hosts to (port, weight) pairs"""
+
+    def __init__(self, strategy, snapshot, inter_switch_ports=()):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown attribution strategy {strategy!r}")
+        self.strategy = strategy
+        direction, all_ports = STRATEGIES[strategy]
+        self.packet_idx, self.byte_idx = DIRECTIONS[direction]
+        self.inter_switch = set(inter_switch_ports) if all_ports else set()
+        self.inter_switch_known = set(inter_switch_ports)
+
+        # ip -> [(port_key, weight)]; ip -> primary port reported with the traffic
+        self.host_ports = {}
+        self.primary = {}
+        self.secondary = set()
+        claims = {}
+        for ip, entry in snapshot.device_index.items():
+            if not entry.ports:
+                self.host_ports[ip] = []
+                self.primary[ip] = None
+                continue
+            if all_ports:
+                ports = [port for port in entry.ports if port not in self.inter_switch]
+            else:
+                ports = [entry.ports[0]]
+                self.secondary.update(entry.ports[1:])
+            self.primary[ip] = ports[0] if ports else None
+            self.host_ports[ip] = ports
+            for port_key in ports:
+                claims[port_key] = claims.get(port_key, 0) + 1
+
+        # Splitting only applies where the strategy spreads over every port;
+        # primary-port strategies keep dac_app's full-port behaviour
+        for ip, ports in self.host_ports.items():
+            self.host_ports[ip] = [
+                (port_key, 1.0 / claims[port_key] if all_ports else 1.0)
+                for port_key in ports
+            ]
+        self.claimed = set(claims)
+        self.secondary -= self.claimed
+
+    def _totals(self, values):
+        packet_idx, byte_idx = self.packet_idx, self.byte_idx
+        return (sum(values[i] for i in packet_idx), sum(values[i] for i in byte_idx))
+
+    def host_counters(self, ports):
+        """{ip: {"packets", "bytes", "port"}} from {dpid:port: PortCounters}
+
+        port is the host's primary port under this strategy; hosts with no
+        usable port report zero with port None.
+        """
+        traffic = {}
+        for ip, host_ports in self.host_ports.items():
+            packets = byte_count = 0
+            found = False
+            for port_key, weight in host_ports:
+                counters = ports.get(port_key)
+                if counters is None:
+                    continue
+                found = True
+                port_packets, port_bytes = self._totals(counters)
+                if weight == 1.0:
+                    # Keep 64-bit counters exact
+                    packets += port_packets
+                    byte_count += port_bytes
+                else:
+                    packets += port_packets * weight
+                    byte_count += port_bytes * weight
+            if found:
+                traffic[ip] = {"packets": round(packets), "bytes": round(byte_count),
+                               "port": self.primary[ip]}
+            else:
+                traffic[ip] = {"packets": 0, "bytes": 0, "port": None}
+        return traffic
+
+    def host_rates(self, port_rates):
+        """{ip: PortRate of (packets/s, bytes/s)} from the rate engine's per-port results
+
+        The engine must track all four PortCounters. A host is missing when
+        none of its ports has a rate yet, and gets rates None when any of its
+        ports was re-baselined this cycle.
+        """
+        results = {}
+        for ip, host_ports in self.host_ports.items():
+            rates = [(port_rates.get(port_key), weight) for port_key, weight in host_ports]
+            rates = [(rate, weight) for rate, weight in rates if rate is not None]
+            if not rates:
+                continue
+            interval = max(rate.interval for rate, _ in rates)
+            missed = max(rate.missed_polls for rate, _ in rates)
+            rebaselined = [rate for rate, _ in rates if rate.rates is None]
+            if rebaselined:
+                results[ip] = PortRate(None, interval, 0, rebaselined[0].event)
+                continue
+            packets = byte_count = 0.0
+            for rate, weight in rates:
+                port_packets, port_bytes = self._totals(rate.rates)
+                packets += port_packets * weight
+                byte_count += port_bytes * weight
+            results[ip] = PortRate((packets, byte_count), interval, missed, "ok")
+        return results
+
+    def account(self, values, attributed=None):
+        """Accounting of where port traffic went, as (packets, bytes) pairs
+
+        values maps dpid:port to a four-value tuple in PortCounters order
+        (counters or rates); attributed is the matching per-host result.
+        """
+        total = [0.0, 0.0]
+        buckets = {"claimed": [0.0, 0.0], "inter_switch": [0.0, 0.0],
+                   "secondary": [0.0, 0.0], "unowned": [0.0, 0.0]}
+        for port_key, port_values in values.items():
+            if port_values is None:
+                continue
+            packets, byte_count = self._totals(port_values)
+            total[0] += packets
+            total[1] += byte_count
+            if port_key in self.claimed:
+                bucket = buckets["claimed"]
+            elif port_key in self.inter_switch_known:
+                bucket = buckets["inter_switch"]
+            elif port_key in self.secondary:
+                bucket = buckets["secondary"]
+            else:
+                bucket = buckets["unowned"]
+            bucket[0] += packets
+            bucket[1] += byte_count
+
+        attributed_total = [0.0, 0.0]
+        for host in (attributed or {}).values():
+            attributed_total[0] += host[0]
+            attributed_total[1] += host[1]
+        claimed = buckets["claimed"]
+        return Accounting(
+            tuple(total), tuple(attributed_total), tuple(claimed),
+            tuple(buckets["inter_switch"]), tuple(buckets["secondary"]),
+            tuple(buckets["unowned"]),
+            # > 0 when primary-port strategies give one shared port to several hosts
+            (attributed_total[0] - claimed[0], attributed_total[1] - claimed[1]),
+        )
+
+
+def build_plan(client, snapshot, strategy):
+    """AttributionPlan for one snapshot, fetching topology links only when needed"""
+    inter_switch_ports = ()
+    if needs_links(strategy):
+        inter_switch_ports = link_ports(client.fetch_links() or [])
+    return AttributionPlan(strategy, snapshot, inter_switch_ports)
+
+
+def format_accounting(accounting, unit="packets"):
+    total = accounting.total[0] or 1.0
+    parts = [
+        f"{name.replace('_', '-')} {value[0]:,.0f} ({value[0] / total:.0%})"
+        for name, value in (("attributed", accounting.attributed),
+                            ("inter_switch", accounting.inter_switch),
+                            ("secondary", accounting.secondary),
+                            ("unowned", accounting.unowned))
+        if value[0] or name == "attributed"
+    ]
+    if accounting.overlap[0] > 0:
+        parts.append(f"double-counted {accounting.overlap[0]:,.0f}")
+    return f"{accounting.total[0]:,.0f} {unit}: " + ", ".join(parts)
+
+
+def report(client, strategies, as_json):
+    snapshot = client.snapshot(refresh_devices=True)
+    if not snapshot.shards:
+        print("[Attribution] No controller responded")
+        return 1
+    links = client.fetch_links()
+    if links is None:
+        print("[Attribution] No topology links from the controller; "
+              "inter-switch ports cannot be excluded", file=sys.stderr)
+    isl = link_ports(links or [])
+
+    results = {}
+    for strategy in strategies:
+        plan = AttributionPlan(strategy, snapshot, isl)
+        traffic = plan.host_counters(snapshot.ports)
+        accounting = plan.account(
+            snapshot.ports,
+            {ip: (stats["packets"], stats["bytes"]) for ip, stats in traffic.items()},
+        )
+        results[strategy] = {"hosts": traffic, "accounting": accounting._asdict()}
+        if not as_json:
+            print(f"=== Strategy {strategy} ===")
+            for ip, stats in sorted(traffic.items()):
+                print(f"  {ip:<15} {stats['port'] or '-':<28} "
+                      f"{stats['packets']:>12,} packets {stats['bytes']:>16,} bytes")
+            print(f"  Accounting: {format_accounting(accounting)}\n")
+    if as_json:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attribute port counters to hosts")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES),
+                        help="default: monitoring.attribution in data.json")
+    parser.add_argument("--compare", action="store_true", help="run every strategy")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    strategies = sorted(STRATEGIES) if args.compare else [args.strategy or configured_strategy()]
+    sys.exit(report(SnapshotClient(), strategies, args.json))
@@ -4,8 +4,14 @@ import time
 import json
 import os
 import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import profiling
+import attribution
+from rate_engine import CounterRateEngine, plausible_link_mbps
+from snapshot_client import PortCounters, SnapshotClient
+
 
 def load_config():
     config_path = os.path.join(os.path.dirname(__file__), "data.json")
@@ -51,6 +57,9 @@ def get_role_protocols(role_name):
 
 
 FLOODLIGHT_CONTROLLER_URL = config["floodlight_controller_url"]
+CONTROLLER_SHARDS = config.get("floodlight_controller_shards") or [
+    FLOODLIGHT_CONTROLLER_URL
+]
 ALLOWED_TIME_RANGE = [
     config["time_policies"]["business_hours"]["start"],
     config["time_policies"]["business_hours"]["end"],
@@ -59,6 +68,7 @@ TIME_BLOCKED_PROTOCOLS = get_time_blocked_protocols()
 IP_TO_ROLE = create_ip_to_role_map()
 TRAFFIC_THRESHOLDS = config.get("monitoring", {}).get("traffic_thresholds", {})
 MONITORING_INTERVAL = config.get("monitoring", {}).get("check_interval_seconds", 30)
+ATTRIBUTION_STRATEGY = attribution.configured_strategy(config)
 
 
 states = {"blocking_rules_active": False}
@@ -76,6 +86,38 @@ blocked_ips = set()
 blocked_ips_lock = threading.Lock()
 
 
+# Controller shard that owns each host's switch: {ip: shard_url}
+host_shards = {}
+host_shards_lock = threading.Lock()
+
+shard_executor = ThreadPoolExecutor(max_workers=max(8, 4 * len(CONTROLLER_SHARDS)))
+
+# Device index refreshed every poll unless monitoring.device_refresh_seconds is set
+controller_client = SnapshotClient(
+    CONTROLLER_SHARDS,
+    device_ttl=config.get("monitoring", {}).get("device_refresh_seconds", 0),
+)
+
+
+def new_port_rate_engine(expected_interval=MONITORING_INTERVAL):
+    monitoring = config.get("monitoring", {})
+    # Deltas beyond the links' capacity (with headroom) are rejected as jumps
+    max_link_mbps = monitoring.get("max_link_mbps") or plausible_link_mbps(
+        monitoring.get("link_capacity_mbps", 1000))
+    return CounterRateEngine(
+        counters=PortCounters._fields,
+        expected_interval=expected_interval,
+        max_link_mbps=max_link_mbps,
+    )
+
+
+# Per dpid:port counter tracking (wrap, reset and reconnect aware)
+port_rate_engine = new_port_rate_engine()
+
+# Where the last cycle's port traffic went (attribution.Accounting of rates)
+attribution_accounting = None
+
+
 def load_traffic_history():
     global user_traffic_history
     history_path = os.path.join(os.path.dirname(__file__), "history.json")
@@ -103,93 +145,129 @@ def save_traffic_history():
 load_traffic_history()
 
 
+def get_shards_for_ip(ip_address):
+    with host_shards_lock:
+        shard_url = host_shards.get(ip_address)
+    # Hosts not seen by any controller yet get the rule everywhere
+    return [shard_url] if shard_url else CONTROLLER_SHARDS
+
+
+def post_acl_rule(acl_rule, shard_urls):
+    """Post an ACL rule to each shard, returning the first failed response if any"""
+    responses = list(
+        shard_executor.map(
+            lambda shard_url: requests.post(
+                f"{shard_url}/wm/acl/rules/json",
+                json=acl_rule,
+                headers={"Content-Type": "application/json"},
+            ),
+            shard_urls,
+        )
+    )
+    for response in responses:
+        if response.status_code != 200:
+            return response
+    return responses[0]
+
+
 def install_role_based_rules():
+    with profiling.cycle("install_role_based_rules"):
+        return _install_role_based_rules()
+
+
+def _install_role_based_rules():
     users = load_users()
+    if len(CONTROLLER_SHARDS) > 1:
+        with profiling.span("refresh_host_shards"):
+            refresh_host_shards()
     total_rules = 0
     success_count = 0
 
     try:
         print("[Policy] Installing role-based protocol rules...")
 
-        for user in users:
-            ip_address = user["ip"]
-            role = user.get("role", "guest")
+        with profiling.span("post_rules"):
+            for user in users:
+                ip_address = user["ip"]
+                role = user.get("role", "guest")
 
-            role_config = get_role_protocols(role)
-            if not role_config:
-                print(
-                    f"[Policy] Warning: No configuration found for role '{role}', skipping {ip_address}"
-                )
-                continue
-
-            blocked_protocols = role_config.get("blocked_protocols", [])
+                role_config = get_role_protocols(role)
+                if not role_config:
+                    print(
+                        f"[Policy] Warning: No configuration found for role '{role}', skipping {ip_address}"
+                    )
+                    continue
 
-            if not blocked_protocols:
-                print(f"[Policy] No blocked protocols for {ip_address} (role: {role})")
-                continue
+                blocked_protocols = role_config.get("blocked_protocols", [])
 
-            for protocol_name in blocked_protocols:
-                protocol_info = get_protocol_info(protocol_name)
-                if not protocol_info:
+                if not blocked_protocols:
+                    print(f"[Policy] No blocked protocols for {ip_address} (role: {role})")
                     continue
 
-                acl_rule = {
-                    "nw-proto": protocol_info["id"],
-                    "tp-dst": protocol_info["port"],
-                    "src-ip": f"{ip_address}/32",
-                    "dst-ip": "0.0.0.0/0",
-                    "action": "DENY",
-                }
+                for protocol_name in blocked_protocols:
+                    protocol_info = get_protocol_info(protocol_name)
+                    if not protocol_info:
+                        continue
 
-                response = requests.post(
-                    f"{FLOODLIGHT_CONTROLLER_URL}/wm/acl/rules/json",
-                    json=acl_rule,
-                    headers={"Content-Type": "application/json"},
-                )
+                    acl_rule = {
+                        "nw-proto": protocol_info["id"],
+                        "tp-dst": protocol_info["port"],
+                        "src-ip": f"{ip_address}/32",
+                        "dst-ip": "0.0.0.0/0",
+                        "action": "DENY",
+                    }
 
-                total_rules += 1
-                if response.status_code == 200:
-                    try:
-                        response_data = response.json()
+                    response = post_acl_rule(acl_rule, get_shards_for_ip(ip_address))
 
-                        status = (
-                            response_data.get("status", "").lower()
-                            if isinstance(response_data, dict)
-                            else ""
-                        )
-                        if isinstance(response_data, dict) and (
-                            "success" in status or "new rule added" in status.lower()
-                        ):
-                            success_count += 1
-                            print(
-                                f"[Policy] Blocked {protocol_name} (port {protocol_info['port']}) for {ip_address} (role: {role})"
+                    total_rules += 1
+                    if response.status_code == 200:
+                        try:
+                            response_data = response.json()
+
+                            status = (
+                                response_data.get("status", "").lower()
+                                if isinstance(response_data, dict)
+                                else ""
                             )
-                        else:
+                            if isinstance(response_data, dict) and (
+                                "success" in status or "new rule added" in status.lower()
+                            ):
+                                success_count += 1
+                                print(
+                                    f"[Policy] Blocked {protocol_name} (port {protocol_info['port']}) for {ip_address} (role: {role})"
+                                )
+                            else:
+                                success_count += 1
+                                print(
+                                    f"[Policy] Blocked {protocol_name} (port {protocol_info['port']}) for {ip_address} (role: {role})"
+                                )
+                        except:
                             success_count += 1
                             print(
                                 f"[Policy] Blocked {protocol_name} (port {protocol_info['port']}) for {ip_address} (role: {role})"
                             )
-                    except:
-                        success_count += 1
+                    else:
                         print(
-                            f"[Policy] Blocked {protocol_name} (port {protocol_info['port']}) for {ip_address} (role: {role})"
+                            f"[Policy] Failed to block {protocol_name} for {ip_address}: HTTP {response.status_code} - {response.text}"
                         )
-                else:
-                    print(
-                        f"[Policy] Failed to block {protocol_name} for {ip_address}: HTTP {response.status_code} - {response.text}"
-                    )
 
         print(
             f"[Policy] Role-based rules installed: {success_count}/{total_rules} successful"
         )
 
         try:
-            verify_response = requests.get(
-                f"{FLOODLIGHT_CONTROLLER_URL}/wm/acl/rules/json"
-            )
-            if verify_response.status_code == 200:
-                rules = verify_response.json()
-                rule_count = len(rules) if isinstance(rules, list) else 0
+            with profiling.span("verify"):
+                verify_responses = list(
+                    shard_executor.map(
+                        lambda shard_url: requests.get(f"{shard_url}/wm/acl/rules/json"),
+                        CONTROLLER_SHARDS,
+                    )
+                )
+            if all(response.status_code == 200 for response in verify_responses):
+                rule_count = 0
+                for verify_response in verify_responses:
+                    rules = verify_response.json()
+                    rule_count += len(rules) if isinstance(rules, list) else 0
                 print(
                     f"[Policy] Verification: Found {rule_count} ACL rules in Floodlight"
                 )
@@ -223,11 +301,7 @@ def install_blocking_rules():
                 "action": "DENY",
             }
 
-            response = requests.post(
-                f"{FLOODLIGHT_CONTROLLER_URL}/wm/acl/rules/json",
-                json=acl_rule,
-                headers={"Content-Type": "application/json"},
-            )
+            response = post_acl_rule(acl_rule, CONTROLLER_SHARDS)
 
             if response.status_code == 200:
                 success_count += 1
@@ -256,12 +330,18 @@ def install_blocking_rules():
 
 def clear_all_acl_rules():
     try:
-        response = requests.get(f"{FLOODLIGHT_CONTROLLER_URL}/wm/acl/clear/json")
-        if response.status_code == 200:
+        responses = list(
+            shard_executor.map(
+                lambda shard_url: requests.get(f"{shard_url}/wm/acl/clear/json"),
+                CONTROLLER_SHARDS,
+            )
+        )
+        failed = [response for response in responses if response.status_code != 200]
+        if not failed:
             print("[Policy] All ACL rules cleared")
             return True
         else:
-            print(f"[Policy] Failed to clear ACL rules: {response.text}")
+            print(f"[Policy] Failed to clear ACL rules: {failed[0].text}")
             return False
     except Exception as e:
         print(f"[Policy] Error clearing ACL rules: {e}")
@@ -286,11 +366,7 @@ def block_ip_address(ip_address):
             "action": "DENY",
         }
 
-        response = requests.post(
-            f"{FLOODLIGHT_CONTROLLER_URL}/wm/acl/rules/json",
-            json=acl_rule,
-            headers={"Content-Type": "application/json"},
-        )
+        response = post_acl_rule(acl_rule, get_shards_for_ip(ip_address))
 
         if response.status_code == 200:
             with blocked_ips_lock:
@@ -306,295 +382,294 @@ def block_ip_address(ip_address):
         return False
 
 
+def apply_time_policy():
+    utc_offset = config.get("utc_timezone", 0)
+    now = datetime.now()
+    adjusted_hour = (now.hour + utc_offset) % 24
+
+    print(
+        f"[Policy] Current time: {adjusted_hour:02d}:{now.minute:02d}:{now.second:02d} | "
+        f"Business hours: {ALLOWED_TIME_RANGE[0]}:00 - {ALLOWED_TIME_RANGE[1]}:00 | "
+        f"UTC offset: {utc_offset} hours"
+    )
+
+    if ALLOWED_TIME_RANGE[0] <= adjusted_hour < ALLOWED_TIME_RANGE[1]:
+        print("[Policy] Access allowed")
+        if states["blocking_rules_active"]:
+            with profiling.span("remove_blocking_rules"):
+                remove_blocking_rules()
+    else:
+        print("[Policy] Access denied")
+        if not states["blocking_rules_active"]:
+            with profiling.span("install_blocking_rules"):
+                install_blocking_rules()
+
+
 def time_based_policy():
     while True:
         try:
-            utc_offset = config.get("utc_timezone", 0)
-            now = datetime.now()
-            adjusted_hour = (now.hour + utc_offset) % 24
+            with profiling.cycle("time_based_policy"):
+                apply_time_policy()
+        except Exception as e:
+            print(f"[Policy] Error: {e}")
+        time.sleep(60)
+
+
+def report_user_analytics():
+    print("\n[Analytics] Gathering device statistics...")
+
+    device_rates = []
+
+    with traffic_lock, profiling.span("collect_rates"):
+        for ip, history in user_traffic_history.items():
+            role = IP_TO_ROLE.get(ip, "unknown")
+            packets_per_min = history.get("current_packets_per_min", 0.0)
+            bytes_per_min = history.get("current_bytes_per_min", 0.0)
+            device_rates.append((ip, role, packets_per_min, bytes_per_min))
+
+    if device_rates:
+        with profiling.span("sort"):
+            sorted_devices = sorted(device_rates, key=lambda x: x[2], reverse=True)
+
+        print(f"[Analytics] Found {len(sorted_devices)} active devices:")
+
+        for ip, role, packets_per_min, bytes_per_min in sorted_devices:
+            if packets_per_min > 1000:
+                activity = "🔥 HIGH"
+            elif packets_per_min > 500:
+                activity = "📊 MED"
+            elif packets_per_min > 50:
+                activity = "💤 LOW"
+            else:
+                activity = "⚫ IDLE"
 
             print(
-                f"[Policy] Current time: {adjusted_hour:02d}:{now.minute:02d}:{now.second:02d} | "
-                f"Business hours: {ALLOWED_TIME_RANGE[0]}:00 - {ALLOWED_TIME_RANGE[1]}:00 | "
-                f"UTC offset: {utc_offset} hours"
+                f"  {ip:<12} ({role:<8}): {packets_per_min:>7.1f} pkt/min, {bytes_per_min:>10,.0f} bytes/min {activity}"
             )
 
-            if ALLOWED_TIME_RANGE[0] <= adjusted_hour < ALLOWED_TIME_RANGE[1]:
-                print("[Policy] Access allowed")
-                if states["blocking_rules_active"]:
-                    remove_blocking_rules()
-            else:
-                print("[Policy] Access denied")
-                if not states["blocking_rules_active"]:
-                    install_blocking_rules()
-            time.sleep(60)
-        except Exception as e:
-            print(f"[Policy] Error: {e}")
-            time.sleep(60)
+        total_devices = len(sorted_devices)
+        active_devices = sum(
+            1 for _, _, pkt_rate, _ in sorted_devices if pkt_rate > 0
+        )
+        total_packets_per_min = sum(
+            pkt_rate for _, _, pkt_rate, _ in sorted_devices
+        )
+        total_bytes_per_min = sum(
+            byte_rate for _, _, _, byte_rate in sorted_devices
+        )
+
+        print(
+            f"[Analytics] Summary: {active_devices}/{total_devices} devices active, "
+            f"{total_packets_per_min:,.1f} total pkt/min, {total_bytes_per_min:,.0f} total bytes/min"
+        )
+    else:
+        print(
+            "[Analytics] No device traffic data available yet (waiting for first measurement...)"
+        )
+
+    accounting = attribution_accounting
+    if accounting is not None and accounting.total[0] > 0:
+        print(
+            f"[Analytics] Attribution ({ATTRIBUTION_STRATEGY}): "
+            f"{attribution.format_accounting(accounting, 'pkt/s')}"
+        )
+
+    with profiling.span("fetch_switches"):
+        switch_lists = controller_client.fetch_switches()
+    connected = [switches for switches in switch_lists.values() if switches is not None]
+    if connected:
+        print(
+            f"[Analytics] Network: {sum(len(switches) for switches in connected)} switches connected"
+            f" across {len(connected)}/{len(CONTROLLER_SHARDS)} controller(s)"
+        )
 
 
 def user_analytics():
     while True:
         try:
-            print("\n[Analytics] Gathering device statistics...")
+            with profiling.cycle("user_analytics"):
+                report_user_analytics()
+        except Exception as e:
+            print(f"[Analytics] Error: {e}")
+        time.sleep(30)
 
-            device_rates = []
 
-            with traffic_lock:
-                for ip, history in user_traffic_history.items():
-                    role = IP_TO_ROLE.get(ip, "unknown")
-                    packets_per_min = history.get("current_packets_per_min", 0.0)
-                    bytes_per_min = history.get("current_bytes_per_min", 0.0)
-                    device_rates.append((ip, role, packets_per_min, bytes_per_min))
+def update_host_shards(device_index):
+    with host_shards_lock:
+        for ip, entry in device_index.items():
+            if entry.ports:
+                host_shards[ip] = entry.shard
 
-            if device_rates:
-                sorted_devices = sorted(device_rates, key=lambda x: x[2], reverse=True)
 
-                print(f"[Analytics] Found {len(sorted_devices)} active devices:")
+def refresh_host_shards():
+    update_host_shards(controller_client.device_index(refresh=True))
 
-                for ip, role, packets_per_min, bytes_per_min in sorted_devices:
-                    if packets_per_min > 1000:
-                        activity = "🔥 HIGH"
-                    elif packets_per_min > 500:
-                        activity = "📊 MED"
-                    elif packets_per_min > 50:
-                        activity = "💤 LOW"
-                    else:
-                        activity = "⚫ IDLE"
 
-                    print(
-                        f"  {ip:<12} ({role:<8}): {packets_per_min:>7.1f} pkt/min, {bytes_per_min:>10,.0f} bytes/min {activity}"
-                    )
+def get_device_traffic_snapshot():
+    device_traffic, _, _, _ = collect_traffic_snapshot()
+    return device_traffic
 
-                total_devices = len(sorted_devices)
-                active_devices = sum(
-                    1 for _, _, pkt_rate, _ in sorted_devices if pkt_rate > 0
-                )
-                total_packets_per_min = sum(
-                    pkt_rate for _, _, pkt_rate, _ in sorted_devices
-                )
-                total_bytes_per_min = sum(
-                    byte_rate for _, _, _, byte_rate in sorted_devices
-                )
 
-                print(
-                    f"[Analytics] Summary: {active_devices}/{total_devices} devices active, "
-                    f"{total_packets_per_min:,.1f} total pkt/min, {total_bytes_per_min:,.0f} total bytes/min"
-                )
-            else:
-                print(
-                    "[Analytics] No device traffic data available yet (waiting for first measurement...)"
-                )
+def collect_traffic_snapshot():
+    """Return (device_traffic, switch_port_stats, switch_epochs, plan) for one poll
 
-            switches_response = requests.get(
-                f"{FLOODLIGHT_CONTROLLER_URL}/wm/core/controller/switches/json"
-            )
-            if switches_response.status_code == 200:
-                switches = switches_response.json()
-                print(f"[Analytics] Network: {len(switches)} switches connected")
+    switch_port_stats maps dpid:port to snapshot_client.PortCounters; plan is
+    the cycle's attribution.AttributionPlan for ATTRIBUTION_STRATEGY.
+    """
+    with profiling.span("fetch_snapshot"):
+        snapshot = controller_client.snapshot()
+    for shard_url in snapshot.missing_shards:
+        print(f"[Shards] Controller {shard_url} did not respond, skipping")
+    if not snapshot.shards:
+        return {}, {}, {}, None
 
-            time.sleep(30)
+    update_host_shards(snapshot.device_index)
 
-        except Exception as e:
-            print(f"[Analytics] Error: {e}")
-            time.sleep(30)
+    inter_switch_ports = ()
+    if attribution.needs_links(ATTRIBUTION_STRATEGY):
+        with profiling.span("fetch_links"):
+            inter_switch_ports = attribution.link_ports(controller_client.fetch_links() or [])
+    plan = attribution.AttributionPlan(ATTRIBUTION_STRATEGY, snapshot, inter_switch_ports)
+    return plan.host_counters(snapshot.ports), snapshot.ports, snapshot.switch_epochs, plan
 
 
-def get_device_traffic_snapshot():
-    devices_response = requests.get(f"{FLOODLIGHT_CONTROLLER_URL}/wm/device/")
-    if devices_response.status_code != 200:
-        return {}
+def check_suspicious_activity():
+    global user_traffic_history
 
-    devices_data = devices_response.json()
-    devices = devices_data.get("devices", [])
+    print("\n[Security] Checking for suspicious activity...")
 
-    device_mapping = {}
-    for device in devices:
-        ipv4_addresses = device.get("ipv4", [])
-        attachment_points = device.get("attachmentPoint", [])
+    with profiling.span("snapshot"):
+        current_traffic, switch_port_stats, switch_epochs, plan = collect_traffic_snapshot()
 
-        for ip in ipv4_addresses:
-            if ip and ip != "0.0.0.0":
-                device_mapping[ip] = attachment_points
+    if not current_traffic:
+        print("[Security] Failed to get traffic data, retrying...")
+        return
 
-    switches_response = requests.get(
-        f"{FLOODLIGHT_CONTROLLER_URL}/wm/core/controller/switches/json"
+    suspicious_ips = evaluate_traffic(
+        current_traffic, switch_port_stats, switch_epochs, time.time(), plan
     )
-    if switches_response.status_code != 200:
-        return {}
-
-    switches = switches_response.json()
-
-    switch_port_stats = {}
-    for switch in switches:
-        switch_id = switch["switchDPID"]
-        port_url = f"{FLOODLIGHT_CONTROLLER_URL}/wm/core/switch/{switch_id}/port/json"
-        port_response = requests.get(port_url)
-
-        if port_response.status_code == 200:
-            port_data = port_response.json()
-            ports = port_data.get("port_reply", [{}])[0].get("port", [])
-
-            for port in ports:
-                port_number = port.get("port_number")
-                if port_number != "local" and port_number is not None:
-                    rx_packets = int(port.get("receive_packets", 0))
-                    rx_bytes = int(port.get("receive_bytes", 0))
-
-                    switch_port_key = f"{switch_id}:{port_number}"
-                    switch_port_stats[switch_port_key] = {
-                        "rx_packets": rx_packets,
-                        "rx_bytes": rx_bytes,
-                    }
 
-    device_traffic = {}
-    for ip, attachment_points in device_mapping.items():
-        if attachment_points:
-            primary_attachment = attachment_points[0]
-            switch_dpid = primary_attachment.get(
-                "switch", ""
-            ) or primary_attachment.get("switchDPID", "")
-            port_num = str(primary_attachment.get("port", ""))
-
-            switch_port_key = f"{switch_dpid}:{port_num}"
-            if switch_port_key in switch_port_stats:
-                port_stats = switch_port_stats[switch_port_key]
-                device_traffic[ip] = {
-                    "packets": port_stats["rx_packets"],
-                    "bytes": port_stats["rx_bytes"],
-                }
-            else:
-                device_traffic[ip] = {"packets": 0, "bytes": 0}
-        else:
-            device_traffic[ip] = {"packets": 0, "bytes": 0}
+    with traffic_lock, profiling.span("save_history"):
+        save_traffic_history()
 
-    return device_traffic
+    for suspicious_ip_info in suspicious_ips:
+        suspicious_activity_queue.put(suspicious_ip_info, block=False)
 
 
-def suspicious_activity_monitor():
-    global user_traffic_history
+def evaluate_traffic(current_traffic, switch_port_stats, switch_epochs, current_time, plan):
+    """Update rates and history from one snapshot, returning the suspicious IPs
 
-    while True:
-        try:
-            print("\n[Security] Checking for suspicious activity...")
+    Pure detection step of check_suspicious_activity (replay.py drives it
+    with recorded snapshots and their timestamps).
+    """
+    global attribution_accounting
+
+    suspicious_ips = []
 
-            current_traffic = get_device_traffic_snapshot()
+    with profiling.span("port_rates"):
+        port_rates = port_rate_engine.update(switch_port_stats, current_time, switch_epochs)
+        host_rates = plan.host_rates(port_rates)
+        attribution_accounting = plan.account(
+            {port_key: rate.rates for port_key, rate in port_rates.items()},
+            {ip: rate.rates for ip, rate in host_rates.items() if rate.rates is not None},
+        )
+
+    bytes_threshold = TRAFFIC_THRESHOLDS.get("bytes_per_minute", 10485760)
+    packets_threshold = TRAFFIC_THRESHOLDS.get("packets_per_minute", 10000)
+
+    with traffic_lock, profiling.span("rate_loop"):
+        for ip, traffic_data in current_traffic.items():
+            if ip not in user_traffic_history:
+                user_traffic_history[ip] = {
+                    "last_bytes": traffic_data["bytes"],
+                    "last_packets": traffic_data["packets"],
+                    "last_check": current_time,
+                    "current_bytes_per_min": 0.0,
+                    "current_packets_per_min": 0.0,
+                    "bytes_history": [],
+                    "packets_history": [],
+                    "timestamps": [],
+                }
 
-            if not current_traffic:
-                print("[Security] Failed to get traffic data, retrying...")
-                time.sleep(MONITORING_INTERVAL)
                 continue
 
-            current_time = time.time()
-            suspicious_ips = []
-
-            with traffic_lock:
-                for ip, traffic_data in current_traffic.items():
-                    if ip not in user_traffic_history:
-                        user_traffic_history[ip] = {
-                            "last_bytes": traffic_data["bytes"],
-                            "last_packets": traffic_data["packets"],
-                            "last_check": current_time,
-                            "current_bytes_per_min": 0.0,
-                            "current_packets_per_min": 0.0,
-                            "bytes_history": [],
-                            "packets_history": [],
-                            "timestamps": [],
-                        }
+            history = user_traffic_history[ip]
+            host_rate = host_rates.get(ip)
 
-                        continue
+            history["last_bytes"] = traffic_data["bytes"]
+            history["last_packets"] = traffic_data["packets"]
 
-                    history = user_traffic_history[ip]
-                    time_diff = current_time - history["last_check"]
-
-                    if time_diff >= 1.0:
-                        if time_diff > 3600:
-                            history["last_bytes"] = traffic_data["bytes"]
-                            history["last_packets"] = traffic_data["packets"]
-                            history["last_check"] = current_time
-                            history["current_bytes_per_min"] = 0.0
-                            history["current_packets_per_min"] = 0.0
-                            continue
-
-                        bytes_delta = traffic_data["bytes"] - history["last_bytes"]
-                        packets_delta = (
-                            traffic_data["packets"] - history["last_packets"]
-                        )
+            if host_rate is None or host_rate.rates is None:
+                # First poll of this port, a switch reconnect or an implausible
+                # reset: the counters only give a new baseline this cycle
+                if host_rate is not None:
+                    print(
+                        f"[Security] {ip}: counter {host_rate.event} on {traffic_data['port']}, re-baselining"
+                    )
+                history["last_check"] = current_time
+                continue
 
-                        if bytes_delta < 0:
-                            bytes_delta = traffic_data["bytes"]
-                        if packets_delta < 0:
-                            packets_delta = traffic_data["packets"]
+            packets_per_second, bytes_per_second = host_rate.rates
+            bytes_per_minute = bytes_per_second * 60
+            packets_per_minute = packets_per_second * 60
 
-                        bytes_per_minute = (bytes_delta / time_diff) * 60
-                        packets_per_minute = (packets_delta / time_diff) * 60
+            suspicious_reasons = []
+            severity = "warning"
 
-                        bytes_threshold = TRAFFIC_THRESHOLDS.get(
-                            "bytes_per_minute", 10485760
-                        )
-                        packets_threshold = TRAFFIC_THRESHOLDS.get(
-                            "packets_per_minute", 10000
+            if bytes_per_minute > bytes_threshold:
+                suspicious_reasons.append(
+                    f"Exceeded traffic threshold: {bytes_per_minute:,.0f} bytes/min (threshold: {bytes_threshold:,})"
+                )
+                severity = "alert"
+
+            if packets_per_minute > packets_threshold:
+                suspicious_reasons.append(
+                    f"Exceeded packet threshold: {packets_per_minute:,.0f} packets/min (threshold: {packets_threshold:,})"
+                )
+                severity = "alert"
+
+            if suspicious_reasons:
+                with blocked_ips_lock:
+                    if ip not in blocked_ips:
+                        suspicious_ips.append(
+                            {
+                                "ip": ip,
+                                "role": IP_TO_ROLE.get(ip, "unknown"),
+                                "reasons": suspicious_reasons,
+                                "severity": severity,
+                                "bytes_per_minute": bytes_per_minute,
+                                "packets_per_minute": packets_per_minute,
+                            }
                         )
 
-                        suspicious_reasons = []
-                        severity = "warning"
+            # Missed polls are filled in at the average rate over the gap
+            steps = host_rate.missed_polls + 1
+            step = host_rate.interval / steps
+            for i in range(1, steps + 1):
+                history["bytes_history"].append(bytes_per_minute)
+                history["packets_history"].append(packets_per_minute)
+                history["timestamps"].append(current_time - host_rate.interval + i * step)
 
-                        if bytes_per_minute > bytes_threshold:
-                            suspicious_reasons.append(
-                                f"Exceeded traffic threshold: {bytes_per_minute:,.0f} bytes/min (threshold: {bytes_threshold:,})"
-                            )
-                            severity = "alert"
+            history["last_check"] = current_time
+            history["current_bytes_per_min"] = bytes_per_minute
+            history["current_packets_per_min"] = packets_per_minute
 
-                        if packets_per_minute > packets_threshold:
-                            suspicious_reasons.append(
-                                f"Exceeded packet threshold: {packets_per_minute:,.0f} packets/min (threshold: {packets_threshold:,})"
-                            )
-                            severity = "alert"
-
-                        if suspicious_reasons:
-                            with blocked_ips_lock:
-                                if ip not in blocked_ips:
-                                    suspicious_ips.append(
-                                        {
-                                            "ip": ip,
-                                            "role": IP_TO_ROLE.get(ip, "unknown"),
-                                            "reasons": suspicious_reasons,
-                                            "severity": severity,
-                                            "bytes_per_minute": bytes_per_minute,
-                                            "packets_per_minute": packets_per_minute,
-                                        }
-                                    )
-
-                        history["last_bytes"] = traffic_data["bytes"]
-                        history["last_packets"] = traffic_data["packets"]
-                        history["last_check"] = current_time
-
-                        history["current_bytes_per_min"] = bytes_per_minute
-                        history["current_packets_per_min"] = packets_per_minute
-
-                        history["bytes_history"].append(bytes_per_minute)
-                        history["packets_history"].append(packets_per_minute)
-                        history["timestamps"].append(current_time)
-
-                        if len(history["bytes_history"]) > 10:
-                            history["bytes_history"] = history["bytes_history"][-10:]
-                            history["packets_history"] = history["packets_history"][
-                                -10:
-                            ]
-                            history["timestamps"] = history["timestamps"][-10:]
-                    else:
-                        continue
-
-                save_traffic_history()
+            if len(history["bytes_history"]) > 10:
+                history["bytes_history"] = history["bytes_history"][-10:]
+                history["packets_history"] = history["packets_history"][-10:]
+                history["timestamps"] = history["timestamps"][-10:]
 
-            for suspicious_ip_info in suspicious_ips:
-                suspicious_activity_queue.put(suspicious_ip_info, block=False)
+    return suspicious_ips
 
-            time.sleep(MONITORING_INTERVAL)
 
+def suspicious_activity_monitor():
+    while True:
+        try:
+            with profiling.cycle("suspicious_activity_monitor"):
+                check_suspicious_activity()
         except Exception as e:
             print(f"[Security] Error in suspicious activity monitor: {e}")
-            time.sleep(MONITORING_INTERVAL)
+        time.sleep(MONITORING_INTERVAL)
 
 
 def handle_suspicious_activity(activity_info):
@@ -678,6 +753,8 @@ def handle_suspicious_activity(activity_info):
 
 
 def main():
+    profiling.install_signal_handler()
+
     print("[Main] Clearing any existing ACL rules from previous runs...")
     clear_all_acl_rules()
 
@@ -716,6 +793,8 @@ def main():
         with traffic_lock:
             save_traffic_history()
         print("[Shutdown] Traffic history saved.")
+        if profiling.stage_stats:
+            profiling.print_stage_summary()
         print("[Shutdown] Goodbye!")
 
 
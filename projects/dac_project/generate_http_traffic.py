@@ -2,82 +2,331 @@
 """
 HTTP Traffic Generator for Mininet
 This script generates HTTP traffic between hosts in the network
+
+The client is a native asyncio load generator (no curl, standard library
+only, so it runs inside any Mininet host namespace). It keeps HTTP/1.1
+keep-alive connections open and runs in one of two modes:
+  closed: --concurrency workers each send the next request as soon as the
+          previous one is answered (plus the optional interval think time)
+  open:   requests are started at a fixed --rps no matter how fast the server
+          answers; latency counts from the scheduled start, so a slow server
+          shows up in the percentiles instead of silently lowering the rate
+Progress is printed once per second and a latency summary (p50/p90/p99) at
+the end.
+
+The server answers every GET with a fixed-size body over keep-alive
+connections, so one server can absorb thousands of requests per second.
 """
 
-import time
+import argparse
+import asyncio
+import math
 import sys
-import subprocess
-import threading
+import time
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (about 5% resolution)"""
+
+    BUCKETS_PER_E = 20
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = max(seconds * 1e6, 1.0)
+        bucket = int(math.log(micros) * self.BUCKETS_PER_E)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Latency in seconds below which p percent of the samples fall"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Upper edge of the bucket
+                return min(math.exp((bucket + 1) / self.BUCKETS_PER_E) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return "no responses"
+        ms = lambda seconds: f"{seconds * 1000:.2f}ms"
+        return (f"avg {ms(self.total / self.count)}, p50 {ms(self.percentile(50))}, "
+                f"p90 {ms(self.percentile(90))}, p99 {ms(self.percentile(99))}, "
+                f"max {ms(self.max)}")
+
+
+class LoadStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.window = LatencyHistogram()
+        self.scheduled = 0
+        self.sent = 0
+        self.ok = 0
+        self.errors = 0
+        self.status_counts = {}
+        self.bytes = 0
+
+    def record(self, status, latency, size):
+        self.ok += 1
+        self.bytes += size
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        self.latency.record(latency)
+        self.window.record(latency)
+
+
+async def read_response(reader):
+    """Read one HTTP response; return (status, body bytes, keep_alive)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ", 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip().lower()
+
+    keep_alive = headers.get("connection") != "close" and version != "HTTP/1.0"
+    size = 0
+    if "content-length" in headers:
+        size = int(headers["content-length"])
+        await reader.readexactly(size)
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            chunk = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(chunk + 2)
+            size += chunk
+            if chunk == 0:
+                break
+    else:
+        size = len(await reader.read())
+        keep_alive = False
+    return int(status), size, keep_alive
+
+
+async def worker(server_ip, port, path, stats, deadline, timeout,
+                 schedule=None, think=0):
+    """One keep-alive connection; requests come from schedule (open loop)
+    or back to back (closed loop)"""
+    request = (f"GET {path} HTTP/1.1\r\nHost: {server_ip}:{port}\r\n"
+               f"User-Agent: generate_http_traffic\r\n\r\n").encode()
+    reader = writer = None
+    while time.monotonic() < deadline:
+        if schedule is not None:
+            started = await schedule.get()
+            if started is None:
+                break
+        else:
+            started = time.monotonic()
 
-def generate_http_requests(server_ip, server_port=8080, interval=2, duration=60):
-    """Generate HTTP requests to a server"""
-    print(f"Starting HTTP client - sending requests to {server_ip}:{server_port}")
-    start_time = time.time()
-    request_count = 0
-    
-    while (time.time() - start_time) < duration:
         try:
-            # Use curl to make HTTP request
-            result = subprocess.run([
-                'curl', '-s', '-o', '/dev/null', '-w', '%{http_code}',
-                f'http://{server_ip}:{server_port}'
-            ], capture_output=True, text=True, timeout=5)
-            
-            request_count += 1
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            
-            if result.returncode == 0:
-                print(f"[{timestamp}] Request #{request_count}: HTTP {result.stdout}")
-            else:
-                print(f"[{timestamp}] Request #{request_count}: Failed")
-                
-        except subprocess.TimeoutExpired:
-            print(f"[{timestamp}] Request #{request_count}: Timeout")
-        except Exception as e:
-            print(f"[{timestamp}] Request #{request_count}: Error - {e}")
-            
-        time.sleep(interval)
-    
-    print(f"HTTP client finished. Sent {request_count} requests in {duration} seconds")
-
-def start_http_server(port=8080):
-    """Start a simple HTTP server"""
-    print(f"Starting HTTP server on port {port}")
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(server_ip, port), timeout)
+            stats.sent += 1
+            writer.write(request)
+            status, size, keep_alive = await asyncio.wait_for(
+                read_response(reader), timeout)
+            stats.record(status, time.monotonic() - started, size)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            if schedule is None:
+                # Do not spin on a refused connection
+                await asyncio.sleep(min(timeout, 0.1))
+
+        if think:
+            await asyncio.sleep(think)
+    if writer is not None:
+        writer.close()
+
+
+async def open_loop_schedule(schedule, stats, rps, deadline, workers):
+    """Queue one start time every 1/rps seconds until the deadline"""
+    interval = 1.0 / rps
+    next_start = time.monotonic()
+    while next_start < deadline:
+        now = time.monotonic()
+        if next_start > now:
+            await asyncio.sleep(next_start - now)
+        schedule.put_nowait(next_start)
+        stats.scheduled += 1
+        next_start += interval
+    for _ in range(workers):
+        schedule.put_nowait(None)
+
+
+async def report_progress(stats, deadline):
+    last_ok = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(1)
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        print(f"[{timestamp}] {stats.ok - last_ok} req/s, {stats.errors} errors, "
+              f"p50 {stats.window.percentile(50) * 1000:.2f}ms, "
+              f"p99 {stats.window.percentile(99) * 1000:.2f}ms")
+        last_ok = stats.ok
+        stats.window = LatencyHistogram()
+
+
+async def run_load(server_ip, port=8080, duration=60, concurrency=1, rps=0,
+                   mode="closed", think=0, path="/", timeout=5, quiet=False):
+    stats = LoadStats()
+    start = time.monotonic()
+    deadline = start + duration
+    schedule = asyncio.Queue() if mode == "open" else None
+
+    tasks = [
+        asyncio.ensure_future(worker(server_ip, port, path, stats, deadline,
+                                     timeout, schedule, think))
+        for _ in range(concurrency)
+    ]
+    if schedule is not None:
+        tasks.append(asyncio.ensure_future(
+            open_loop_schedule(schedule, stats, rps, deadline, concurrency)))
+    progress = None if quiet else asyncio.ensure_future(report_progress(stats, deadline))
+
+    await asyncio.gather(*tasks)
+    if progress is not None:
+        progress.cancel()
+    stats.elapsed = time.monotonic() - start
+    return stats
+
+
+def generate_http_requests(server_ip, server_port=8080, interval=2, duration=60,
+                           concurrency=1, rps=0, mode="closed", path="/", timeout=5):
+    """Generate HTTP requests to a server"""
+    if mode == "open" and rps <= 0:
+        raise ValueError("open loop mode needs a target --rps")
+    target = f"{rps:g} req/s" if mode == "open" else f"think time {interval:g}s"
+    print(f"Starting HTTP client - sending requests to {server_ip}:{server_port} "
+          f"({mode} loop, {concurrency} connections, {target})")
+
+    stats = asyncio.run(run_load(server_ip, server_port, duration, concurrency,
+                                 rps, mode, interval if mode == "closed" else 0,
+                                 path, timeout))
+
+    print(f"HTTP client finished. Sent {stats.sent} requests in {stats.elapsed:.1f} seconds "
+          f"({stats.ok / stats.elapsed:.1f} req/s, {stats.errors} errors, "
+          f"{stats.bytes * 8 / stats.elapsed / 1e6:.2f} Mbit/s)")
+    if mode == "open" and stats.scheduled > stats.sent:
+        print(f"Warning: {stats.scheduled - stats.sent} scheduled requests were never sent; "
+              f"raise --concurrency or lower --rps")
+    print("Status codes: " + (", ".join(
+        f"{status}: {count}" for status, count in sorted(stats.status_counts.items())
+    ) or "none"))
+    print(f"Latency: {stats.latency.summary()}")
+    return stats
+
+
+class TrafficHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this every
+    # response waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+    body = b""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TrafficServer(ThreadingHTTPServer):
+    # A deep accept backlog so bursts of new connections are not refused
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def start_http_server(port=8080, size=1024):
+    """Start a keep-alive HTTP server answering every GET with size bytes"""
+    print(f"Starting HTTP server on port {port} ({size} byte responses)")
+    handler = type("Handler", (TrafficHandler,), {"body": b"x" * size})
+    server = TrafficServer(("", port), handler)
     try:
-        subprocess.run(['python3', '-m', 'http.server', str(port)])
+        server.serve_forever()
     except KeyboardInterrupt:
         print("HTTP server stopped")
+    finally:
+        server.server_close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="HTTP traffic generator",
+        epilog="Examples:\n"
+               "  python3 generate_http_traffic.py server 8080\n"
+               "  python3 generate_http_traffic.py client 10.0.0.1 8080 1 30\n"
+               "  python3 generate_http_traffic.py client 10.0.0.1 8080 --mode open "
+               "--rps 2000 --concurrency 50 --duration 60",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    server = sub.add_parser("server", help="serve HTTP traffic")
+    server.add_argument("port", nargs="?", type=int, default=8080)
+    server.add_argument("--size", type=int, default=1024, help="response body bytes")
+
+    client = sub.add_parser("client", help="generate HTTP traffic")
+    client.add_argument("server_ip")
+    client.add_argument("port", nargs="?", type=int, default=8080)
+    client.add_argument("interval", nargs="?", type=float, default=None,
+                        help="closed loop think time between requests (default 2, "
+                             "0 when --concurrency or --rps is given)")
+    client.add_argument("duration_arg", nargs="?", type=float, default=None,
+                        metavar="duration")
+    client.add_argument("--duration", type=float, default=None)
+    client.add_argument("--mode", dest="loop", choices=["closed", "open"], default=None,
+                        help="default: open when --rps is given, closed otherwise")
+    client.add_argument("--rps", type=float, default=0, help="target requests per second")
+    client.add_argument("--concurrency", type=int, default=None,
+                        help="keep-alive connections (default 1, or enough for --rps)")
+    client.add_argument("--path", default="/")
+    client.add_argument("--timeout", type=float, default=5, help="per request seconds")
+    args = parser.parse_args()
+    if args.command == "client":
+        args.loop = args.loop or ("open" if args.rps > 0 else "closed")
+        if args.loop == "open" and args.rps <= 0:
+            parser.error("--mode open needs a target --rps")
+        if args.loop == "closed" and args.rps > 0:
+            parser.error("--rps only applies to --mode open")
+    return args
+
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  Server mode: python3 generate_http_traffic.py server [port]")
-        print("  Client mode: python3 generate_http_traffic.py client <server_ip> [port] [interval] [duration]")
-        print("")
-        print("Examples:")
-        print("  python3 generate_http_traffic.py server 8080")
-        print("  python3 generate_http_traffic.py client 10.0.0.1 8080 1 30")
-        sys.exit(1)
-    
-    mode = sys.argv[1]
-    
-    if mode == "server":
-        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
-        start_http_server(port)
-    
-    elif mode == "client":
-        if len(sys.argv) < 3:
-            print("Error: Client mode requires server IP")
-            sys.exit(1)
-            
-        server_ip = sys.argv[2]
-        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8080
-        interval = float(sys.argv[4]) if len(sys.argv) > 4 else 2
-        duration = int(sys.argv[5]) if len(sys.argv) > 5 else 60
-        
-        generate_http_requests(server_ip, port, interval, duration)
-    
-    else:
-        print(f"Unknown mode: {mode}")
-        sys.exit(1)
+    args = parse_args()
+
+    if args.command == "server":
+        start_http_server(args.port, args.size)
+        sys.exit(0)
+
+    duration = args.duration or args.duration_arg or 60
+    # Enough connections that each carries at most ~100 req/s at the target
+    concurrency = args.concurrency or (max(1, int(args.rps // 100)) if args.rps else 1)
+    interval = args.interval
+    if interval is None:
+        interval = 0 if (args.rps or args.concurrency) else 2
+
+    generate_http_requests(args.server_ip, args.port, interval, duration,
+                           concurrency, args.rps, args.loop, args.path, args.timeout)
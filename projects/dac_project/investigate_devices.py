@@ -1,33 +1,23 @@
 #!/usr/bin/env python3
 
-import requests
-import json
-import os
+from snapshot_client import SnapshotClient
 
-def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), 'data.json')
-    with open(config_path, 'r') as f:
-        return json.load(f)
+client = SnapshotClient()
 
 def investigate_devices():
     """Investigate what devices are being detected by Floodlight"""
     
-    config = load_config()
-    controller_url = config['floodlight_controller_url']
-    
     print("=== DEVICE INVESTIGATION ===")
-    print(f"Controller: {controller_url}")
+    print(f"Controller: {', '.join(client.shards)}")
     print()
     
-    # Get devices from Floodlight
     try:
-        devices_response = requests.get(f'{controller_url}/wm/device/')
-        if devices_response.status_code != 200:
-            print(f"Failed to get devices: {devices_response.status_code}")
+        snapshot = client.snapshot(refresh_devices=True)
+        if not snapshot.shards:
+            print("Failed to get devices")
             return
-            
-        devices_data = devices_response.json()
-        devices = devices_data.get('devices', [])
+        
+        devices = [device for _, device in snapshot.devices]
         
         print(f"Total devices detected: {len(devices)}")
         print()
@@ -113,29 +103,23 @@ def investigate_devices():
 def check_switches():
     """Check switch information"""
     
-    config = load_config()
-    controller_url = config['floodlight_controller_url']
-    
     print("\n=== SWITCH INFORMATION ===")
     
     try:
-        switches_response = requests.get(f'{controller_url}/wm/core/controller/switches/json')
-        if switches_response.status_code == 200:
-            switches = switches_response.json()
-            print(f"Connected switches: {len(switches)}")
+        snapshot = client.snapshot(refresh_devices=False)
+        print(f"Connected switches: {len(snapshot.switches)}")
+        
+        # Switch descriptions, fetched in parallel
+        descriptions = client.per_switch(snapshot, 'desc')
+        for switch_id in sorted(snapshot.switches):
+            print(f"  Switch: {switch_id}")
             
-            for switch in switches:
-                switch_id = switch['switchDPID']
-                print(f"  Switch: {switch_id}")
-                
-                # Get more details about this switch
-                switch_desc_response = requests.get(f'{controller_url}/wm/core/switch/{switch_id}/desc/json')
-                if switch_desc_response.status_code == 200:
-                    desc_data = switch_desc_response.json()
-                    desc = desc_data.get(switch_id, {})
-                    print(f"    Description: {desc.get('description', 'N/A')}")
-                    print(f"    Hardware: {desc.get('hardware', 'N/A')}")
-                    print(f"    Software: {desc.get('software', 'N/A')}")
+            desc_data = descriptions.get(switch_id)
+            if desc_data is not None:
+                desc = desc_data.get(switch_id, {})
+                print(f"    Description: {desc.get('description', 'N/A')}")
+                print(f"    Hardware: {desc.get('hardware', 'N/A')}")
+                print(f"    Software: {desc.get('software', 'N/A')}")
                 
     except Exception as e:
         print(f"Error checking switches: {e}")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Inter-switch link utilization and hotspot detection.
+
+Links come from the controller's /wm/topology/links/json or, with
+--links mininet, from the running topology.py's lifecycle manifest (its
+switch-to-switch interface pairs, e.g. s1-eth4 <-> s4-eth4). Every poll:
+  * one SnapshotClient poll (bulk port stats)
+  * only the link ports go through the wrap/reset aware CounterRateEngine
+  * each direction's rate is the larger of the sender's TX and the
+    receiver's RX, and utilization is that rate over the link capacity
+    (monitoring.link_capacity_mbps in data.json, or --capacity-mbps)
+The link -> port slot mapping is rebuilt only when the link set changes, so
+a poll costs O(link ports) regardless of how many hosts the fabric has.
+
+A link becomes a hotspot when either direction stays at or above --hot
+utilization (monitoring.hotspot_utilization) for --sustain polls in a row,
+and clears below --clear.
+
+    python3 link_utilization.py
+    python3 link_utilization.py --links mininet --interval 1 --hot 0.7 --json
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from rate_engine import CounterRateEngine, plausible_link_mbps
+from snapshot_client import PortCounters, SnapshotClient, load_config
+
+DEFAULT_CAPACITY_MBPS = 1000
+DEFAULT_HOT = 0.8
+LINK_REFRESH = 30
+
+# a, b: dpid:port keys of both ends; label: what to print
+Link = namedtuple("Link", ["a", "b", "label"])
+
+
+def mininet_dpid(switch_name):
+    """Floodlight-style DPID Mininet derives from a switch name (s12 -> ...:00:0c)"""
+    raw = "%016x" % int("".join(ch for ch in switch_name if ch.isdigit()))
+    return ":".join(raw[i:i + 2] for i in range(0, 16, 2))
+
+
+def links_from_manifest(name="default"):
+    """Switch-to-switch links of the running topology.py, or None without a manifest"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from sdn_utils import lifecycle
+
+    manifest = lifecycle.load_manifest(name)
+    if manifest is None:
+        return None
+    links = []
+    for intf1, intf2 in manifest.get("links", []):
+        ends = []
+        for intf in (intf1, intf2):
+            switch, _, port = intf.rpartition("-eth")
+            if not switch or not port.isdigit() or not any(ch.isdigit() for ch in switch):
+                break
+            ends.append(f"{mininet_dpid(switch)}:{port}")
+        else:
+            links.append(Link(ends[0], ends[1], f"{intf1} <-> {intf2}"))
+    return links
+
+
+def links_from_controller(client):
+    links = client.fetch_links()
+    if links is None:
+        return None
+    return [Link(a, b, f"{a} <-> {b}") for a, b in links]
+
+
+class LinkMonitor:
+    """Per-link rates and hotspot state, one array slot per link"""
+
+    def __init__(self, capacity_mbps=DEFAULT_CAPACITY_MBPS, hot=DEFAULT_HOT,
+                 clear=None, sustain=2, interval=5):
+        self.capacity = capacity_mbps * 1e6 / 8
+        self.hot = hot
+        self.clear = clear if clear is not None else hot * 0.9
+        self.sustain = sustain
+        self.engine = CounterRateEngine(
+            counters=PortCounters._fields,
+            expected_interval=interval,
+            max_link_mbps=plausible_link_mbps(max(capacity_mbps, DEFAULT_CAPACITY_MBPS)),
+        )
+        self.links = []
+        self.port_keys = ()
+        self.forward = array("d")     # a -> b bytes/s
+        self.backward = array("d")    # b -> a bytes/s
+        self.utilization = array("d")
+        self.streak = array("i")
+        self.is_hot = array("b")
+        self.updated = 0.0
+
+    def set_links(self, links):
+        """Install a (possibly new) link set, keeping state of links that stay"""
+        links = sorted(links)
+        if [(link.a, link.b) for link in links] == [(link.a, link.b) for link in self.links]:
+            self.links = links
+            return False
+        previous = {(link.a, link.b): i for i, link in enumerate(self.links)}
+        old_ports = set(self.port_keys)
+
+        forward, backward, utilization = array("d"), array("d"), array("d")
+        streak, is_hot = array("i"), array("b")
+        for link in links:
+            i = previous.get((link.a, link.b))
+            forward.append(self.forward[i] if i is not None else 0.0)
+            backward.append(self.backward[i] if i is not None else 0.0)
+            utilization.append(self.utilization[i] if i is not None else 0.0)
+            streak.append(self.streak[i] if i is not None else 0)
+            is_hot.append(self.is_hot[i] if i is not None else 0)
+        self.links = links
+        self.forward, self.backward, self.utilization = forward, backward, utilization
+        self.streak, self.is_hot = streak, is_hot
+        self.port_keys = tuple({key for link in links for key in (link.a, link.b)})
+        self.engine.forget(old_ports - set(self.port_keys))
+        return True
+
+    def update(self, snapshot):
+        """Fold one snapshot in; return [(slot, "hot" | "clear")] state changes"""
+        ports = snapshot.ports
+        counters = {key: ports[key] for key in self.port_keys if key in ports}
+        rates = self.engine.update(counters, snapshot.time, snapshot.switch_epochs)
+
+        capacity = self.capacity
+        events = []
+        for slot, link in enumerate(self.links):
+            rate_a = rates.get(link.a)
+            rate_b = rates.get(link.b)
+            a = rate_a.rates if rate_a is not None else None
+            b = rate_b.rates if rate_b is not None else None
+            if a is None and b is None:
+                continue
+            # PortCounters order: rx_packets, tx_packets, rx_bytes, tx_bytes
+            forward = max(a[3] if a else 0.0, b[2] if b else 0.0)
+            backward = max(b[3] if b else 0.0, a[2] if a else 0.0)
+            utilization = max(forward, backward) / capacity
+            self.forward[slot] = forward
+            self.backward[slot] = backward
+            self.utilization[slot] = utilization
+
+            if self.is_hot[slot]:
+                if utilization < self.clear:
+                    self.is_hot[slot] = 0
+                    self.streak[slot] = 0
+                    events.append((slot, "clear"))
+            elif utilization >= self.hot:
+                self.streak[slot] += 1
+                if self.streak[slot] >= self.sustain:
+                    self.is_hot[slot] = 1
+                    events.append((slot, "hot"))
+            else:
+                self.streak[slot] = 0
+        self.updated = snapshot.time
+        return events
+
+    def describe(self, slot):
+        link = self.links[slot]
+        return {
+            "link": link.label,
+            "a": link.a,
+            "b": link.b,
+            "a_to_b_mbps": round(self.forward[slot] * 8 / 1e6, 3),
+            "b_to_a_mbps": round(self.backward[slot] * 8 / 1e6, 3),
+            "utilization": round(self.utilization[slot], 4),
+            "hotspot": bool(self.is_hot[slot]),
+        }
+
+    def top(self, count):
+        return heapq.nlargest(count, range(len(self.links)), key=self.utilization.__getitem__)
+
+
+def print_event(monitor, slot, event):
+    info = monitor.describe(slot)
+    stamp = time.strftime("%H:%M:%S", time.localtime(monitor.updated))
+    if event == "hot":
+        print(f"[Links] {stamp} HOTSPOT {info['link']}: {info['utilization']:.0%} "
+              f"({info['a_to_b_mbps']:,.1f} / {info['b_to_a_mbps']:,.1f} Mbps)", flush=True)
+    else:
+        print(f"[Links] {stamp} cleared {info['link']}: {info['utilization']:.0%}", flush=True)
+
+
+def print_report(monitor, count):
+    hot = sum(monitor.is_hot)
+    stamp = time.strftime("%H:%M:%S", time.localtime(monitor.updated))
+    print(f"\n=== {stamp}: {len(monitor.links)} links, {hot} hotspot(s), "
+          f"capacity {monitor.capacity * 8 / 1e6:,.0f} Mbps ===")
+    print(f"{'Link':<56} {'A->B Mbps':>11} {'B->A Mbps':>11} {'Util':>6}")
+    for slot in monitor.top(count):
+        info = monitor.describe(slot)
+        flag = "  🔥" if info["hotspot"] else ""
+        print(f"{info['link']:<56} {info['a_to_b_mbps']:>11,.2f} {info['b_to_a_mbps']:>11,.2f} "
+              f"{info['utilization']:>6.0%}{flag}", flush=True)
+
+
+def load_links(args, client):
+    if args.links == "mininet":
+        return links_from_manifest(args.name)
+    return links_from_controller(client)
+
+
+def run(args):
+    monitoring = load_config().get("monitoring", {})
+    capacity = args.capacity_mbps or monitoring.get("link_capacity_mbps", DEFAULT_CAPACITY_MBPS)
+    hot = args.hot or monitoring.get("hotspot_utilization", DEFAULT_HOT)
+    client = SnapshotClient(device_ttl=float("inf"))
+    monitor = LinkMonitor(capacity, hot, args.clear, args.sustain, args.interval)
+
+    next_poll = time.monotonic()
+    next_report = next_poll + args.report
+    next_links = next_poll
+    while True:
+        if time.monotonic() >= next_links:
+            links = load_links(args, client)
+            if links is None:
+                print(f"[Links] No links from {args.links}; "
+                      + ("is topology.py running?" if args.links == "mininet"
+                         else "does the controller serve /wm/topology/links/json?"),
+                      file=sys.stderr)
+            elif monitor.set_links(links):
+                print(f"[Links] Watching {len(links)} inter-switch links", file=sys.stderr)
+            next_links = time.monotonic() + LINK_REFRESH
+
+        snapshot = client.snapshot(refresh_devices=False)
+        if snapshot.shards and monitor.links:
+            for slot, event in monitor.update(snapshot):
+                if args.json:
+                    print(json.dumps(dict(monitor.describe(slot), event=event,
+                                          time=round(monitor.updated, 3))), flush=True)
+                else:
+                    print_event(monitor, slot, event)
+
+        if time.monotonic() >= next_report and monitor.updated:
+            if args.json:
+                print(json.dumps({
+                    "time": round(monitor.updated, 3),
+                    "links": len(monitor.links),
+                    "hotspots": [monitor.describe(slot) for slot in range(len(monitor.links))
+                                 if monitor.is_hot[slot]],
+                    "top": [monitor.describe(slot) for slot in monitor.top(args.top)],
+                }), flush=True)
+            else:
+                print_report(monitor, args.top)
+            next_report = time.monotonic() + args.report
+
+        next_poll += args.interval
+        if next_poll < time.monotonic():
+            next_poll = time.monotonic()
+        time.sleep(max(0.0, next_poll - time.monotonic()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inter-switch link utilization and hotspots")
+    parser.add_argument("--links", choices=["controller", "mininet"], default="controller",
+                        help="where the link list comes from")
+    parser.add_argument("--name", default="default", help="lifecycle manifest name (--links mininet)")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between reports")
+    parser.add_argument("--capacity-mbps", type=float,
+                        help=f"link capacity (default: monitoring.link_capacity_mbps "
+                             f"or {DEFAULT_CAPACITY_MBPS})")
+    parser.add_argument("--hot", type=float,
+                        help=f"utilization that makes a link a hotspot (default: "
+                             f"monitoring.hotspot_utilization or {DEFAULT_HOT})")
+    parser.add_argument("--clear", type=float, help="utilization that clears it (default: 0.9 * hot)")
+    parser.add_argument("--sustain", type=int, default=2,
+                        help="polls in a row above --hot before flagging")
+    parser.add_argument("--top", type=int, default=10, help="links per report")
+    parser.add_argument("--json", action="store_true", help="JSON lines instead of tables")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    try:
+        run(parse_args())
+    except KeyboardInterrupt:
+        pass
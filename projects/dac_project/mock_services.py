@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Mock protocol services for ACL testing.
+
+One asyncio process per host listens on every TCP port in data.json's
+protocols at once (SSH 22, FTP 21, HTTP 80, HTTPS 443, RDP 3389, ...) with
+a large accept backlog, so connection floods during ACL tests are served
+instead of dropped. Each connection gets a protocol-looking greeting (SSH
+and FTP banners, an HTTP response per request) and is then drained until
+the client closes or goes idle.
+
+Per-port counters (accepted, active, peak, bytes in/out, errors) can be
+queried at any time from inside the same host:
+    h1 python3 mock_services.py stats
+(a JSON reply from the control port on the host's loopback).
+
+With --confirm there are no greetings: the service answers the client's
+EOF with the number of bytes it received (used by traffic_mix.py).
+
+Usage (inside a Mininet host):
+    h1 python3 mock_services.py > /tmp/h1_services.log 2>&1 &
+    h1 python3 mock_services.py --ports 22,80 --backlog 8192
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import struct
+import sys
+import time
+
+
+CONTROL_PORT = 7999
+DEFAULT_BACKLOG = 4096
+IDLE_TIMEOUT = 30
+
+BANNERS = {
+    "SSH": b"SSH-2.0-MockSSH\r\n",
+    "FTP": b"220 Mock FTP service ready\r\n",
+    "SMTP": b"220 mock.local ESMTP\r\n",
+    "Telnet": b"Mock telnet\r\nlogin: ",
+}
+
+# --confirm: reply to the client's EOF with the bytes received (traffic_mix.py)
+DELIVERED = struct.Struct("!Q")
+
+HTTP_RESPONSE = (b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                 b"Content-Length: 3\r\n\r\nok\n")
+
+
+def load_protocols():
+    config_path = os.path.join(os.path.dirname(__file__), "data.json")
+    with open(config_path, "r") as f:
+        protocols = json.load(f)["protocols"]
+    return {int(info["port"]): name for name, info in protocols.items() if info["id"] == "TCP"}
+
+
+class PortCounters:
+    def __init__(self):
+        self.accepted = 0
+        self.active = 0
+        self.peak_active = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class MockServices:
+    def __init__(self, ports, backlog=DEFAULT_BACKLOG, idle_timeout=IDLE_TIMEOUT,
+                 verbose=False, confirm=False):
+        self.ports = ports
+        self.confirm = confirm
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.verbose = verbose
+        self.counters = {port: PortCounters() for port in ports}
+        self.started = time.time()
+
+    async def handle(self, port, reader, writer):
+        counters = self.counters[port]
+        counters.accepted += 1
+        counters.active += 1
+        counters.peak_active = max(counters.peak_active, counters.active)
+        protocol = self.ports[port]
+        if self.verbose:
+            peer = writer.get_extra_info("peername")
+            print(f"[{protocol}:{port}] Connection from {peer[0]}:{peer[1]}", flush=True)
+        received = 0
+        try:
+            banner = None if self.confirm else BANNERS.get(protocol)
+            if banner:
+                writer.write(banner)
+                counters.bytes_out += len(banner)
+            pending = b""
+            while True:
+                data = await asyncio.wait_for(reader.read(65536), self.idle_timeout)
+                if not data:
+                    if self.confirm:
+                        writer.write(DELIVERED.pack(received))
+                        counters.bytes_out += DELIVERED.size
+                        await writer.drain()
+                    break
+                counters.bytes_in += len(data)
+                received += len(data)
+                if self.confirm:
+                    continue
+                if protocol in ("HTTP", "HTTPS"):
+                    # One response per request header block, keep-alive
+                    pending += data
+                    requests = pending.count(b"\r\n\r\n")
+                    if requests:
+                        pending = pending[pending.rfind(b"\r\n\r\n") + 4:]
+                        writer.write(HTTP_RESPONSE * requests)
+                        counters.bytes_out += len(HTTP_RESPONSE) * requests
+                await writer.drain()
+        except asyncio.TimeoutError:
+            pass
+        except OSError:
+            counters.errors += 1
+        finally:
+            counters.active -= 1
+            writer.close()
+
+    def stats(self):
+        return {
+            "uptime": round(time.time() - self.started, 1),
+            "ports": {
+                f"{port}/{self.ports[port]}": counters.as_dict()
+                for port, counters in sorted(self.counters.items())
+            },
+        }
+
+    async def control(self, reader, writer):
+        writer.write(json.dumps(self.stats()).encode() + b"\n")
+        await writer.drain()
+        writer.close()
+
+    async def listen(self, port, handler, host="0.0.0.0"):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.setblocking(False)
+        # start_server listens again when it starts serving; without backlog=
+        # that call would shrink the queue back to asyncio's default of 100
+        return await asyncio.start_server(handler, sock=sock, backlog=self.backlog)
+
+    async def run(self):
+        servers = []
+        for port in self.ports:
+            try:
+                servers.append(await self.listen(
+                    port, lambda r, w, port=port: self.handle(port, r, w)))
+            except OSError as e:
+                print(f"[MockServices] Cannot listen on {port}: {e}", flush=True)
+                self.counters.pop(port)
+        try:
+            servers.append(await self.listen(CONTROL_PORT, self.control, "127.0.0.1"))
+        except OSError as e:
+            print(f"[MockServices] No stats port ({e}); is another instance running?", flush=True)
+        print(f"[MockServices] Listening on "
+              + ", ".join(f"{self.ports[port]}:{port}" for port in sorted(self.counters))
+              + f" (backlog {self.backlog}, stats on 127.0.0.1:{CONTROL_PORT})", flush=True)
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+def raise_fd_limit():
+    """Allow as many open connections as the hard limit permits"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def query_stats(port=CONTROL_PORT):
+    with socket.create_connection(("127.0.0.1", port), timeout=2) as sock:
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+def print_stats(stats):
+    print(f"Uptime: {stats['uptime']}s")
+    print(f"{'Port':<12} {'Accepted':>9} {'Active':>7} {'Peak':>6} {'Bytes in':>12} "
+          f"{'Bytes out':>12} {'Errors':>7}")
+    for port, counters in stats["ports"].items():
+        print(f"{port:<12} {counters['accepted']:>9} {counters['active']:>7} "
+              f"{counters['peak_active']:>6} {counters['bytes_in']:>12} "
+              f"{counters['bytes_out']:>12} {counters['errors']:>7}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock protocol services for ACL testing")
+    parser.add_argument("command", nargs="?", choices=["serve", "stats"], default="serve")
+    parser.add_argument("--ports", help="comma separated ports (default: TCP protocols in data.json)")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="close connections silent for this many seconds")
+    parser.add_argument("--json", action="store_true", help="stats: print raw JSON")
+    parser.add_argument("--verbose", action="store_true", help="log every connection")
+    parser.add_argument("--confirm", action="store_true",
+                        help="no greetings; answer the client's EOF with the byte count")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "stats":
+        try:
+            stats = query_stats()
+        except OSError as e:
+            print(f"mock_services is not running on this host: {e}")
+            sys.exit(1)
+        if args.json:
+            print(json.dumps(stats, indent=2))
+        else:
+            print_stats(stats)
+        sys.exit(0)
+
+    protocols = load_protocols()
+    if args.ports:
+        ports = {int(port): protocols.get(int(port), str(port)) for port in args.ports.split(",")}
+    else:
+        ports = protocols
+    raise_fd_limit()
+    try:
+        asyncio.run(MockServices(ports, args.backlog, args.idle_timeout, args.verbose,
+                                 args.confirm).run())
+    except KeyboardInterrupt:
+        pass
@@ -1,19 +1,44 @@
 #!/usr/bin/env python3
 """
 Monitor port statistics in real-time to see if they're updating
+
+Default: watch h1 and h2's switch ports every 5 seconds.
+
+--live: every port on every switch, polled with one bulk request per
+controller every --interval seconds (sub-second is fine). Rates come from
+the wrap/reset aware CounterRateEngine and are kept in flat arrays, one slot
+per port. Only ports whose rate moved by more than --threshold (relative)
+and --min-pps (absolute) since they were last printed are emitted.
+
+--top: the same live rates as a full-screen table sorted by rate
+(p: sort by packets, b: by bytes, q: quit).
+
+    python3 monitor_ports.py --live --interval 0.5 --threshold 0.2
+    python3 monitor_ports.py --top
 """
 
-import requests
+import argparse
+import curses
+import heapq
 import json
+import sys
 import time
+from array import array
+
+from rate_engine import CounterRateEngine
+from snapshot_client import SnapshotClient
 
-FLOODLIGHT_CONTROLLER_URL = "http://localhost:8080"
+# Order of snapshot_client.PortCounters
+RATE_COUNTERS = ("rx_packets", "tx_packets", "rx_bytes", "tx_bytes")
+WIDTH = len(RATE_COUNTERS)
 
 def monitor_port_stats():
     print("=== Monitoring Port Statistics ===")
     print("Watching h1 (switch 00:00:00:00:00:00:00:01:3) and h2 (switch 00:00:00:00:00:00:00:02:3)")
     print("Press Ctrl+C to stop\n")
     
+    client = SnapshotClient()
+    
     # Track previous values
     prev_stats = {}
     
@@ -27,38 +52,29 @@ def monitor_port_stats():
             h2_switch = "00:00:00:00:00:00:00:02"
             h2_port = "3"
             
+            # One bulk port request per controller, no device lookups
+            snapshot = client.snapshot(refresh_devices=False)
+            
             for switch_id, port_num, host_name in [(h1_switch, h1_port, "h1"), (h2_switch, h2_port, "h2")]:
-                port_response = requests.get(f'{FLOODLIGHT_CONTROLLER_URL}/wm/core/switch/{switch_id}/port/json')
+                key = f"{switch_id}:{port_num}"
+                counters = snapshot.ports.get(key)
                 
-                if port_response.status_code == 200:
-                    port_data = port_response.json()
-                    ports = port_data.get('port_reply', [{}])[0].get('port', [])
+                if counters is not None:
+                    total_packets = counters.rx_packets + counters.tx_packets
+                    total_bytes = counters.rx_bytes + counters.tx_bytes
+                    
+                    if key in prev_stats:
+                        packet_delta = total_packets - prev_stats[key]['packets']
+                        byte_delta = total_bytes - prev_stats[key]['bytes']
+                        
+                        if packet_delta > 0 or byte_delta > 0:
+                            print(f"{host_name}: +{packet_delta} packets, +{byte_delta} bytes (Total: {total_packets} packets, {total_bytes:,} bytes)")
+                        else:
+                            print(f"{host_name}: No change (Total: {total_packets} packets, {total_bytes:,} bytes)")
+                    else:
+                        print(f"{host_name}: Initial - {total_packets} packets, {total_bytes:,} bytes")
                     
-                    for port in ports:
-                        if str(port.get('port_number')) == port_num:
-                            rx_packets = int(port.get('receive_packets', 0))
-                            tx_packets = int(port.get('transmit_packets', 0))
-                            rx_bytes = int(port.get('receive_bytes', 0))
-                            tx_bytes = int(port.get('transmit_bytes', 0))
-                            
-                            total_packets = rx_packets + tx_packets
-                            total_bytes = rx_bytes + tx_bytes
-                            
-                            key = f"{switch_id}:{port_num}"
-                            
-                            if key in prev_stats:
-                                packet_delta = total_packets - prev_stats[key]['packets']
-                                byte_delta = total_bytes - prev_stats[key]['bytes']
-                                
-                                if packet_delta > 0 or byte_delta > 0:
-                                    print(f"{host_name}: +{packet_delta} packets, +{byte_delta} bytes (Total: {total_packets} packets, {total_bytes:,} bytes)")
-                                else:
-                                    print(f"{host_name}: No change (Total: {total_packets} packets, {total_bytes:,} bytes)")
-                            else:
-                                print(f"{host_name}: Initial - {total_packets} packets, {total_bytes:,} bytes")
-                            
-                            prev_stats[key] = {'packets': total_packets, 'bytes': total_bytes}
-                            break
+                    prev_stats[key] = {'packets': total_packets, 'bytes': total_bytes}
                 else:
                     print(f"{host_name}: Error getting port stats")
             
@@ -68,5 +84,197 @@ def monitor_port_stats():
     except KeyboardInterrupt:
         print("\nStopped monitoring")
 
+class LiveMonitor:
+    """Per-port rates of every switch, one array slot per dpid:port"""
+
+    def __init__(self, client, interval, threshold=0.2, min_pps=10):
+        self.client = client
+        self.interval = interval
+        self.threshold = threshold
+        self.min_pps = min_pps
+        self.engine = CounterRateEngine(counters=RATE_COUNTERS, expected_interval=interval)
+        self.keys = []               # slot -> dpid:port
+        self.rates = array("d")      # WIDTH rates per slot
+        self.reported = array("d")   # packets/s (rx + tx) last emitted per slot
+        self.seen = array("d")       # time of the last poll that returned the port
+        self.owners = {}
+        self.device_index = None
+        self.polls = 0
+        self.last_poll = 0.0
+        self.poll_seconds = 0.0
+
+    def _grow(self):
+        slots = self.engine.slots
+        if len(slots) == len(self.keys):
+            return
+        self.keys = list(slots)
+        missing = len(self.keys) - len(self.seen)
+        self.rates.extend([0.0] * (missing * WIDTH))
+        self.reported.extend([0.0] * missing)
+        self.seen.extend([0.0] * missing)
+
+    def poll(self):
+        """Fetch one snapshot; return [(slot, previous packets/s)] of changed ports"""
+        start = time.monotonic()
+        snapshot = self.client.snapshot()
+        if snapshot.device_index is not self.device_index:
+            self.device_index = snapshot.device_index
+            self.owners = snapshot.port_owners()
+
+        results = self.engine.update(snapshot.ports, snapshot.time, snapshot.switch_epochs)
+        self._grow()
+
+        slots = self.engine.slots
+        rates = self.rates
+        reported = self.reported
+        seen = self.seen
+        now = snapshot.time
+        threshold = self.threshold
+        min_pps = self.min_pps
+        changed = []
+        for port_key in snapshot.ports:
+            seen[slots[port_key]] = now
+        for port_key, port_rate in results.items():
+            if port_rate.rates is None:
+                continue
+            slot = slots[port_key]
+            rates[slot * WIDTH:(slot + 1) * WIDTH] = array("d", port_rate.rates)
+            pps = port_rate.rates[0] + port_rate.rates[1]
+            previous = reported[slot]
+            if abs(pps - previous) > max(threshold * previous, min_pps):
+                reported[slot] = pps
+                changed.append((slot, previous))
+
+        self.polls += 1
+        self.last_poll = now
+        self.poll_seconds = time.monotonic() - start
+        return changed
+
+    def active_slots(self):
+        last_poll = self.last_poll
+        return [slot for slot, seen in enumerate(self.seen) if seen == last_poll]
+
+    def label(self, slot):
+        port_key = self.keys[slot]
+        owner = self.owners.get(port_key)
+        return f"{port_key} ({owner})" if owner else port_key
+
+    def format_rates(self, slot):
+        rx_pps, tx_pps, rx_bps, tx_bps = self.rates[slot * WIDTH:(slot + 1) * WIDTH]
+        return (f"RX {rx_pps:>9,.1f} pkt/s {rx_bps * 8 / 1e6:>9.2f} Mbps  "
+                f"TX {tx_pps:>9,.1f} pkt/s {tx_bps * 8 / 1e6:>9.2f} Mbps")
+
+
+def sleep_until(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def next_deadline(deadline, interval):
+    """Next poll time; polls that are already late are skipped, not bunched up"""
+    deadline += interval
+    now = time.monotonic()
+    if deadline < now:
+        deadline = now
+    return deadline
+
+
+def run_live(monitor):
+    print(f"=== Live port monitor: every {monitor.interval}s, "
+          f"changes over {monitor.threshold:.0%} and {monitor.min_pps} pkt/s ===")
+    print("Press Ctrl+C to stop\n")
+    deadline = time.monotonic()
+    try:
+        while True:
+            changed = monitor.poll()
+            if monitor.polls == 1:
+                print(f"[Live] Tracking {len(monitor.active_slots())} ports on "
+                      f"{len(monitor.client.shards)} controller(s), "
+                      f"poll took {monitor.poll_seconds * 1000:.0f} ms", flush=True)
+            if changed:
+                stamp = time.strftime("%H:%M:%S", time.localtime(monitor.last_poll))
+                lines = [
+                    f"{stamp} {monitor.label(slot):<40} {monitor.format_rates(slot)}"
+                    f"  (was {previous:,.1f} pkt/s)"
+                    for slot, previous in changed
+                ]
+                print("\n".join(lines), flush=True)
+            deadline = next_deadline(deadline, monitor.interval)
+            sleep_until(deadline)
+    except KeyboardInterrupt:
+        print("\nStopped monitoring")
+
+
+def draw_top(stdscr, monitor, sort_by):
+    height, width = stdscr.getmaxyx()
+    stdscr.erase()
+    slots = monitor.active_slots()
+    rates = monitor.rates
+    offset = 0 if sort_by == "packets" else 2
+    top = heapq.nlargest(
+        max(0, height - 4), slots,
+        key=lambda slot: rates[slot * WIDTH + offset] + rates[slot * WIDTH + offset + 1],
+    )
+    header = (f"{time.strftime('%H:%M:%S')}  {len(slots)} ports  "
+              f"poll {monitor.poll_seconds * 1000:.0f} ms every {monitor.interval}s  "
+              f"sorted by {sort_by}  (p/b: sort, q: quit)")
+    stdscr.addnstr(0, 0, header, width - 1, curses.A_REVERSE)
+    stdscr.addnstr(2, 0, f"{'Port':<40} {'Rates'}", width - 1, curses.A_BOLD)
+    for row, slot in enumerate(top, start=3):
+        stdscr.addnstr(row, 0, f"{monitor.label(slot):<40} {monitor.format_rates(slot)}", width - 1)
+    stdscr.refresh()
+
+
+def top_view(stdscr, monitor):
+    curses.curs_set(0)
+    sort_by = "packets"
+    deadline = time.monotonic()
+    while True:
+        if time.monotonic() >= deadline:
+            monitor.poll()
+            deadline = next_deadline(deadline, monitor.interval)
+        draw_top(stdscr, monitor, sort_by)
+        stdscr.timeout(max(0, int((deadline - time.monotonic()) * 1000)))
+        key = stdscr.getch()
+        if key in (ord("q"), 27):
+            return
+        if key == ord("p"):
+            sort_by = "packets"
+        elif key == ord("b"):
+            sort_by = "bytes"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Monitor switch port statistics")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--live", action="store_true",
+                      help="stream rate changes of every port on every switch")
+    mode.add_argument("--top", action="store_true", help="full-screen view sorted by rate")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between polls")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative rate change that gets a port printed")
+    parser.add_argument("--min-pps", type=float, default=10,
+                        help="ignore rate changes smaller than this many packets/s")
+    parser.add_argument("--device-refresh", type=float, default=30,
+                        help="seconds between host lookups for port labels")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    monitor_port_stats()
+    args = parse_args()
+    if not (args.live or args.top):
+        monitor_port_stats()
+        sys.exit(0)
+
+    monitor = LiveMonitor(
+        SnapshotClient(device_ttl=args.device_refresh),
+        args.interval, args.threshold, args.min_pps,
+    )
+    if args.live:
+        run_live(monitor)
+    else:
+        try:
+            curses.wrapper(top_view, monitor)
+        except KeyboardInterrupt:
+            pass
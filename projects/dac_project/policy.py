@@ -0,0 +1,106 @@
+"""
+Expected outcome of the DAC policies, computed the same way dac_app.py
+installs them:
+  * role rules: blocked_protocols of the source host's role are denied
+    (ACL on src-ip and destination port, any destination)
+  * time rules: outside business hours every time_blocked_protocol is
+    denied for everyone
+  * threshold blocks: hosts dac_app.py caught exceeding a traffic threshold
+    are denied everything (ACL on src-ip alone), both as source and, since
+    their replies are dropped too, as destination. These only exist at run
+    time; threshold_blocks() reads them back from the controller's rules.
+Hosts missing from users.json get no role rules.
+"""
+
+import ipaddress
+import json
+import os
+from datetime import datetime
+
+
+def load_config():
+    config_path = os.path.join(os.path.dirname(__file__), "data.json")
+    with open(config_path, "r") as f:
+        return json.load(f)
+
+
+def load_users():
+    users_path = os.path.join(os.path.dirname(__file__), "users.json")
+    if not os.path.exists(users_path):
+        return []
+    with open(users_path, "r") as f:
+        return json.load(f)
+
+
+def ip_to_role(users=None):
+    return {user["ip"]: user["role"] for user in (users if users is not None else load_users())}
+
+
+def policy_hour(config, now=None):
+    """Hour of day as dac_app.py sees it (local time shifted by utc_timezone)"""
+    now = now or datetime.now()
+    return (now.hour + config.get("utc_timezone", 0)) % 24
+
+
+def business_hours(config, hour):
+    hours = config["time_policies"]["business_hours"]
+    return hours["start"] <= hour < hours["end"]
+
+
+def _rule_source(rule):
+    """(address, prefix length) of an ACL rule's source, as posted or as listed"""
+    if "src-ip" in rule:
+        address, _, bits = str(rule["src-ip"]).partition("/")
+        return address, int(bits or 32)
+    address = rule.get("nw_src_prefix")
+    if isinstance(address, int):
+        # Older Floodlight lists addresses as (signed) Java ints
+        address = str(ipaddress.IPv4Address(address & 0xFFFFFFFF))
+    return address, rule.get("nw_src_maskbits", 32)
+
+
+def threshold_blocks(rules):
+    """Source IPs of dac_app.py's threshold blocks in /wm/acl/rules/json rules
+
+    Those are DENY rules for a single source address on every protocol; role
+    and time rules always carry a protocol and destination port.
+    """
+    blocked = set()
+    for rule in rules:
+        if str(rule.get("action", "")).upper() != "DENY":
+            continue
+        if rule.get("nw_proto") or rule.get("tp_dst") or "nw-proto" in rule or "tp-dst" in rule:
+            continue
+        address, bits = _rule_source(rule)
+        if address and bits == 32:
+            blocked.add(address)
+    return blocked
+
+
+def expected_allowed(config, role, protocol, hour):
+    """(allowed, reason) for a connection from a host with role to protocol"""
+    if protocol not in config["protocols"]:
+        return True, "no rule"
+    blocked = config["roles"].get(role, {}).get("blocked_protocols", []) if role else []
+    if protocol in blocked:
+        return False, f"{role} role"
+    if not business_hours(config, hour) and protocol in config["time_policies"]["time_blocked_protocols"]:
+        return False, "outside business hours"
+    return True, f"{role} role" if role else "no role"
+
+
+def tcp_protocols(config):
+    """Names of the data.json protocols that can be checked with TCP connects"""
+    return [name for name, info in config["protocols"].items() if info["id"] == "TCP"]
+
+
+def print_mismatches(mismatches, what, describe, header, limit=50):
+    """The verdict at the end of a policy check: ✅, or ❌ header and the first mismatches"""
+    if not mismatches:
+        print(f"✅ Every {what} matched the expected policy")
+        return
+    print(f"❌ {header}")
+    for item in mismatches[:limit]:
+        print(f"   {describe(item)}")
+    if len(mismatches) > limit:
+        print(f"   ... and {len(mismatches) - limit} more")
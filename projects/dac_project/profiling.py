@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Stage timing spans and on-demand profiling for the dac_app.py loops.
+
+Spans are free when nothing is recording: span() returns a shared no-op object
+unless the calling thread is inside a recorded cycle.
+
+Environment variables:
+  DAC_PROFILE_SPANS=1       print per-stage timings after every cycle
+  DAC_PROFILE_CYCLES=N      profile the next N cycles of every loop
+  DAC_PROFILE_MODE=sample   "sample" (stack sampler) or "cprofile"
+  DAC_PROFILE_DIR=profiles  where the .folded (and .prof) files are written
+
+Sending SIGUSR1 to the process arms a capture of DAC_PROFILE_CYCLES cycles
+(default 5) at runtime, starting with the next cycle of each loop. The
+.folded files use the collapsed stack format that flamegraph.pl, inferno and
+speedscope read directly.
+"""
+
+import cProfile
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+SPANS_ENABLED = os.environ.get("DAC_PROFILE_SPANS", "0") not in ("", "0")
+PROFILE_MODE = os.environ.get("DAC_PROFILE_MODE", "sample")
+PROFILE_DIR = os.environ.get(
+    "DAC_PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles")
+)
+DEFAULT_CAPTURE_CYCLES = int(os.environ.get("DAC_PROFILE_CYCLES", "0") or 0)
+SAMPLE_INTERVAL = 0.005
+
+
+_local = threading.local()
+
+# loop name -> stage name -> [count, total_seconds, max_seconds]
+stage_stats = defaultdict(lambda: defaultdict(lambda: [0, 0.0, 0.0]))
+stats_lock = threading.Lock()
+
+# loop name -> number of cycles still to capture
+pending_captures = {}
+known_loops = set()
+capture_lock = threading.Lock()
+# SIGUSR1 deliveries so far, and how many of them cycle() has armed
+_signal_requests = 0
+_signal_applied = 0
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "stages", "start")
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stages.append((self.name, time.perf_counter() - self.start))
+        return False
+
+
+def span(name):
+    """Time one stage of the current cycle (no-op unless the cycle is recorded)"""
+    stages = getattr(_local, "stages", None)
+    if stages is None:
+        return _NULL_SPAN
+    return _Span(name, stages)
+
+
+class StackSampler:
+    """Samples the stacks of registered threads into collapsed-stack counts"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.thread_ids = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, thread_id, counts):
+        with self.lock:
+            self.thread_ids[thread_id] = counts
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def remove(self, thread_id):
+        with self.lock:
+            self.thread_ids.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.thread_ids:
+                    self.thread = None
+                    return
+                targets = dict(self.thread_ids)
+
+            frames = sys._current_frames()
+            for thread_id, counts in targets.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} "
+                        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                counts[";".join(reversed(stack))] += 1
+
+            time.sleep(self.interval)
+
+
+sampler = StackSampler()
+
+
+def _pstats_to_folded(profile):
+    """Approximate collapsed stacks from a cProfile call graph"""
+    stats = pstats.Stats(profile).stats
+    callees = defaultdict(list)
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            roots.append(func)
+        for caller in callers:
+            callees[caller].append(func)
+
+    def label(func):
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    folded = defaultdict(float)
+
+    def walk(func, path, share, seen):
+        _, total_calls, self_time, _, _ = stats[func]
+        path = path + [label(func)]
+        folded[";".join(path)] += self_time * share
+        for callee in callees.get(func, []):
+            if callee in seen:
+                continue
+            callee_calls = stats[callee][1]
+            from_here = stats[callee][4].get(func, (0, 0, 0, 0))[1]
+            if callee_calls and from_here:
+                walk(callee, path, share * from_here / callee_calls, seen | {callee})
+
+    for root in roots:
+        walk(root, [], 1.0, {root})
+
+    # Report microseconds so the weights stay integral
+    return {stack: int(seconds * 1e6) for stack, seconds in folded.items() if seconds > 0}
+
+
+def _write_capture(loop_name, folded, profile=None):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(PROFILE_DIR, f"{loop_name}-{stamp}")
+
+    if profile is not None:
+        profile.dump_stats(base + ".prof")
+        folded = _pstats_to_folded(profile)
+
+    with open(base + ".folded", "w") as f:
+        for stack, weight in sorted(folded.items()):
+            f.write(f"{stack} {weight}\n")
+
+    print(f"[Profile] Wrote {base}.folded ({PROFILE_MODE} mode)")
+
+
+def _arm_locked(cycles, loops):
+    """Arm a capture (caller holds capture_lock); return the notice line"""
+    cycles = cycles or DEFAULT_CAPTURE_CYCLES or 5
+    for loop_name in loops or known_loops:
+        pending_captures[loop_name] = cycles
+    names = ", ".join(sorted(loops or known_loops))
+    return f"[Profile] Capturing {cycles} cycle(s) of: {names}"
+
+
+def arm_capture(cycles=None, loops=None):
+    """Capture the next N cycles of the given loops (default: every known loop)"""
+    with capture_lock:
+        message = _arm_locked(cycles, loops)
+    print(message)
+
+
+def _on_signal(signum, frame):
+    # The main thread may hold capture_lock when the signal lands, so only
+    # count it; the next cycle() arms the capture
+    global _signal_requests
+    _signal_requests += 1
+
+
+def install_signal_handler():
+    """Arm a capture on SIGUSR1 (must be called from the main thread)"""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    signal.signal(signal.SIGUSR1, _on_signal)
+
+
+@contextmanager
+def cycle(loop_name):
+    """Mark one iteration of a monitoring loop, recording it if requested"""
+    if getattr(_local, "stages", None) is not None:
+        # Nested inside another recorded cycle: time it as a single stage
+        with span(loop_name):
+            yield
+        return
+
+    global _signal_applied
+    message = None
+    with capture_lock:
+        if loop_name not in known_loops:
+            known_loops.add(loop_name)
+            if DEFAULT_CAPTURE_CYCLES:
+                pending_captures[loop_name] = DEFAULT_CAPTURE_CYCLES
+        if _signal_applied != _signal_requests:
+            _signal_applied = _signal_requests
+            message = _arm_locked(None, None)
+        capturing = pending_captures.get(loop_name, 0) > 0
+    if message:
+        print(message)
+
+    if not SPANS_ENABLED and not capturing:
+        yield
+        return
+
+    capture = getattr(_local, "capture", None)
+    if capturing and capture is None:
+        if PROFILE_MODE == "cprofile":
+            capture = {"profile": cProfile.Profile(), "folded": None}
+        else:
+            capture = {"profile": None, "folded": defaultdict(int)}
+        _local.capture = capture
+
+    _local.stages = stages = []
+    start = time.perf_counter()
+    if capture is not None:
+        if capture["profile"] is not None:
+            capture["profile"].enable()
+        else:
+            sampler.add(threading.get_ident(), capture["folded"])
+    try:
+        yield
+    finally:
+        if capture is not None:
+            if capture["profile"] is not None:
+                capture["profile"].disable()
+            else:
+                sampler.remove(threading.get_ident())
+        elapsed = time.perf_counter() - start
+        _local.stages = None
+        _record_cycle(loop_name, elapsed, stages)
+
+        if capture is not None:
+            with capture_lock:
+                remaining = pending_captures.get(loop_name, 1) - 1
+                pending_captures[loop_name] = remaining
+            if remaining <= 0:
+                _local.capture = None
+                _write_capture(loop_name, capture["folded"], capture["profile"])
+
+
+def _record_cycle(loop_name, elapsed, stages):
+    with stats_lock:
+        loop_stats = stage_stats[loop_name]
+        for name, seconds in stages + [("cycle", elapsed)]:
+            entry = loop_stats[name]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    parts = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in stages)
+    print(f"[Profile] {loop_name} cycle {elapsed * 1000:.1f}ms: {parts}")
+
+
+def print_stage_summary():
+    with stats_lock:
+        for loop_name, loop_stats in sorted(stage_stats.items()):
+            print(f"[Profile] {loop_name}:")
+            for name, (count, total, worst) in sorted(
+                loop_stats.items(), key=lambda item: item[1][1], reverse=True
+            ):
+                print(
+                    f"  {name:<20} n={count:<6} avg={total / count * 1000:8.1f}ms "
+                    f"max={worst * 1000:8.1f}ms"
+                )
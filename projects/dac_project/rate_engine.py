@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Counter delta/rate engine for switch port statistics.
+
+Tracks the last raw counters of every dpid:port in flat arrays and turns each
+poll into per-second rates that survive:
+  * counter wrap at each counter's width (64-bit, as in OpenFlow port stats,
+    unless the caller declares 32-bit counters)
+  * port resets (counter drops to a small value)
+  * switch reconnects (the switch's connectedSince changes: new counter epoch)
+  * jumps faster than the line rate allows (re-baselined instead of reported)
+  * missed polls (the gap is averaged and reported as interpolated samples)
+"""
+
+from array import array
+from collections import namedtuple
+
+
+DEFAULT_COUNTER_BITS = 64
+
+# Line rate used to decide whether a wrapped/reset delta is plausible
+DEFAULT_MAX_LINK_MBPS = 100000
+# Headroom over the configured link capacity before a delta is implausible
+LINK_RATE_MARGIN = 10
+MIN_FRAME_BYTES = 64
+
+PortRate = namedtuple(
+    "PortRate", ["rates", "interval", "missed_polls", "event"]
+)
+
+
+def default_max_rates(counters, max_link_mbps=DEFAULT_MAX_LINK_MBPS):
+    """Per-second upper bound for each counter name"""
+    max_bytes = max_link_mbps * 1e6 / 8
+    return tuple(
+        max_bytes if name.endswith("bytes") else max_bytes / MIN_FRAME_BYTES
+        for name in counters
+    )
+
+
+def plausible_link_mbps(capacity_mbps):
+    """max_link_mbps for links of the given capacity"""
+    return capacity_mbps * LINK_RATE_MARGIN
+
+
+class CounterRateEngine:
+    """Turns cumulative port counters into rates, one batch per poll"""
+
+    def __init__(
+        self,
+        counters=("rx_packets", "rx_bytes"),
+        expected_interval=30,
+        max_gap=86400,
+        max_link_mbps=DEFAULT_MAX_LINK_MBPS,
+        counter_bits=DEFAULT_COUNTER_BITS,
+    ):
+        self.counters = tuple(counters)
+        self.width = len(self.counters)
+        # counter_bits is one width for all counters or one per counter
+        if isinstance(counter_bits, int):
+            counter_bits = (counter_bits,) * self.width
+        self.wrap_widths = tuple(1 << bits for bits in counter_bits)
+        self.expected_interval = expected_interval
+        self.max_gap = max_gap
+        self.max_rates = default_max_rates(self.counters, max_link_mbps)
+
+        self.slots = {}
+        self.epochs = []
+        self.last_values = array("Q")
+        self.last_times = array("d")
+
+    def _add_slot(self, port_key, values, epoch, now):
+        self.slots[port_key] = len(self.epochs)
+        self.epochs.append(epoch)
+        self.last_values.extend(values)
+        self.last_times.append(now)
+
+    def _delta(self, current, last, max_delta, wrap_width):
+        """Return (delta, event) for one counter, or (None, event) if unusable"""
+        if current >= last:
+            # Faster than the line can carry: a different counter behind the key
+            return None, "jump"
+
+        # Only a counter in the top half of its own range can have wrapped;
+        # any other drop (e.g. a 64-bit counter from 3e9 to 1000) is a reset
+        if wrap_width >> 1 <= last < wrap_width:
+            wrapped = current + wrap_width - last
+            if wrapped <= max_delta:
+                return wrapped, "wrap"
+
+        # The counter restarted from zero since the last poll, so its value
+        # is at most what was sent in this interval
+        if current <= max_delta:
+            return current, "reset"
+        return None, "reset"
+
+    def update(self, port_counters, now, switch_epochs=None):
+        """Process one poll of {dpid:port: (counter values...)}
+
+        switch_epochs maps a switch DPID to anything that changes when the
+        switch reconnects (Floodlight's connectedSince). Returns
+        {dpid:port: PortRate} for every port with a usable previous sample;
+        first sightings and new epochs only establish a baseline.
+        """
+        switch_epochs = switch_epochs or {}
+        width = self.width
+        max_rates = self.max_rates
+        wrap_widths = self.wrap_widths
+        expected = self.expected_interval
+        last_values = self.last_values
+        last_times = self.last_times
+        epochs = self.epochs
+        results = {}
+
+        for port_key, values in port_counters.items():
+            epoch = switch_epochs.get(port_key.rpartition(":")[0])
+            slot = self.slots.get(port_key)
+            if slot is None:
+                self._add_slot(port_key, values, epoch, now)
+                continue
+
+            base = slot * width
+            interval = now - last_times[slot]
+            if interval <= 0:
+                continue
+
+            if epochs[slot] != epoch or interval > self.max_gap:
+                event = "epoch" if epochs[slot] != epoch else "gap"
+                epochs[slot] = epoch
+                last_values[base:base + width] = array("Q", values)
+                last_times[slot] = now
+                results[port_key] = PortRate(None, interval, 0, event)
+                continue
+
+            rates = []
+            event = "ok"
+            for i in range(width):
+                current = values[i]
+                last = last_values[base + i]
+                last_values[base + i] = current
+                max_delta = max_rates[i] * interval
+                if last <= current <= last + max_delta:
+                    rates.append((current - last) / interval)
+                    continue
+
+                delta, event = self._delta(current, last, max_delta, wrap_widths[i])
+                if delta is None:
+                    rates = None
+                    for j in range(i + 1, width):
+                        last_values[base + j] = values[j]
+                    break
+                rates.append(delta / interval)
+
+            last_times[slot] = now
+
+            missed_polls = 0
+            if expected and interval > 1.5 * expected:
+                missed_polls = int(round(interval / expected)) - 1
+
+            results[port_key] = PortRate(
+                tuple(rates) if rates is not None else None,
+                interval,
+                missed_polls,
+                event,
+            )
+
+        return results
+
+    def forget(self, port_keys):
+        """Drop ports that disappeared (compacts the arrays)"""
+        port_keys = set(port_keys)
+        if not port_keys:
+            return
+        kept = [
+            (key, slot) for key, slot in self.slots.items() if key not in port_keys
+        ]
+        width = self.width
+        last_values = array("Q")
+        last_times = array("d")
+        epochs = []
+        slots = {}
+        for new_slot, (key, slot) in enumerate(kept):
+            slots[key] = new_slot
+            last_values.extend(self.last_values[slot * width:(slot + 1) * width])
+            last_times.append(self.last_times[slot])
+            epochs.append(self.epochs[slot])
+        self.slots = slots
+        self.last_values = last_values
+        self.last_times = last_times
+        self.epochs = epochs
+
+
+def check():
+    """Regression checks for the wrap/reset decisions; returns failures"""
+    failures = []
+
+    def rate(counter_bits, last, current, interval=30):
+        engine = CounterRateEngine(counters=("rx_bytes",), counter_bits=counter_bits,
+                                   max_link_mbps=plausible_link_mbps(1000))
+        engine.update({"s1:1": (last,)}, 0)
+        return engine.update({"s1:1": (current,)}, interval)["s1:1"]
+
+    cases = [
+        # 64-bit counter reset from the upper half of the 32-bit range
+        ("64-bit reset", rate(64, 3_000_000_000, 1000), (1000 / 30,), "reset"),
+        ("32-bit wrap", rate(32, (1 << 32) - 3000, 1000), (4000 / 30,), "wrap"),
+        ("64-bit wrap", rate(64, (1 << 64) - 3000, 1000), (4000 / 30,), "wrap"),
+        ("32-bit reset", rate(32, 1_000_000, 1000), (1000 / 30,), "reset"),
+        ("jump", rate(64, 1000, 10 ** 12), None, "jump"),
+    ]
+    for name, result, rates, event in cases:
+        if result.event != event or result.rates != rates:
+            failures.append(f"{name}: got {result.rates} ({result.event}), "
+                            f"expected {rates} ({event})")
+    return failures
+
+
+if __name__ == "__main__":
+    import sys
+
+    problems = check()
+    for problem in problems:
+        print(f"[RateEngine] FAIL {problem}")
+    print(f"[RateEngine] {'FAILED' if problems else 'All checks passed'}")
+    sys.exit(1 if problems else 0)
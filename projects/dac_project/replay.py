@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Record controller snapshots and replay them through dac_app's detection.
+
+record: polls the controllers like dac_app.py does and appends every raw
+response (switches, /wm/device/, port stats, and topology links with every
+device refresh) with its poll timestamp to a gzip JSON lines file:
+    {"type": "header", "interval": 5, "shards": [...], "started": ...}
+    {"type": "poll", "t": ..., "responses": [[shard, path, status, body], ...]}
+
+replay: feeds the recorded polls through the same SnapshotClient and
+dac_app.evaluate_traffic code the suspicious activity monitor uses, with the
+recorded timestamps, as fast as possible or at --speed times real time.
+Thresholds can be overridden to see what a change would have flagged. Replay
+starts from empty history and never writes history.json.
+
+    python3 replay.py record day.jsonl.gz --interval 5
+    python3 replay.py replay day.jsonl.gz
+    python3 replay.py replay day.jsonl.gz --speed 1000 --bytes-per-minute 5000000
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+
+from snapshot_client import SnapshotClient, controller_shards
+
+FLUSH_EVERY = 20
+LINKS_PATH = "/wm/topology/links/json"
+
+
+class RecordingClient(SnapshotClient):
+    """SnapshotClient that keeps every response of the current poll"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.responses = []
+
+    def request(self, shard_url, path):
+        status, data = super().request(shard_url, path)
+        self.responses.append([shard_url, path, status, data])
+        return status, data
+
+    def snapshot(self, refresh_devices=None):
+        self.responses = []
+        return super().snapshot(refresh_devices)
+
+
+class ReplayClient(SnapshotClient):
+    """SnapshotClient answering from one recorded poll at a time"""
+
+    def __init__(self, shards):
+        super().__init__(shards, device_ttl=float("inf"))
+        self.frame_time = 0.0
+        self.frame = {}
+        # Links are only recorded with device refreshes: keep the latest
+        self.links = {}
+
+    def load(self, poll):
+        self.frame_time = poll["t"]
+        self.frame = {(shard_url, path): (status, data)
+                      for shard_url, path, status, data in poll["responses"]}
+        for (shard_url, path), response in self.frame.items():
+            if path == LINKS_PATH:
+                self.links[shard_url] = response
+
+    def request(self, shard_url, path):
+        if path == LINKS_PATH:
+            return self.links.get(shard_url, (None, None))
+        # Anything the recorder did not fetch counts as an unreachable shard
+        return self.frame.get((shard_url, path), (None, None))
+
+    def now(self):
+        return self.frame_time
+
+    def snapshot(self, refresh_devices=None):
+        if refresh_devices is None:
+            refresh_devices = any(path == "/wm/device/" for _, path in self.frame)
+        return super().snapshot(refresh_devices)
+
+
+def read_recording(path):
+    """(header, iterator of polls) of a recording"""
+    f = gzip.open(path, "rt")
+    header = json.loads(f.readline())
+    if header.get("type") != "header":
+        raise ValueError(f"{path} is not a replay.py recording")
+
+    def polls():
+        with f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (ValueError, EOFError):
+                # Recording cut off by a killed recorder: replay what is there
+                return
+
+    return header, polls()
+
+
+def record(args):
+    shards = controller_shards()
+    client = RecordingClient(shards, device_ttl=args.device_refresh)
+    deadline = time.monotonic() + args.duration if args.duration else None
+    polls = 0
+    print(f"[Record] Polling {len(shards)} controller(s) every {args.interval}s into {args.output}")
+    with gzip.open(args.output, "wt") as f:
+        f.write(json.dumps({
+            "type": "header", "interval": args.interval, "shards": shards,
+            "device_refresh": args.device_refresh, "started": time.time(),
+        }) + "\n")
+        next_poll = time.monotonic()
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                snapshot = client.snapshot()
+                if snapshot.device_age == 0:
+                    # For attribution strategies that exclude inter-switch ports
+                    client.fetch_links()
+                f.write(json.dumps({"type": "poll", "t": snapshot.time,
+                                    "responses": client.responses}) + "\n")
+                polls += 1
+                if polls % FLUSH_EVERY == 0:
+                    f.flush()
+                    print(f"[Record] {polls} polls, {len(snapshot.switches)} switches, "
+                          f"{len(snapshot.device_index)} hosts", flush=True)
+                next_poll += args.interval
+                if next_poll < time.monotonic():
+                    next_poll = time.monotonic()
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            pass
+    print(f"[Record] Wrote {polls} polls to {args.output}")
+
+
+def reset_detection_state(dac_app, interval, thresholds):
+    """Fresh history, rate engine and thresholds; history.json is left alone"""
+    dac_app.user_traffic_history = {}
+    dac_app.blocked_ips = set()
+    dac_app.port_rate_engine = dac_app.new_port_rate_engine(interval)
+    dac_app.TRAFFIC_THRESHOLDS = dict(dac_app.TRAFFIC_THRESHOLDS, **thresholds)
+
+
+def replay(args):
+    try:
+        header, polls = read_recording(args.recording)
+    except (OSError, ValueError) as e:
+        print(f"[Replay] Cannot replay {args.recording}: {e}")
+        return 1
+
+    import dac_app
+
+    thresholds = {}
+    if args.bytes_per_minute is not None:
+        thresholds["bytes_per_minute"] = args.bytes_per_minute
+    if args.packets_per_minute is not None:
+        thresholds["packets_per_minute"] = args.packets_per_minute
+    reset_detection_state(dac_app, header["interval"], thresholds)
+    client = ReplayClient(header["shards"])
+    dac_app.controller_client = client
+
+    alerts = {}
+    timeline = []
+    first_time = last_time = None
+    frames = 0
+    wall_start = time.monotonic()
+    for poll in polls:
+        client.load(poll)
+        if first_time is None:
+            first_time = poll["t"]
+        elif args.speed:
+            # Pace by recorded time; never sleeps if replay is already behind
+            target = wall_start + (poll["t"] - first_time) / args.speed
+            time.sleep(max(0.0, target - time.monotonic()))
+        last_time = poll["t"]
+        frames += 1
+
+        current_traffic, switch_port_stats, switch_epochs, plan = dac_app.collect_traffic_snapshot()
+        if not current_traffic:
+            continue
+        for alert in dac_app.evaluate_traffic(
+            current_traffic, switch_port_stats, switch_epochs, poll["t"], plan
+        ):
+            timeline.append(dict(alert, time=poll["t"]))
+            entry = alerts.setdefault(alert["ip"], {
+                "role": alert["role"], "polls": 0, "first": poll["t"],
+                "peak_bytes_per_minute": 0.0, "peak_packets_per_minute": 0.0,
+            })
+            entry["polls"] += 1
+            entry["last"] = poll["t"]
+            entry["peak_bytes_per_minute"] = max(entry["peak_bytes_per_minute"], alert["bytes_per_minute"])
+            entry["peak_packets_per_minute"] = max(entry["peak_packets_per_minute"], alert["packets_per_minute"])
+            if args.verbose:
+                stamp = time.strftime("%H:%M:%S", time.localtime(poll["t"]))
+                print(f"[Replay] {stamp} {alert['ip']} ({alert['role']}): {'; '.join(alert['reasons'])}")
+
+    wall = time.monotonic() - wall_start
+    recorded = (last_time - first_time) if frames else 0.0
+    print_replay_summary(frames, recorded, wall, alerts, dac_app.TRAFFIC_THRESHOLDS)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"polls": frames, "recorded_seconds": recorded, "wall_seconds": wall,
+                       "thresholds": dac_app.TRAFFIC_THRESHOLDS, "hosts": alerts,
+                       "alerts": timeline}, f, indent=2)
+        print(f"Alerts written to {args.json}")
+    return 0
+
+
+def print_replay_summary(frames, recorded, wall, alerts, thresholds):
+    print("\n" + "=" * 70)
+    speedup = f"{recorded / wall:,.0f}x real time" if wall > 0 else "instant"
+    print(f"Replayed {frames} polls covering {recorded:,.0f}s in {wall:.2f}s ({speedup})")
+    print(f"Thresholds: {thresholds.get('bytes_per_minute', 10485760):,} bytes/min, "
+          f"{thresholds.get('packets_per_minute', 10000):,} packets/min")
+    print("=" * 70)
+    if not alerts:
+        print("No host crossed a threshold")
+        return
+    print(f"{'Host':<15} {'Role':<9} {'Polls':>6} {'First':>9} {'Last':>9} "
+          f"{'Peak bytes/min':>16} {'Peak pkts/min':>14}")
+    for ip, entry in sorted(alerts.items(), key=lambda item: item[1]["first"]):
+        first = time.strftime("%H:%M:%S", time.localtime(entry["first"]))
+        last = time.strftime("%H:%M:%S", time.localtime(entry["last"]))
+        print(f"{ip:<15} {entry['role']:<9} {entry['polls']:>6} {first:>9} {last:>9} "
+              f"{entry['peak_bytes_per_minute']:>16,.0f} {entry['peak_packets_per_minute']:>14,.0f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Record and replay controller snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = sub.add_parser("record", help="record controller polls to a gzip file")
+    record_parser.add_argument("output", help="recording to write (.jsonl.gz)")
+    record_parser.add_argument("--interval", type=float, default=5.0, help="seconds between polls")
+    record_parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    record_parser.add_argument("--device-refresh", type=float, default=0,
+                               help="seconds between /wm/device/ fetches (0: every poll)")
+
+    replay_parser = sub.add_parser("replay", help="run a recording through the detector")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--speed", type=float, default=0,
+                               help="times real time (default: as fast as possible)")
+    replay_parser.add_argument("--bytes-per-minute", type=int, help="override the byte threshold")
+    replay_parser.add_argument("--packets-per-minute", type=int, help="override the packet threshold")
+    replay_parser.add_argument("--verbose", action="store_true", help="print every alert")
+    replay_parser.add_argument("--json", help="write alerts here")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        sys.exit(replay(args))
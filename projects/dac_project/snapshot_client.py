@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Shared Floodlight snapshot client for dac_app.py and the diagnostic scripts.
+
+A SnapshotClient keeps one pooled HTTP session per process and queries every
+controller shard in data.json concurrently:
+  * port counters come from the bulk /wm/core/switch/all/port/json endpoint
+    (one request per shard); shards that do not serve it fall back to one
+    request per switch, all in parallel
+  * the device index (ip -> owning shard and attachment ports) is cached for
+    device_ttl seconds, so a polling loop costs one round-trip per shard
+    between device refreshes
+
+Every caller gets the same Snapshot object as dac_app.py. Which counters make
+up a host's traffic is attribution.py's job (monitoring.attribution in
+data.json):
+
+    client = SnapshotClient()
+    snapshot = client.snapshot()
+    snapshot.ports["00:..:01:3"]     # PortCounters(rx_packets, tx_packets, ...)
+    attribution.build_plan(client, snapshot, attribution.configured_strategy())
+
+Run directly for a one-shot summary:
+    python3 snapshot_client.py [--json]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_TIMEOUT = 5
+DEFAULT_DEVICE_TTL = 60
+# Replies that mean the bulk port endpoint does not exist on a shard
+UNSUPPORTED_STATUSES = (404, 405)
+
+PortCounters = namedtuple(
+    "PortCounters", ["rx_packets", "tx_packets", "rx_bytes", "tx_bytes"]
+)
+
+# ports: attachment "dpid:port" keys on switches of the owning shard, primary first
+DeviceEntry = namedtuple("DeviceEntry", ["shard", "ports", "macs", "last_seen"])
+
+
+def load_config():
+    config_path = os.path.join(os.path.dirname(__file__), "data.json")
+    with open(config_path, "r") as f:
+        return json.load(f)
+
+
+def controller_shards(config=None):
+    config = config or load_config()
+    return config.get("floodlight_controller_shards") or [
+        config["floodlight_controller_url"]
+    ]
+
+
+def attachment_key(ap):
+    return f"{ap.get('switch', '') or ap.get('switchDPID', '')}:{ap.get('port', '')}"
+
+
+def parse_port_reply(switch_id, port_data, ports):
+    """Add the counters of one switch's port JSON to ports {dpid:port: PortCounters}"""
+    if isinstance(port_data, list):
+        # Some Floodlight releases wrap each switch's bulk entry in a list
+        port_data = port_data[0] if port_data else {}
+    for port in port_data.get("port_reply", [{}])[0].get("port", []):
+        port_number = port.get("port_number")
+        if port_number == "local" or port_number is None:
+            continue
+        ports[f"{switch_id}:{port_number}"] = PortCounters(
+            int(port.get("receive_packets", 0)),
+            int(port.get("transmit_packets", 0)),
+            int(port.get("receive_bytes", 0)),
+            int(port.get("transmit_bytes", 0)),
+        )
+
+
+def merge_device_mappings(shard_views):
+    """Merge per-shard device lists into {ip: DeviceEntry}
+
+    A host can show up in several shards, e.g. behind an inter-block link that
+    only the neighbouring controller sees. Candidates are ranked by how many
+    devices share the attachment port (fewest wins: trunk ports carry many
+    MACs), then by the most recent lastSeen, then by shard URL so the choice is
+    stable between cycles.
+    """
+    candidates = {}
+    port_owners = {}
+    for shard_url, view in shard_views.items():
+        for device in view["devices"]:
+            ports = tuple(
+                attachment_key(ap)
+                for ap in device.get("attachmentPoint", [])
+                if (ap.get("switch", "") or ap.get("switchDPID", "")) in view["switch_ids"]
+            )
+            for port_key in ports:
+                port_owners[port_key] = port_owners.get(port_key, 0) + 1
+
+            for ip in device.get("ipv4", []):
+                if ip and ip != "0.0.0.0":
+                    candidates.setdefault(ip, []).append(DeviceEntry(
+                        shard_url, ports, tuple(device.get("mac", [])),
+                        device.get("lastSeen", 0) or 0,
+                    ))
+
+    def rank(entry):
+        if not entry.ports:
+            return (1, float("inf"), 0, entry.shard)
+        return (0, port_owners.get(entry.ports[0], 0), -entry.last_seen, entry.shard)
+
+    return {ip: min(entries, key=rank) for ip, entries in candidates.items()}
+
+
+class Snapshot:
+    """One poll of every responding shard"""
+
+    def __init__(self, taken_at, shards, missing_shards, switches, ports,
+                 devices, device_index, device_age):
+        self.time = taken_at
+        self.shards = shards
+        self.missing_shards = missing_shards
+        # {dpid: {"shard": url, "connected_since": ...}}
+        self.switches = switches
+        # {dpid:port: PortCounters}
+        self.ports = ports
+        # raw /wm/device/ entries of every shard, as (shard, device)
+        self.devices = devices
+        # {ip: DeviceEntry}
+        self.device_index = device_index
+        self.device_age = device_age
+
+    @property
+    def switch_epochs(self):
+        return {dpid: info["connected_since"] for dpid, info in self.switches.items()}
+
+    def primary_port(self, ip):
+        entry = self.device_index.get(ip)
+        return entry.ports[0] if entry and entry.ports else None
+
+    def port_owners(self):
+        """{dpid:port: ip} for every attachment port of every indexed host"""
+        owners = {}
+        for ip, entry in self.device_index.items():
+            for port_key in entry.ports:
+                owners.setdefault(port_key, ip)
+        return owners
+
+    def switch_ports(self, switch_id):
+        prefix = f"{switch_id}:"
+        return {
+            port_key[len(prefix):]: counters
+            for port_key, counters in self.ports.items()
+            if port_key.startswith(prefix)
+        }
+
+
+class SnapshotClient:
+    def __init__(self, shards=None, device_ttl=DEFAULT_DEVICE_TTL,
+                 timeout=DEFAULT_TIMEOUT, workers=None):
+        self.shards = list(shards or controller_shards())
+        self.device_ttl = device_ttl
+        self.timeout = timeout
+        workers = workers or max(8, 4 * len(self.shards))
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.shards), pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # shard -> False once it showed it has no bulk port endpoint
+        self.bulk_ports = {}
+        self._views = None
+        self._device_index = {}
+        self._devices_at = 0.0
+
+    def request(self, shard_url, path):
+        """(status, parsed JSON) of one GET; status None if the shard is unreachable
+
+        Every controller read goes through here (replay.py records and
+        replays at this point).
+        """
+        try:
+            response = self.session.get(f"{shard_url}{path}", timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return None, None
+        if response.status_code != 200:
+            return response.status_code, None
+        try:
+            return 200, response.json()
+        except ValueError:
+            return 200, None
+
+    def now(self):
+        return time.time()
+
+    def get_json(self, shard_url, path):
+        """Parsed JSON of one GET, or None if the shard did not answer with 200"""
+        return self.request(shard_url, path)[1]
+
+    def fetch_switches(self):
+        """{shard: [switch JSON] or None}"""
+        return dict(zip(self.shards, self.executor.map(
+            lambda shard_url: self.get_json(shard_url, "/wm/core/controller/switches/json"),
+            self.shards,
+        )))
+
+    def _fetch_devices(self, shard_url):
+        data = self.get_json(shard_url, "/wm/device/")
+        return None if data is None else data.get("devices", [])
+
+    def _fetch_bulk_ports(self, shard_url):
+        if self.bulk_ports.get(shard_url) is False:
+            return None
+        status, data = self.request(shard_url, "/wm/core/switch/all/port/json")
+        if status in UNSUPPORTED_STATUSES or (
+                status == 200 and data is not None
+                and (not isinstance(data, dict) or "port_reply" in data)):
+            # The shard has no bulk endpoint: per-switch from now on
+            self.bulk_ports[shard_url] = False
+            return None
+        if status != 200 or data is None:
+            # Unreachable or a transient error (e.g. a 500 while a switch
+            # disconnects): per-switch for this poll, bulk again next time
+            return None
+        self.bulk_ports[shard_url] = True
+        return data
+
+    def devices_stale(self, now=None):
+        return self._views is None or (now or self.now()) - self._devices_at >= self.device_ttl
+
+    def snapshot(self, refresh_devices=None):
+        """Poll every shard; devices only when the cached index is stale
+
+        refresh_devices=True/False overrides the device_ttl decision.
+        """
+        now = self.now()
+        if refresh_devices is None:
+            refresh_devices = self.devices_stale(now)
+
+        switch_futures = {}
+        port_futures = {}
+        device_futures = {}
+        for shard_url in self.shards:
+            switch_futures[shard_url] = self.executor.submit(
+                self.get_json, shard_url, "/wm/core/controller/switches/json")
+            port_futures[shard_url] = self.executor.submit(self._fetch_bulk_ports, shard_url)
+            if refresh_devices:
+                device_futures[shard_url] = self.executor.submit(self._fetch_devices, shard_url)
+
+        shards = []
+        missing = []
+        switches = {}
+        ports = {}
+        fallback = []
+        views = {}
+        for shard_url in self.shards:
+            switch_list = switch_futures[shard_url].result()
+            devices = device_futures[shard_url].result() if refresh_devices else None
+            if switch_list is None or (refresh_devices and devices is None):
+                missing.append(shard_url)
+                continue
+            shards.append(shard_url)
+            for switch in switch_list:
+                switches[switch["switchDPID"]] = {
+                    "shard": shard_url,
+                    "connected_since": switch.get("connectedSince"),
+                }
+            if refresh_devices:
+                views[shard_url] = {
+                    "devices": devices,
+                    "switch_ids": {switch["switchDPID"] for switch in switch_list},
+                }
+
+            bulk = port_futures[shard_url].result()
+            if bulk is None:
+                fallback.extend((shard_url, switch["switchDPID"]) for switch in switch_list)
+            else:
+                for switch_id, port_data in bulk.items():
+                    parse_port_reply(switch_id, port_data, ports)
+
+        port_replies = self.executor.map(
+            lambda item: self.get_json(item[0], f"/wm/core/switch/{item[1]}/port/json"),
+            fallback,
+        )
+        for (_, switch_id), port_data in zip(fallback, port_replies):
+            if port_data is not None:
+                parse_port_reply(switch_id, port_data, ports)
+
+        if refresh_devices and views:
+            self._views = views
+            self._device_index = merge_device_mappings(views)
+            self._devices_at = now
+
+        devices = [
+            (shard_url, device)
+            for shard_url, view in (self._views or {}).items()
+            for device in view["devices"]
+        ]
+        return Snapshot(now, shards, missing, switches, ports, devices,
+                        self._device_index, now - self._devices_at)
+
+    def device_index(self, refresh=True):
+        if refresh or self.devices_stale():
+            self.snapshot(refresh_devices=True)
+        return self._device_index
+
+    def fetch_links(self):
+        """Sorted [(dpid:port, dpid:port)] inter-switch links of every shard
+
+        None when no shard serves /wm/topology/links/json. Each link is listed
+        once, whichever direction the controller reported.
+        """
+        replies = self.executor.map(
+            lambda shard_url: self.get_json(shard_url, "/wm/topology/links/json"),
+            self.shards,
+        )
+        links = None
+        for reply in replies:
+            if reply is None:
+                continue
+            links = links or set()
+            for link in reply:
+                src = f"{link['src-switch']}:{link['src-port']}"
+                dst = f"{link['dst-switch']}:{link['dst-port']}"
+                links.add((min(src, dst), max(src, dst)))
+        return None if links is None else sorted(links)
+
+    def per_switch(self, snapshot, resource):
+        """{dpid: JSON of /wm/core/switch/<dpid>/<resource>/json}, queried in parallel"""
+        items = list(snapshot.switches.items())
+        replies = self.executor.map(
+            lambda item: self.get_json(item[1]["shard"], f"/wm/core/switch/{item[0]}/{resource}/json"),
+            items,
+        )
+        return {switch_id: reply for (switch_id, _), reply in zip(items, replies)}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+def summarize(snapshot, traffic):
+    return {
+        "time": snapshot.time,
+        "shards": snapshot.shards,
+        "missing_shards": snapshot.missing_shards,
+        "switches": len(snapshot.switches),
+        "ports": len(snapshot.ports),
+        "hosts": {
+            ip: dict(traffic[ip], shard=entry.shard, attachments=list(entry.ports))
+            for ip, entry in sorted(snapshot.device_index.items())
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Take one controller snapshot")
+    parser.add_argument("--json", action="store_true", help="print the snapshot as JSON")
+    args = parser.parse_args()
+
+    import attribution
+
+    client = SnapshotClient()
+    start = time.time()
+    snapshot = client.snapshot()
+    elapsed = time.time() - start
+    strategy = attribution.configured_strategy()
+    traffic = attribution.build_plan(client, snapshot, strategy).host_counters(snapshot.ports)
+    if args.json:
+        print(json.dumps(dict(summarize(snapshot, traffic), attribution=strategy), indent=2))
+    else:
+        print(f"[Snapshot] {len(snapshot.shards)}/{len(client.shards)} shards, "
+              f"{len(snapshot.switches)} switches, {len(snapshot.ports)} ports, "
+              f"{len(snapshot.device_index)} hosts in {elapsed * 1000:.0f} ms "
+              f"(attribution: {strategy})")
+        for shard_url in snapshot.missing_shards:
+            print(f"[Snapshot] Controller {shard_url} did not respond")
+        for ip, stats in sorted(traffic.items()):
+            print(f"  {ip:<15} {stats['port'] or '-':<28} "
+                  f"{stats['packets']:>10} packets {stats['bytes']:>14,} bytes")
+    client.close()
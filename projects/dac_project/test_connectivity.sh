@@ -70,4 +70,5 @@ echo "Testing Complete"
 echo "=========================================="
 echo ""
 echo "Note: For more detailed tests, see TESTING_GUIDE.md"
+echo "      To check every host and protocol at once: sudo python3 acl_verify.py"
 
@@ -1,11 +1,35 @@
+import argparse
 import json
 import os
+import subprocess
+import sys
+import tempfile
 import time
+from functools import partial
+
 from mininet.net import Mininet
 from mininet.node import OVSSwitch, RemoteController
+from mininet.link import Link
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sdn_utils import lifecycle, readiness
+from sdn_utils.ovs_batch import BridgeBatch
+
+
+# Defaults for data.json "topology" (the original 3 x 3 x 3 network)
+DEFAULT_TOPOLOGY = {
+    "blocks": 3,
+    "switches_per_block": 3,
+    "hosts_per_block": 3,
+    "intra_block": "mesh",
+    "inter_block": "chain",
+    "addressing": "flat",
+    "stp": True,
+    "roles": {"admin": 1, "employee": 1, "guest": 1},
+}
+
 
 def load_config():
     config_path = os.path.join(os.path.dirname(__file__), 'data.json')
@@ -13,117 +37,253 @@ def load_config():
         return json.load(f)
 
 
+def parse_roles(text):
+    """"admin=1,employee=2,guest=5" -> {"admin": 1, "employee": 2, "guest": 5}"""
+    roles = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        roles[name.strip()] = int(weight or 1)
+    return roles
+
+
+def parse_args(config):
+    defaults = dict(DEFAULT_TOPOLOGY, **config.get("topology", {}))
+    parser = argparse.ArgumentParser(description="dac_project Mininet topology")
+    parser.add_argument("--blocks", type=int, default=defaults["blocks"])
+    parser.add_argument("--switches", type=int, default=defaults["switches_per_block"],
+                        help="switches per block")
+    parser.add_argument("--hosts", type=int, default=defaults["hosts_per_block"],
+                        help="hosts per block")
+    parser.add_argument("--intra", choices=["mesh", "ring", "fat-tree"],
+                        default=defaults["intra_block"],
+                        help="switch links inside a block")
+    parser.add_argument("--inter", choices=["chain", "ring"],
+                        default=defaults["inter_block"],
+                        help="links between the first switches of each block")
+    parser.add_argument("--addressing", choices=["flat", "block"],
+                        default=defaults["addressing"],
+                        help="flat: 10.0.0.n numbering, block: 10.<block>.x.y per block")
+    parser.add_argument("--roles", type=parse_roles, default=defaults["roles"],
+                        help="role weights, e.g. admin=1,employee=4,guest=5")
+    parser.add_argument("--no-stp", dest="stp", action="store_false",
+                        default=defaults["stp"])
+    parser.add_argument("--no-batch-links", dest="batch_links", action="store_false",
+                        help="create links one by one through Mininet")
+    parser.add_argument("--keep-links", action="store_true",
+                        help="leave switch links in place for the next run to reuse")
+    parser.add_argument("--ready-timeout", type=float, default=120,
+                        help="seconds to wait for controller connections and STP")
+    parser.add_argument("--ping-sample", type=int, default=0,
+                        help="host pairs to ping before declaring the network ready")
+    parser.add_argument("--users-only", action="store_true",
+                        help="only write users.json for this topology")
+    return parser.parse_args()
+
+
+def host_ip(block_idx, host_idx, host_num, args, total_hosts):
+    """Address of one host; everything stays in one L2 broadcast domain"""
+    if args.addressing == "block":
+        return f"10.{block_idx + 1}.{host_idx // 254}.{host_idx % 254 + 1}/8"
+    if total_hosts <= 254:
+        return f"10.0.0.{host_num}/24"
+    return f"10.{(host_num >> 16) & 255}.{(host_num >> 8) & 255}.{host_num & 255}/8"
+
+
+def block_links(switches, intra):
+    """Switch pairs inside one block, and the switches hosts may attach to"""
+    count = len(switches)
+    if intra == "ring" and count > 2:
+        return [(switches[i], switches[(i + 1) % count]) for i in range(count)], switches
+    if intra == "fat-tree":
+        # Two tier leaf/spine: every leaf connects to every spine, hosts to leaves
+        spine_count = max(1, count // 3) if count > 1 else 0
+        spines, leaves = switches[:spine_count], switches[spine_count:] or switches
+        return [(spine, leaf) for leaf in leaves for spine in spines], leaves
+    return [(switches[i], switches[j]) for i in range(count)
+            for j in range(i + 1, count)], switches
+
+
+def build_plan(args):
+    """Names, addresses, roles and links of the whole network (no Mininet)"""
+    total_hosts = args.blocks * args.hosts
+    role_cycle = [role for role, weight in args.roles.items() for _ in range(weight)]
+
+    switches_by_block = []
+    hosts = []
+    links = []
+    for block_idx in range(args.blocks):
+        block_switches = [
+            f"s{block_idx * args.switches + switch_idx + 1}"
+            for switch_idx in range(args.switches)
+        ]
+        switch_links, edge_switches = block_links(block_switches, args.intra)
+        links.extend(switch_links)
+
+        for host_idx in range(args.hosts):
+            host_num = block_idx * args.hosts + host_idx + 1
+            host = {
+                "name": f"h{host_num}",
+                "ip": host_ip(block_idx, host_idx, host_num, args, total_hosts),
+                "role": role_cycle[host_idx % len(role_cycle)],
+                "switch": edge_switches[host_idx % len(edge_switches)],
+            }
+            hosts.append(host)
+            # Switch first: the link is then created from the root namespace
+            links.append((host["switch"], host["name"]))
+
+        switches_by_block.append(block_switches)
+
+    for block_idx in range(args.blocks - 1):
+        links.append((switches_by_block[block_idx][0], switches_by_block[block_idx + 1][0]))
+    if args.inter == "ring" and args.blocks > 2:
+        links.append((switches_by_block[-1][0], switches_by_block[0][0]))
+
+    return switches_by_block, hosts, links
+
+
+def write_users(hosts):
+    users_data = [
+        {
+            "ip": host["ip"].split('/')[0],
+            "role": host["role"],
+            "hostname": "default",
+            "description": "",
+        }
+        for host in hosts
+    ]
+    users_data.sort(key=lambda x: tuple(int(part) for part in x["ip"].split(".")))
+
+    users_json_path = os.path.join(os.path.dirname(__file__), 'users.json')
+    with open(users_json_path, 'w') as f:
+        json.dump(users_data, f, indent=2)
+
+    counts = {}
+    for user in users_data:
+        counts[user["role"]] = counts.get(user["role"], 0) + 1
+    info(f"  Updated users.json with {len(users_data)} hosts\n")
+    info("  Role distribution: "
+         + ", ".join(f"{count} {role}" for role, count in counts.items()) + "\n")
+
+
+class PrebuiltLink(Link):
+    """veth link whose interface pair create_links() already made"""
+
+    @classmethod
+    def makeIntfPair(cls, *args, **kwargs):
+        pass
+
+
+def link_plan(net, links):
+    """(node1, node2, ports, intf1, intf2) for every link, numbered like Mininet"""
+    next_port = {}
+    plan = []
+    for name1, name2 in links:
+        node1, node2 = net[name1], net[name2]
+        ports = []
+        for node in (node1, node2):
+            port = next_port.get(node.name, node.portBase)
+            next_port[node.name] = port + 1
+            ports.append(port)
+        plan.append((node1, node2, ports, f"{name1}-eth{ports[0]}", f"{name2}-eth{ports[1]}"))
+    return plan
+
+
+def create_links(net, plan, reuse=(), stale=()):
+    """Create every veth pair with one `ip -batch` run, then register them
+
+    Pairs in reuse (kept by the previous run) are registered as they are;
+    interfaces in stale are deleted in the same batch.
+    """
+    lines = [f"link del {name}\n" for name in stale]
+    for node1, node2, ports, intf1, intf2 in plan:
+        if (intf1, intf2) not in reuse:
+            lines.append(f"link add name {intf1} type veth "
+                         f"peer name {intf2} netns {node2.pid}\n")
+
+    if lines:
+        with tempfile.NamedTemporaryFile("w", suffix=".ip") as batch:
+            batch.writelines(lines)
+            batch.flush()
+            result = subprocess.run(["ip", "-batch", batch.name],
+                                    capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ip -batch failed: {result.stderr.strip()}")
+
+    for node1, node2, ports, intf1, intf2 in plan:
+        net.addLink(node1, node2, port1=ports[0], port2=ports[1],
+                    intfName1=intf1, intfName2=intf2, cls=PrebuiltLink)
+
+
 def topo():
+    config = load_config()
+    args = parse_args(config)
+    switches_by_block, hosts, links = build_plan(args)
+    switch_names = [name for block in switches_by_block for name in block]
+    info(f"Topology: {args.blocks} blocks x {args.switches} switches ({args.intra}), "
+         f"{len(hosts)} hosts, {len(links)} links\n")
+
+    if args.users_only:
+        write_users(hosts)
+        return
+
     info("Creating network...\n")
-    net = Mininet(controller=RemoteController, switch=OVSSwitch)
+    net = Mininet(controller=RemoteController, switch=partial(OVSSwitch, batch=True))
 
-    config = load_config()
     controller_url = config['floodlight_controller_url']
     controller_ip = config['floodlight_controller_ip']
     controller_port = config['floodlight_controller_port']
 
     info(f"Adding controller (same as dac_app.py: {controller_url})...\n")
-    controller = net.addController(
+    net.addController(
         RemoteController("floodlight", ip=controller_ip, port=controller_port)
     )
 
-    num_blocks = 3
-    switches_per_block = 3
-    hosts_per_block = 3
-
-    switches_by_block = []
-    hosts_by_block = []
-    switch_objects = {}
-    host_objects = {}
-
     info("Adding switches and hosts...\n")
-    for block_idx in range(num_blocks):
-        block_switches = []
-        block_hosts = []
-
-        for switch_idx in range(switches_per_block):
-            switch_name = f"s{block_idx * switches_per_block + switch_idx + 1}"
-            switch_obj = net.addSwitch(switch_name)
-            switch_objects[switch_name] = switch_obj
-            block_switches.append(switch_obj)
-
-        for host_idx in range(hosts_per_block):
-            host_num = block_idx * hosts_per_block + host_idx + 1
-            host_name = f"h{host_num}"
-            host_obj = net.addHost(host_name, ip=f"10.0.0.{host_num}/24")
-            host_objects[host_name] = host_obj
-            block_hosts.append(host_obj)
-
-        switches_by_block.append(block_switches)
-        hosts_by_block.append(block_hosts)
+    for name in switch_names:
+        net.addSwitch(name)
+    for host in hosts:
+        net.addHost(host["name"], ip=host["ip"])
 
     info("Adding links...\n")
-    for block_switches in switches_by_block:
-        for i in range(len(block_switches)):
-            for j in range(i + 1, len(block_switches)):
-                net.addLink(block_switches[i], block_switches[j])
-
-    for block_idx, (block_switches, block_hosts) in enumerate(
-        zip(switches_by_block, hosts_by_block)
-    ):
-        for host_idx, host_obj in enumerate(block_hosts):
-            switch_idx = host_idx % len(block_switches)
-            net.addLink(host_obj, block_switches[switch_idx])
-
-    for block_idx in range(num_blocks - 1):
-        switch_from = switches_by_block[block_idx][0]
-        switch_to = switches_by_block[block_idx + 1][0]
-        net.addLink(switch_from, switch_to)
+    start = time.time()
+    if args.batch_links:
+        plan = link_plan(net, links)
+        switch_links = [[intf1, intf2] for node1, node2, _, intf1, intf2 in plan
+                        if not node1.inNamespace and not node2.inNamespace]
+        reuse, stale = lifecycle.reusable_links(switch_links)
+        create_links(net, plan, reuse, stale)
+        if reuse:
+            info(f"  Reused {len(reuse)} switch links from the previous run\n")
+    else:
+        for name1, name2 in links:
+            net.addLink(name1, name2)
+    info(f"  {len(links)} links in {time.time() - start:.1f}s\n")
 
     info("Starting network...\n")
     net.start()
+    lifecycle.record(net)
 
-    info("Assigning controllers to switches...\n")
-    for switch_name, switch_obj in switch_objects.items():
-        switch_obj.start([controller])
-
-    info("Enabling STP on switches to prevent broadcast storms...\n")
-    for switch_name, switch_obj in switch_objects.items():
-        cmd = f"ovs-vsctl set Bridge {switch_name} stp_enable=true"
-        switch_obj.cmd(cmd)
-        info(f"  STP enabled on {switch_name}\n")
+    if args.stp:
+        info("Enabling STP on switches to prevent broadcast storms...\n")
+        bridges = BridgeBatch()
+        bridges.set_all(switch_names, stp=True)
+        bridges.commit()
 
-    info("Waiting for STP and controller learning to complete...\n")
-    for i in range(10, 0, -1):
-        info(f"  {i}... ")
-        time.sleep(1)
-    info("\nNetwork should be ready now!\n")
+    info("Waiting for controller connections and STP to converge...\n")
+    report = readiness.wait_until_ready(net, timeout=args.ready_timeout,
+                                        ping_pairs=args.ping_sample)
+    if report["ready"]:
+        info("Network is ready!\n")
+    else:
+        info("Network did not fully converge, continuing anyway\n")
 
     info("Updating users.json with generated hosts...\n")
-    users_data = []
-    
-    role_map = {0: "admin", 1: "employee", 2: "guest"}
-    
-    for block_idx, block_hosts in enumerate(hosts_by_block):
-        for host_idx, host_obj in enumerate(block_hosts):
-            host_ip = host_obj.IP().split('/')[0]
-            role = role_map.get(host_idx, "guest")
-            users_data.append({
-                "ip": host_ip,
-                "role": role,
-                "hostname": "default",
-                "description": ""
-            })
-    
-    users_data.sort(key=lambda x: x["ip"])
-    
-    users_json_path = os.path.join(os.path.dirname(__file__), 'users.json')
-    with open(users_json_path, 'w') as f:
-        json.dump(users_data, f, indent=2)
-    info(f"  Updated users.json with {len(users_data)} hosts\n")
-    info(f"  Role distribution: {sum(1 for u in users_data if u['role'] == 'admin')} admin, "
-         f"{sum(1 for u in users_data if u['role'] == 'employee')} employee, "
-         f"{sum(1 for u in users_data if u['role'] == 'guest')} guest\n")
+    write_users(hosts)
 
     CLI(net)
 
     info("Stopping network...\n")
-    net.stop()
+    lifecycle.fast_stop(net, keep_links=args.keep_links)
 
 
 if __name__ == "__main__":
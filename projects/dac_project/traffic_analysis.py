@@ -1,92 +1,248 @@
 #!/usr/bin/env python3
 """
 Traffic analysis script to show the difference between active and passive traffic.
+
+Default: streaming analyzer. Every --interval seconds the controllers are
+polled, each host's ports under dac_app.py's attribution strategy
+(monitoring.attribution, or --strategy) go through the wrap/reset aware
+CounterRateEngine, and the per-interval delta is added to sliding windows
+(10s, 1m and 5m by default).
+Each window keeps running sums over a deque of samples, so every sample
+costs O(1) per window no matter how long the window is.
+
+Every --report seconds one JSON line is written to stdout:
+    {"time": ..., "hosts": {"10.0.0.1": {"port": ..., "role": ..., "state": ...,
+     "windows": {"10s": {"packets", "bytes", "pps", "bps", "span"}, ...}}}, "totals": {...}}
+
+    python3 traffic_analysis.py | jq '.hosts["10.0.0.1"].windows["1m"].pps'
+    python3 traffic_analysis.py --windows 5,30,120 --interval 1 --text
+    python3 traffic_analysis.py --compare       # old baseline vs +10s comparison
 """
 
-import requests
+import argparse
 import json
+import sys
 import time
+from collections import deque
 
-FLOODLIGHT_CONTROLLER_URL = "http://localhost:8080"
+import requests
 
-def get_traffic_snapshot():
-    """Get current traffic statistics for all devices"""
-    
-    # Get devices
-    devices_response = requests.get(f'{FLOODLIGHT_CONTROLLER_URL}/wm/device/')
-    if devices_response.status_code != 200:
-        return None
-        
-    devices_data = devices_response.json()
-    devices = devices_data.get('devices', [])
+import attribution
+import policy
+from rate_engine import CounterRateEngine
+from snapshot_client import PortCounters, SnapshotClient
+
+DEFAULT_WINDOWS = (10, 60, 300)
+
+client = SnapshotClient()
+
+def get_traffic_snapshot(strategy):
+    """Get current traffic statistics for all devices (attributed as dac_app.py does)"""
     
-    # Get switches  
-    switches_response = requests.get(f'{FLOODLIGHT_CONTROLLER_URL}/wm/core/controller/switches/json')
-    if switches_response.status_code != 200:
+    snapshot = client.snapshot()
+    if not snapshot.shards:
         return None
-        
-    switches = switches_response.json()
-    
-    # Build port stats lookup
-    switch_port_stats = {}
-    for switch in switches:
-        switch_id = switch['switchDPID']
-        port_url = f'{FLOODLIGHT_CONTROLLER_URL}/wm/core/switch/{switch_id}/port/json'
-        port_response = requests.get(port_url)
-        
-        if port_response.status_code == 200:
-            port_data = port_response.json()
-            ports = port_data.get('port_reply', [{}])[0].get('port', [])
-            
-            for port in ports:
-                port_number = port.get('port_number')
-                if port_number != 'local' and port_number is not None:
-                    rx_packets = int(port.get('receive_packets', 0))
-                    tx_packets = int(port.get('transmit_packets', 0))
-                    rx_bytes = int(port.get('receive_bytes', 0))
-                    tx_bytes = int(port.get('transmit_bytes', 0))
-                    
-                    switch_port_key = f"{switch_id}:{port_number}"
-                    switch_port_stats[switch_port_key] = {
-                        'total_packets': rx_packets + tx_packets,
-                        'total_bytes': rx_bytes + tx_bytes
-                    }
-    
-    # Map devices to traffic
-    device_traffic = {}
-    for device in devices:
-        ipv4_addresses = device.get('ipv4', [])
-        attachment_points = device.get('attachmentPoint', [])
-        
-        for ip in ipv4_addresses:
-            if ip and ip != '0.0.0.0':
-                device_bytes = 0
-                device_packets = 0
-                
-                for attachment in attachment_points:
-                    switch_dpid = attachment.get('switch', '') or attachment.get('switchDPID', '')
-                    port_num = attachment.get('port', '')
-                    
-                    switch_port_key = f"{switch_dpid}:{port_num}"
-                    if switch_port_key in switch_port_stats:
-                        port_stats = switch_port_stats[switch_port_key]
-                        device_bytes += port_stats['total_bytes']
-                        device_packets += port_stats['total_packets']
-                
-                device_traffic[ip] = {
-                    'packets': device_packets,
-                    'bytes': device_bytes
-                }
-    
-    return device_traffic
+    return attribution.build_plan(client, snapshot, strategy).host_counters(snapshot.ports)
+
+def window_label(seconds):
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+class SlidingWindow:
+    """Running packet/byte sums over the samples of the last `seconds`"""
+
+    __slots__ = ("seconds", "samples", "packets", "bytes", "span")
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self.packets = 0.0
+        self.bytes = 0.0
+        self.span = 0.0
+
+    def add(self, now, interval, packets, byte_count):
+        self.samples.append((now, interval, packets, byte_count))
+        self.packets += packets
+        self.bytes += byte_count
+        self.span += interval
+        self.expire(now)
+
+    def expire(self, now):
+        cutoff = now - self.seconds
+        samples = self.samples
+        while samples and samples[0][0] <= cutoff:
+            _, interval, packets, byte_count = samples.popleft()
+            self.packets -= packets
+            self.bytes -= byte_count
+            self.span -= interval
+
+    def summary(self):
+        packets = max(0.0, self.packets)
+        byte_count = max(0.0, self.bytes)
+        span = self.span if self.samples else 0.0
+        return {
+            "packets": round(packets),
+            "bytes": round(byte_count),
+            "pps": round(packets / span, 2) if span > 0 else 0.0,
+            "bps": round(byte_count * 8 / span, 1) if span > 0 else 0.0,
+            "span": round(span, 1),
+        }
 
-def analyze_traffic_changes():
+
+class HostAggregate:
+    __slots__ = ("port", "windows", "last_sample")
+
+    def __init__(self, windows):
+        self.port = None
+        self.windows = [SlidingWindow(seconds) for seconds in windows]
+        self.last_sample = 0.0
+
+
+class StreamingAnalyzer:
+    """Per-host sliding window aggregates fed from controller snapshots"""
+
+    def __init__(self, client, windows=DEFAULT_WINDOWS, interval=2.0, roles=None,
+                 strategy=attribution.DEFAULT_STRATEGY):
+        self.client = client
+        self.strategy = strategy
+        self.windows = tuple(sorted(windows))
+        self.labels = [window_label(seconds) for seconds in self.windows]
+        self.interval = interval
+        self.roles = roles or {}
+        self.engine = CounterRateEngine(
+            counters=PortCounters._fields, expected_interval=interval
+        )
+        # Rebuilt with every device refresh, the only time attachments change
+        self.plan = None
+        self.hosts = {}
+        self.samples = 0
+        self.events = 0
+
+    def poll(self):
+        """Take one snapshot and add one sample per host; False if no controller answered"""
+        snapshot = self.client.snapshot()
+        if not snapshot.shards:
+            return False
+
+        if self.plan is None or snapshot.device_age == 0:
+            self.plan = attribution.build_plan(self.client, snapshot, self.strategy)
+        plan = self.plan
+
+        # Only the ports the plan attributes to hosts need rates
+        port_counters = {
+            port_key: snapshot.ports[port_key]
+            for port_key in plan.claimed
+            if port_key in snapshot.ports
+        }
+        port_rates = self.engine.update(port_counters, snapshot.time, snapshot.switch_epochs)
+        host_rates = plan.host_rates(port_rates)
+
+        now = snapshot.time
+        for ip in plan.host_ports:
+            host = self.hosts.get(ip)
+            if host is None:
+                host = self.hosts[ip] = HostAggregate(self.windows)
+            host.port = plan.primary[ip]
+            host_rate = host_rates.get(ip)
+            if host_rate is None:
+                continue
+            if host_rate.rates is None:
+                self.events += 1
+                continue
+            packets_per_second, bytes_per_second = host_rate.rates
+            for window in host.windows:
+                window.add(now, host_rate.interval,
+                           packets_per_second * host_rate.interval,
+                           bytes_per_second * host_rate.interval)
+            host.last_sample = now
+            self.samples += 1
+        return True
+
+    def report(self, now=None):
+        now = now or time.time()
+        hosts = {}
+        totals = {label: {"packets": 0, "bytes": 0} for label in self.labels}
+        active = 0
+        for ip in sorted(self.hosts, key=lambda ip: tuple(int(part) for part in ip.split("."))):
+            host = self.hosts[ip]
+            windows = {}
+            for label, window in zip(self.labels, host.windows):
+                window.expire(now)
+                windows[label] = window.summary()
+                totals[label]["packets"] += windows[label]["packets"]
+                totals[label]["bytes"] += windows[label]["bytes"]
+            # Active: sent anything within the shortest window
+            state = "active" if windows[self.labels[0]]["packets"] > 0 else "idle"
+            active += state == "active"
+            hosts[ip] = {
+                "port": host.port,
+                "role": self.roles.get(ip, "unknown"),
+                "state": state,
+                "windows": windows,
+            }
+        return {
+            "time": round(now, 3),
+            "interval": self.interval,
+            "attribution": self.strategy,
+            "active_hosts": active,
+            "hosts": hosts,
+            "totals": totals,
+            "samples": self.samples,
+            "rebaselines": self.events,
+        }
+
+
+def print_text_report(report, labels):
+    stamp = time.strftime("%H:%M:%S", time.localtime(report["time"]))
+    print(f"=== {stamp}: {report['active_hosts']}/{len(report['hosts'])} hosts active ===")
+    print(f"{'Host':<15} {'Role':<9} " + " ".join(f"{label + ' pkt/s':>12}" for label in labels))
+    for ip, host in report["hosts"].items():
+        icon = "🔥" if host["state"] == "active" else "💤"
+        rates = " ".join(f"{host['windows'][label]['pps']:>12,.1f}" for label in labels)
+        print(f"{ip:<15} {host['role']:<9} {rates} {icon}")
+    print(flush=True)
+
+
+def stream_analysis(args):
+    windows = [int(seconds) for seconds in args.windows.split(",")]
+    analyzer = StreamingAnalyzer(client, windows, args.interval, policy.ip_to_role(),
+                                 args.strategy or attribution.configured_strategy())
+    next_poll = time.monotonic()
+    next_report = next_poll + args.report
+    while True:
+        try:
+            if not analyzer.poll():
+                print("[Analysis] No controller responded", file=sys.stderr)
+        except requests.exceptions.RequestException as e:
+            print(f"[Analysis] Connection error: {e}", file=sys.stderr)
+
+        now = time.monotonic()
+        if now >= next_report:
+            report = analyzer.report()
+            if args.text:
+                print_text_report(report, analyzer.labels)
+            else:
+                print(json.dumps(report), flush=True)
+            next_report += args.report * max(1, int((now - next_report) // args.report) + 1)
+
+        next_poll += args.interval
+        if next_poll < time.monotonic():
+            # Skip polls that are already late instead of bunching them up
+            next_poll = time.monotonic()
+        time.sleep(max(0.0, next_poll - time.monotonic()))
+
+
+def analyze_traffic_changes(strategy):
     """Compare traffic before and after to see which devices are actually active"""
     
-    print("=== Traffic Analysis ===")
+    print(f"=== Traffic Analysis (attribution: {strategy}) ===")
     print("Taking baseline measurement...")
     
-    baseline = get_traffic_snapshot()
+    baseline = get_traffic_snapshot(strategy)
     if not baseline:
         print("Failed to get baseline traffic")
         return
@@ -98,7 +254,7 @@ def analyze_traffic_changes():
     print("\nWaiting 10 seconds for new traffic...")
     time.sleep(10)
     
-    current = get_traffic_snapshot()
+    current = get_traffic_snapshot(strategy)
     if not current:
         print("Failed to get current traffic")
         return
@@ -133,9 +289,29 @@ def analyze_traffic_changes():
     active_hosts = [c for c in changes if c['packet_delta'] > 0]
     print(f"Summary: {len(active_hosts)} hosts with new traffic out of {len(changes)} total")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-host traffic analysis over sliding windows")
+    parser.add_argument("--windows", default=",".join(str(w) for w in DEFAULT_WINDOWS),
+                        help="comma separated window lengths in seconds")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between reports")
+    parser.add_argument("--text", action="store_true", help="print a table instead of JSON lines")
+    parser.add_argument("--strategy", choices=sorted(attribution.STRATEGIES),
+                        help="attribution strategy (default: monitoring.attribution in data.json)")
+    parser.add_argument("--compare", action="store_true",
+                        help="one baseline vs +10s comparison, then exit")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        analyze_traffic_changes()
+        if args.compare:
+            analyze_traffic_changes(args.strategy or attribution.configured_strategy())
+        else:
+            stream_analysis(args)
+    except KeyboardInterrupt:
+        pass
     except requests.exceptions.RequestException as e:
         print(f"Connection error: {e}")
     except Exception as e:
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Multi-protocol traffic mix for the DAC ACLs.
+
+Reads the protocols and roles from data.json and the host roles from
+users.json, pairs every client host with a server host for each protocol
+and runs all flows at once across the Mininet hosts:
+  * one mock_services.py process per server host (in --confirm mode)
+    listens on every protocol port
+  * one `agent` process per client host runs all of that host's flows
+    concurrently (rate messages/s of size bytes for duration seconds)
+Each flow ends up delivered (the server confirms the bytes it got),
+blocked (connection attempt timed out: dropped by an ACL), reset (cut off
+after connecting, e.g. by an ACL installed mid-flow) or refused (allowed,
+but nothing listening). Delivered and refused count as allowed, blocked and
+reset as denied. The report compares that with what the role and time
+policies expect, per protocol and per role, and lists every mismatch.
+
+dac_app.py also blocks every host that goes over its traffic thresholds,
+and the mix itself can push a host there. The controllers' ACL rules are
+read before and after the run: flows touching a host blocked beforehand are
+expected to be denied, and flows of a host blocked during the run are
+reported but not scored, since their outcome depends on when the block
+landed. Hosts whose flows add up to more than a threshold within one
+monitoring interval (rate x duration) are named before the run starts.
+
+Run from a root terminal while topology.py is up (not in the Mininet CLI):
+    sudo python3 traffic_mix.py --rate 20 --size 1024 --duration 10
+    sudo python3 traffic_mix.py --protocols SSH,HTTP --clients 50 --json mix.json
+    sudo python3 traffic_mix.py --scenario scenario.json
+A scenario file is a list of flows:
+    [{"client": "h1", "server": "h4", "protocol": "SSH",
+      "rate": 50, "size": 512, "duration": 5}, ...]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import policy
+from mock_services import DELIVERED
+from snapshot_client import SnapshotClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sdn_utils import hosts as mn_hosts
+
+
+MOCK_SERVICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_services.py")
+
+# Defaults, overridable from data.json "traffic_mix"
+DEFAULT_MIX = {
+    "rate": 10,
+    "size": 512,
+    "duration": 10,
+    "connect_timeout": 2,
+}
+
+# ---------------------------------------------------------------- client side
+
+async def run_flow(flow, connect_timeout):
+    result = dict(flow, status="blocked", sent=0, delivered=0, connect_ms=None)
+    start = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(flow["server_ip"], flow["port"]), connect_timeout)
+    except asyncio.TimeoutError:
+        return result
+    except ConnectionRefusedError:
+        result["status"] = "refused"
+        return result
+    except OSError as e:
+        result["status"] = f"error: {e.strerror or e}"
+        return result
+    result["connect_ms"] = (time.monotonic() - start) * 1000
+
+    message = b"x" * flow["size"]
+    interval = 1.0 / flow["rate"] if flow["rate"] > 0 else 0
+    deadline = time.monotonic() + flow["duration"]
+    next_send = time.monotonic()
+    try:
+        while time.monotonic() < deadline:
+            writer.write(message)
+            await writer.drain()
+            result["sent"] += len(message)
+            next_send += interval
+            delay = min(next_send, deadline) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        writer.write_eof()
+        reply = await asyncio.wait_for(reader.readexactly(DELIVERED.size),
+                                       connect_timeout + 5)
+        result["delivered"], = DELIVERED.unpack(reply)
+        result["status"] = "delivered"
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        # Connected, then cut off (e.g. an ACL installed mid-flow)
+        result["status"] = "reset"
+    finally:
+        writer.close()
+    return result
+
+
+async def run_agent(flows, connect_timeout):
+    return await asyncio.gather(*(run_flow(flow, connect_timeout) for flow in flows))
+
+
+# ---------------------------------------------------------------- orchestration
+
+def build_flows(names, protocols, args, mix):
+    """Client/server pairs: every client once per protocol, servers rotating"""
+    rng = random.Random(args.seed)
+    clients = names if not args.clients else sorted(
+        rng.sample(names, min(args.clients, len(names))), key=mn_hosts.host_order)
+    flows = []
+    for p_idx, protocol in enumerate(protocols):
+        for client in clients:
+            offset = 1 + (names.index(client) + p_idx) % (len(names) - 1)
+            server = names[(names.index(client) + offset) % len(names)]
+            flows.append({"client": client, "server": server, "protocol": protocol,
+                          "rate": mix["rate"], "size": mix["size"],
+                          "duration": mix["duration"]})
+    return flows
+
+
+def load_scenario(path, mix):
+    with open(path, "r") as f:
+        flows = json.load(f)
+    return [dict({key: mix[key] for key in ("rate", "size", "duration")}, **flow)
+            for flow in flows]
+
+
+def start_servers(ports_by_server, host_pids):
+    """One mock_services.py per server host; returns once all are listening"""
+    procs = {}
+    for server in ports_by_server:
+        ports = ",".join(str(port) for port in sorted(ports_by_server[server]))
+        procs[server] = subprocess.Popen(
+            mn_hosts.host_command(host_pids[server],
+                                  [sys.executable, MOCK_SERVICES, "--confirm",
+                                   "--ports", ports]),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+    for server, proc in procs.items():
+        for line in proc.stdout:
+            if line.startswith("[MockServices] Listening"):
+                break
+            if "Cannot listen" in line:
+                print(f"[TrafficMix] {server}: {line.strip()[15:]} "
+                      f"(stop mock_services.py on that host first)")
+        else:
+            print(f"[TrafficMix] Server on {server} failed: {proc.stderr.read().strip()}")
+    return procs
+
+
+def run_agents(flows_by_client, host_pids, connect_timeout):
+    # Every flow runs at the same time: one agent per client host
+    outputs = mn_hosts.run_in_hosts(
+        host_pids,
+        [sys.executable, os.path.abspath(__file__), "agent", "--connect-timeout", connect_timeout],
+        flows_by_client)
+    results = []
+    for client, (output, error) in outputs.items():
+        if error is not None:
+            print(f"[TrafficMix] Agent on {client} failed: {error}")
+            output = [dict(flow, status="error", sent=0, delivered=0, connect_ms=None)
+                      for flow in flows_by_client[client]]
+        results.extend(output)
+    return results
+
+
+def fetch_threshold_blocks():
+    """IPs dac_app.py has blocked for traffic thresholds, or None if no controller answered"""
+    client = SnapshotClient()
+    try:
+        replies = [client.get_json(shard_url, "/wm/acl/rules/json") for shard_url in client.shards]
+    finally:
+        client.close()
+    rules = [rule for reply in replies if isinstance(reply, list) for rule in reply]
+    if all(reply is None for reply in replies):
+        return None
+    return policy.threshold_blocks(rules)
+
+
+def threshold_risks(flows, config):
+    """{host: reason} for hosts the mix may push over dac_app's thresholds
+
+    dac_app measures rates over check_interval_seconds, so a flow adds at
+    most rate x min(duration, interval) messages to one interval. Every
+    message is at least one packet from the client and one ACK back.
+    """
+    monitoring = config.get("monitoring", {})
+    thresholds = monitoring.get("traffic_thresholds", {})
+    interval = monitoring.get("check_interval_seconds", 30)
+    packets = {}
+    sent_bytes = {}
+    for flow in flows:
+        messages = flow["rate"] * min(flow["duration"], interval)
+        for host in (flow["client"], flow["server"]):
+            packets[host] = packets.get(host, 0) + messages
+        sent_bytes[flow["client"]] = sent_bytes.get(flow["client"], 0) + messages * flow["size"]
+
+    risks = {}
+    for host, count in packets.items():
+        packets_per_minute = count * 60 / interval
+        bytes_per_minute = sent_bytes.get(host, 0) * 60 / interval
+        if packets_per_minute > thresholds.get("packets_per_minute", 10000):
+            risks[host] = f"~{packets_per_minute:,.0f} packets/min"
+        elif bytes_per_minute > thresholds.get("bytes_per_minute", 10485760):
+            risks[host] = f"~{bytes_per_minute:,.0f} bytes/min"
+    return risks
+
+
+def summarize(results, config, hour, blocked_before=(), blocked_during=()):
+    """Per protocol and per role counts, plus the flows that broke policy
+
+    blocked_before/blocked_during are threshold-blocked IPs (see
+    fetch_threshold_blocks()); flows touching a host blocked during the run
+    get expected "either" and never count as mismatches.
+    """
+    rows = {}
+    mismatches = []
+    for result in results:
+        allowed, reason = policy.expected_allowed(config, result["role"], result["protocol"], hour)
+        ends = (result["client_ip"], result["server_ip"])
+        blocked = [ip for ip in ends if ip in blocked_before]
+        if blocked:
+            allowed, reason = False, f"{blocked[0]} blocked by dac_app (traffic threshold)"
+        scored = blocked or not any(ip in blocked_during for ip in ends)
+        if not scored:
+            reason = "blocked by dac_app during the run (traffic threshold)"
+        reached = result["status"] in ("delivered", "refused")
+        result["expected"] = ("allow" if allowed else "deny") if scored else "either"
+        result["reason"] = reason
+        mismatch = scored and reached != allowed
+        if mismatch:
+            mismatches.append(result)
+        for key in (("protocol", result["protocol"]), ("role", result["role"] or "-")):
+            row = rows.setdefault(key, {"flows": 0, "delivered": 0, "blocked": 0,
+                                        "other": 0, "expected_deny": 0, "mismatch": 0,
+                                        "sent": 0, "bytes": 0, "connect_ms": []})
+            row["flows"] += 1
+            status = result["status"] if result["status"] in ("delivered", "blocked") else "other"
+            row[status] += 1
+            row["expected_deny"] += not allowed
+            row["mismatch"] += mismatch
+            row["sent"] += result["sent"]
+            row["bytes"] += result["delivered"]
+            if result["connect_ms"] is not None:
+                row["connect_ms"].append(result["connect_ms"])
+    return rows, mismatches
+
+
+def print_report(rows, mismatches, elapsed, hour):
+    print("\n" + "=" * 96)
+    print(f"Traffic mix: {sum(r['flows'] for k, r in rows.items() if k[0] == 'protocol')} flows "
+          f"in {elapsed:.1f}s (policy hour {hour:02d}:00)")
+    print("=" * 96)
+    print(f"{'':<16} {'Flows':>6} {'Delivered':>10} {'Blocked':>8} {'Other':>6} "
+          f"{'Exp.deny':>9} {'Mismatch':>9} {'Delivered MB':>13} {'Connect p50':>12}")
+    for kind in ("protocol", "role"):
+        print("-" * 96)
+        for (row_kind, name), row in sorted(rows.items()):
+            if row_kind != kind:
+                continue
+            connects = sorted(row["connect_ms"])
+            p50 = f"{connects[len(connects) // 2]:.1f}ms" if connects else "-"
+            print(f"{kind[0].upper()}:{name:<14} {row['flows']:>6} {row['delivered']:>10} "
+                  f"{row['blocked']:>8} {row['other']:>6} {row['expected_deny']:>9} "
+                  f"{row['mismatch']:>9} {row['bytes'] / 1e6:>13.2f} {p50:>12}")
+    print("=" * 96)
+    policy.print_mismatches(
+        mismatches, "flow",
+        lambda result: (f"{result['client']} ({result['role'] or '-'}) -> {result['server']} "
+                        f"{result['protocol']}:{result['port']}: {result['status']}, "
+                        f"expected {result['expected']} ({result['reason']})"),
+        f"{len(mismatches)} flows did not match the expected policy:")
+
+
+def run_mix(args):
+    config = policy.load_config()
+    mix = dict(DEFAULT_MIX, **config.get("traffic_mix", {}))
+    for key in ("rate", "size", "duration", "connect_timeout"):
+        if getattr(args, key) is not None:
+            mix[key] = getattr(args, key)
+
+    host_pids = mn_hosts.find_hosts()
+    if len(host_pids) < 2:
+        print("[TrafficMix] No running Mininet hosts found; start topology.py first")
+        return 1
+    names = sorted(host_pids, key=mn_hosts.host_order)
+    ips = mn_hosts.host_ips(host_pids)
+    roles = policy.ip_to_role()
+
+    protocols = args.protocols.split(",") if args.protocols else policy.tcp_protocols(config)
+    flows = load_scenario(args.scenario, mix) if args.scenario else build_flows(
+        names, protocols, args, mix)
+
+    ports_by_server = {}
+    flows_by_client = {}
+    for idx, flow in enumerate(flows):
+        flow["id"] = idx
+        flow["port"] = int(config["protocols"][flow["protocol"]]["port"])
+        flow["server_ip"] = ips[flow["server"]]
+        flow["client_ip"] = ips[flow["client"]]
+        flow["role"] = roles.get(ips[flow["client"]])
+        ports_by_server.setdefault(flow["server"], set()).add(flow["port"])
+        flows_by_client.setdefault(flow["client"], []).append(flow)
+
+    print(f"[TrafficMix] {len(flows)} flows from {len(flows_by_client)} clients to "
+          f"{len(ports_by_server)} servers ({', '.join(sorted({f['protocol'] for f in flows}))})")
+
+    for host, estimate in sorted(threshold_risks(flows, config).items(),
+                                 key=lambda item: mn_hosts.host_order(item[0])):
+        print(f"[TrafficMix] {host} ({ips[host]}) will see {estimate}, over dac_app's "
+              f"threshold: it may be blocked mid-run (lower --rate or --duration)")
+
+    blocked_before = fetch_threshold_blocks()
+    if blocked_before is None:
+        print("[TrafficMix] No controller answered /wm/acl/rules/json; "
+              "threshold blocks are not taken into account")
+    elif blocked_before:
+        print(f"[TrafficMix] Already blocked by dac_app: {', '.join(sorted(blocked_before))}")
+
+    hour = policy.policy_hour(config)
+    servers = start_servers(ports_by_server, host_pids)
+    start = time.time()
+    try:
+        results = run_agents(flows_by_client, host_pids, mix["connect_timeout"])
+    finally:
+        for proc in servers.values():
+            proc.kill()
+    elapsed = time.time() - start
+
+    blocked_after = fetch_threshold_blocks()
+    blocked_during = (blocked_after or set()) - (blocked_before or set())
+    if blocked_during:
+        print(f"[TrafficMix] Blocked by dac_app during the run: {', '.join(sorted(blocked_during))} "
+              f"(their flows are not scored)")
+
+    rows, mismatches = summarize(results, config, hour, blocked_before or set(), blocked_during)
+    print_report(rows, mismatches, elapsed, hour)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(sorted(results, key=lambda r: r["id"]), f, indent=2)
+        print(f"Per-flow results written to {args.json}")
+    return 1 if mismatches else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Multi-protocol traffic mix for the DAC ACLs")
+    sub = parser.add_subparsers(dest="command")
+
+    agent_parser = sub.add_parser("agent", help="(internal) run one host's flows from stdin")
+    agent_parser.add_argument("--connect-timeout", type=float, default=DEFAULT_MIX["connect_timeout"])
+
+    parser.add_argument("--protocols", help="comma separated names from data.json (default: all TCP)")
+    parser.add_argument("--clients", type=int, default=0, help="sample this many client hosts")
+    parser.add_argument("--rate", type=float, help="messages per second per flow")
+    parser.add_argument("--size", type=int, help="bytes per message")
+    parser.add_argument("--duration", type=float, help="seconds per flow")
+    parser.add_argument("--connect-timeout", type=float, help="seconds before a flow counts as blocked")
+    parser.add_argument("--scenario", help="JSON list of explicit flows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write per-flow results here")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "agent":
+        flows = json.load(sys.stdin)
+        print(json.dumps(asyncio.run(run_agent(flows, args.connect_timeout))))
+    else:
+        sys.exit(run_mix(args))
@@ -1,70 +1,35 @@
+import os
+import sys
+
 from mininet.net import Mininet
 from mininet.node import Controller, OVSSwitch, RemoteController
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sdn_utils import flow_compiler, lifecycle
+
+# Output port on each switch for ARP and IP traffic towards a host
+ROUTES = {
+  "s1": {"h1": 1, "h2": 2, "h3": 4, "h4": 3, "h5": 3},
+  "s2": {"h1": 1, "h2": 1, "h3": 2, "h4": 3, "h5": 3},
+  "s3": {"h1": 2, "h2": 2, "h3": 4, "h4": 1, "h5": 3},
+}
+
+# h6 is only reachable from h3, through s2 and s4
+PAIR_ROUTES = {
+  "s2": {("h3", "h6"): 4},
+  "s4": {("h3", "h6"): 3, ("h6", "h3"): 2},
+}
+
+
 def install_flow_rules(net):
-  h1_ip = net.get("h1").IP()
-  h2_ip = net.get("h2").IP()
-  h3_ip = net.get("h3").IP()
-  h4_ip = net.get("h4").IP()
-  h5_ip = net.get("h5").IP()
-  h6_ip = net.get("h6").IP()
-  
-  info(f"h1_ip: {h1_ip}\n")
-  info(f"h2_ip: {h2_ip}\n")
-  info(f"h3_ip: {h3_ip}\n")
-  info(f"h4_ip: {h4_ip}\n")
-  info(f"h5_ip: {h5_ip}\n")
-  info(f"h6_ip: {h6_ip}\n")
-  
-  # For s1:
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 arp,nw_dst={h1_ip},actions=output:1")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 arp,nw_dst={h2_ip},actions=output:2")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 arp,nw_dst={h3_ip},actions=output:4")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 arp,nw_dst={h4_ip},actions=output:3")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 arp,nw_dst={h5_ip},actions=output:3")
-  
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 ip,nw_dst={h1_ip},actions=output:1")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 ip,nw_dst={h2_ip},actions=output:2")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 ip,nw_dst={h3_ip},actions=output:4")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 ip,nw_dst={h4_ip},actions=output:3")
-  net.get("s1").cmd(f"ovs-ofctl add-flow s1 ip,nw_dst={h5_ip},actions=output:3")
-  
-  # For s2:
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 arp,nw_dst={h1_ip},actions=output:1")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 arp,nw_dst={h2_ip},actions=output:1")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 arp,nw_dst={h3_ip},actions=output:2")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 arp,nw_dst={h4_ip},actions=output:3")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 arp,nw_dst={h5_ip},actions=output:3")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 arp,nw_src={h3_ip},nw_dst={h6_ip},actions=output:4")
-  
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 ip,nw_dst={h1_ip},actions=output:1")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 ip,nw_dst={h2_ip},actions=output:1")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 ip,nw_dst={h3_ip},actions=output:2")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 ip,nw_dst={h4_ip},actions=output:3")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 ip,nw_dst={h5_ip},actions=output:3")
-  net.get("s2").cmd(f"ovs-ofctl add-flow s2 ip,nw_src={h3_ip},nw_dst={h6_ip},actions=output:4")
-  
-  # For s3:
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 arp,nw_dst={h1_ip},actions=output:2")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 arp,nw_dst={h2_ip},actions=output:2")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 arp,nw_dst={h3_ip},actions=output:4")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 arp,nw_dst={h4_ip},actions=output:1")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 arp,nw_dst={h5_ip},actions=output:3")
-  
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 ip,nw_dst={h1_ip},actions=output:2")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 ip,nw_dst={h2_ip},actions=output:2")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 ip,nw_dst={h3_ip},actions=output:4")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 ip,nw_dst={h4_ip},actions=output:1")
-  net.get("s3").cmd(f"ovs-ofctl add-flow s3 ip,nw_dst={h5_ip},actions=output:3")
-  
-  # For s4:
-  net.get("s4").cmd(f"ovs-ofctl add-flow s4 arp,nw_dst={h6_ip},actions=output:3")
-  net.get("s4").cmd(f"ovs-ofctl add-flow s4 arp,nw_src={h6_ip},nw_dst={h3_ip},actions=output:2")
-  
-  net.get("s4").cmd(f"ovs-ofctl add-flow s4 ip,nw_src={h3_ip},nw_dst={h6_ip},actions=output:3")
-  net.get("s4").cmd(f"ovs-ofctl add-flow s4 ip,nw_src={h6_ip},nw_dst={h3_ip},actions=output:2")
+  ips = {host.name: host.IP() for host in net.hosts}
+  for name, ip in sorted(ips.items()):
+    info(f"{name}_ip: {ip}\n")
+
+  flows = flow_compiler.compile_flows(ROUTES, PAIR_ROUTES, ips)
+  flow_compiler.push_flows(flows)
   
 
 def topo():
@@ -103,6 +68,7 @@ def topo():
   
   info("Starting network...\n")
   net.start()
+  lifecycle.record(net)
   
   info("Installing flow rules...\n")
   install_flow_rules(net)
@@ -110,7 +76,7 @@ def topo():
   CLI(net)
   
   info("Stopping network...\n")
-  net.stop()
+  lifecycle.fast_stop(net)
 
 if __name__ == "__main__":
   setLogLevel("info")
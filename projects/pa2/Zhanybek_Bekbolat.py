@@ -3,11 +3,18 @@
 # Far as I understand, each block has 3 switches and 2 access points
 # - Not sure if we need to name the controllers with the block numbers specified or just starting from 1 is okay...
 
+import os
+import sys
+
 from mininet.net import Mininet
 from mininet.node import OVSSwitch, RemoteController
 from mininet.cli import CLI
 from mininet.log import setLogLevel, info
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sdn_utils import lifecycle, readiness
+from sdn_utils.ovs_batch import BridgeBatch
+
 
 def topo():
     info("Creating network...\n")
@@ -71,28 +78,25 @@ def topo():
 
     info("Starting network...\n")
     net.start()
+    lifecycle.record(net)
 
     info("Assigning controllers to switches...\n")
     for switch_name, controller_list in controller_map.items():
         switch_objects[switch_name].start(controller_list)
 
     info("Enabling STP on switches to prevent broadcast storms...\n")
-    for switch_name, switch_obj in switch_objects.items():
-        cmd = f"ovs-vsctl set Bridge {switch_name} stp_enable=true"
-        switch_obj.cmd(cmd)
-        info(f"  STP enabled on {switch_name}\n")
+    bridges = BridgeBatch()
+    bridges.set_all(switch_objects, stp=True)
+    bridges.commit()
     
-    import time
-    info("Waiting for STP and controller learning to complete...\n")
-    for i in range(10, 0, -1):
-        info(f"  {i}... ")
-        time.sleep(1)
-    info("\nNetwork should be ready now!\n")
+    info("Waiting for controller connections and STP to converge...\n")
+    readiness.wait_until_ready(net)
+    info("Network should be ready now!\n")
 
     CLI(net)
 
     info("Stopping network...\n")
-    net.stop()
+    lifecycle.fast_stop(net)
 
 
 if __name__ == "__main__":
@@ -14,8 +14,14 @@ echo ""
 
 echo "Cleaning up leftover Mininet controllers..."
 
-# Clean up Mininet state
-sudo mn -c 2>/dev/null || true
+# Clean up Mininet state: only what the last run recorded if it left a
+# manifest (see sdn_utils/lifecycle.py), the full `mn -c` sweep otherwise.
+# Switch links kept by topology.py --keep-links survive; use `cleanup --all`
+# to drop them as well
+PROJECTS_DIR="$(cd "$(dirname "$0")/.." && pwd)"
+if ! (cd "$PROJECTS_DIR" && sudo python3 -m sdn_utils.lifecycle cleanup 2>/dev/null); then
+    sudo mn -c 2>/dev/null || true
+fi
 
 # Kill any ovs-controller processes
 sudo pkill -9 ovs-controller 2>/dev/null || true
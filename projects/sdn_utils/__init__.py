@@ -0,0 +1,7 @@
+"""
+Shared helpers for the Mininet projects in this directory.
+
+Scripts in a project folder import them with:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from sdn_utils import readiness
+"""
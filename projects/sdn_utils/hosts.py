@@ -0,0 +1,98 @@
+"""
+Run commands in Mininet host namespaces from outside the Mininet CLI.
+
+Every Mininet host is a shell whose command line ends in "mininet:<name>"
+and which lives in its own network namespace. find_hosts() locates them in
+/proc, and host_command() wraps a command with `mnexec -a <pid>` so it runs
+in that host's namespaces. Unlike node.cmd(), which serializes on the
+host's single shell, any number of these can run at once, on any number of
+hosts. run_in_hosts() does that for a whole batch: one process per host,
+JSON in on stdin and out on stdout, all hosts in parallel.
+"""
+
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _netns(pid):
+    try:
+        return os.readlink(f"/proc/{pid}/ns/net")
+    except OSError:
+        return None
+
+
+def find_hosts():
+    """{host name: shell pid} for every running Mininet host"""
+    root_ns = _netns(1)
+    hosts = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                args = f.read().split(b"\0")
+        except OSError:
+            continue
+        name = next((arg[8:].decode() for arg in args if arg.startswith(b"mininet:")), None)
+        # Switches are Mininet nodes too, but stay in the root namespace
+        if name and _netns(entry) not in (None, root_ns):
+            hosts.setdefault(name, int(entry))
+    return hosts
+
+
+def host_order(name):
+    """Sort key for host names: h2 before h10"""
+    digits = "".join(ch for ch in name if ch.isdigit())
+    return (int(digits) if digits else 0, name)
+
+
+def host_command(pid, args):
+    """Command list running args inside the namespaces of host shell pid"""
+    return ["mnexec", "-a", str(pid)] + [str(arg) for arg in args]
+
+
+def host_ips(hosts, workers=32):
+    """{host name: first IPv4 address} for hosts from find_hosts()"""
+    def address(item):
+        name, pid = item
+        output = subprocess.run(
+            host_command(pid, ["ip", "-4", "-o", "addr", "show", "scope", "global"]),
+            capture_output=True, text=True,
+        ).stdout
+        for line in output.splitlines():
+            fields = line.split()
+            if "inet" in fields:
+                return name, fields[fields.index("inet") + 1].split("/")[0]
+        return name, None
+
+    if not hosts:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(hosts))) as executor:
+        return {name: ip for name, ip in executor.map(address, hosts.items()) if ip}
+
+
+def run_in_hosts(pids, args, payloads):
+    """Run args in every host of payloads at once, feeding each its payload
+
+    pids is find_hosts()'s {name: pid} and payloads {name: JSON-able input}.
+    Returns {name: (decoded stdout JSON, None)} or, for a host whose process
+    failed, {name: (None, error text)}.
+    """
+    def run(item):
+        name, payload = item
+        proc = subprocess.run(host_command(pids[name], args), input=json.dumps(payload),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return name, (None, proc.stderr.strip()[-200:] or f"exit status {proc.returncode}")
+        try:
+            return name, (json.loads(proc.stdout), None)
+        except ValueError:
+            return name, (None, f"unreadable output: {proc.stdout.strip()[-200:]!r}")
+
+    if not payloads:
+        return {}
+    # One thread per host: every host runs at the same time
+    with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+        return dict(executor.map(run, payloads.items()))
@@ -0,0 +1,230 @@
+"""
+Fast teardown and targeted cleanup for Mininet networks.
+
+fast_stop() replaces net.stop(). Instead of deleting every link, switch and
+host one after another, it:
+  - deletes all OVS bridges in one ovs-vsctl transaction,
+  - signals every node shell at once; a host's namespace disappears with its
+    shell and takes the host-side links with it,
+  - deletes the switch-to-switch veth pairs left in the root namespace with
+    one `ip -batch` run (or keeps them for the next run, keep_links=True),
+  - reaps the node shells in parallel.
+
+record() writes a manifest of what a run created to MANIFEST_DIR, so a
+crashed run can be cleaned up with
+    sudo python3 -m sdn_utils.lifecycle cleanup
+which removes exactly those bridges, interfaces and processes instead of
+sweeping the whole machine like `mn -c`. It exits with status 1 when there
+is no manifest, so scripts can fall back to `mn -c`.
+
+Switch-to-switch links kept with keep_links=True are reused by the next run
+when its plan has the same interface pair (see reusable_links()); anything
+else that was kept is deleted then. cleanup leaves kept links (and their
+manifest entry) alone so it can run between normal runs; `cleanup --all`
+deletes them too. Bridges and host links cannot be carried
+over: Mininet recreates every bridge in its startup transaction and host
+namespaces end with the script.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mininet.log import info, warn, setLogLevel
+
+from sdn_utils.ovs_batch import run_vsctl
+
+
+MANIFEST_DIR = "/tmp/sdn_lifecycle"
+
+
+def manifest_path(name="default"):
+    return os.path.join(MANIFEST_DIR, f"{name}.json")
+
+
+def load_manifest(name="default"):
+    try:
+        with open(manifest_path(name), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest, name="default"):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    with open(manifest_path(name), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def remove_manifest(name="default"):
+    try:
+        os.remove(manifest_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def interface_exists(name):
+    return os.path.exists(f"/sys/class/net/{name}")
+
+
+def root_links(net):
+    """[intf1, intf2] of every link with both ends in the root namespace"""
+    return [
+        [link.intf1.name, link.intf2.name]
+        for link in net.links
+        if not link.intf1.node.inNamespace and not link.intf2.node.inNamespace
+    ]
+
+
+def record(net, name="default"):
+    """Write the manifest of what net created"""
+    manifest = load_manifest(name) or {}
+    manifest.update({
+        "bridges": [switch.name for switch in net.switches],
+        "links": root_links(net),
+        "interfaces": [
+            intf.name
+            for switch in net.switches
+            for intf in switch.intfList()
+            if switch.ports[intf]
+        ],
+        "pids": [node.pid for node in net.hosts + net.switches if node.shell],
+        "kept": [],
+    })
+    save_manifest(manifest, name)
+
+
+def delete_interfaces(names):
+    """Delete root namespace interfaces (and their veth peers) in one run"""
+    names = [name for name in names if interface_exists(name)]
+    if not names:
+        return 0
+    with tempfile.NamedTemporaryFile("w", suffix=".ip") as batch:
+        batch.writelines(f"link del {name}\n" for name in names)
+        batch.flush()
+        # -force: keep going if a peer already took an interface with it
+        subprocess.run(["ip", "-force", "-batch", batch.name],
+                       capture_output=True, text=True)
+    return len(names)
+
+
+def reusable_links(links, name="default"):
+    """Kept [intf1, intf2] pairs that links still needs, and stale ones to delete"""
+    manifest = load_manifest(name) or {}
+    planned = {tuple(link) for link in links}
+    reuse, stale = set(), []
+    for intf1, intf2 in manifest.get("kept", []):
+        if (intf1, intf2) in planned and interface_exists(intf1) and interface_exists(intf2):
+            reuse.add((intf1, intf2))
+        else:
+            stale.append(intf1)
+    return reuse, stale
+
+
+def _is_mininet_shell(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"mininet:" in f.read()
+    except OSError:
+        return False
+
+
+def fast_stop(net, name="default", keep_links=False):
+    """Tear net down in parallel; return the elapsed seconds"""
+    start = time.time()
+    info(f"*** Stopping {len(net.switches)} switches, {len(net.hosts)} hosts "
+         f"and {len(net.links)} links\n")
+    for controller in net.controllers:
+        controller.stop()
+
+    if net.switches:
+        run_vsctl([f"--if-exists del-br {switch.name}" for switch in net.switches])
+
+    nodes = net.hosts + net.switches
+    for node in nodes:
+        node.unmountPrivateDirs()
+        if node.shell and node.shell.poll() is None:
+            os.killpg(node.shell.pid, signal.SIGHUP)
+
+    links = root_links(net)
+    if keep_links:
+        kept = links
+    else:
+        kept = []
+        delete_interfaces([intf1 for intf1, _ in links])
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(executor.map(lambda node: node.cleanup(), nodes))
+
+    if kept:
+        save_manifest({"kept": kept}, name)
+    else:
+        remove_manifest(name)
+    elapsed = time.time() - start
+    info(f"*** Done in {elapsed:.1f}s"
+         + (f" ({len(kept)} switch links kept for the next run)" if kept else "")
+         + "\n")
+    return elapsed
+
+
+def cleanup(name="default", keep_links=True):
+    """Remove what a recorded run left behind; False if there is no manifest
+
+    Links a fast_stop(keep_links=True) kept for the next run stay in place
+    unless keep_links=False.
+    """
+    manifest = load_manifest(name)
+    if manifest is None:
+        return False
+    start = time.time()
+
+    pids = [pid for pid in manifest.get("pids", []) if _is_mininet_shell(pid)]
+    for pid in pids:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    bridges = manifest.get("bridges", [])
+    if bridges:
+        try:
+            run_vsctl([f"--if-exists del-br {bridge}" for bridge in bridges])
+        except subprocess.CalledProcessError as e:
+            warn(f"  Could not delete bridges: {e}\n")
+
+    kept = [link for link in manifest.get("kept", []) if interface_exists(link[0])]
+    interfaces = manifest.get("interfaces", [])
+    interfaces += [intf1 for intf1, _ in manifest.get("links", [])]
+    if not keep_links:
+        interfaces += [intf1 for intf1, _ in kept]
+        kept = []
+    deleted = delete_interfaces(interfaces)
+
+    if kept:
+        save_manifest({"kept": kept}, name)
+    else:
+        remove_manifest(name)
+    info(f"  Removed {len(bridges)} bridges, {deleted} interfaces and "
+         f"{len(pids)} node processes in {time.time() - start:.1f}s"
+         + (f" ({len(kept)} kept switch links left for the next run)" if kept else "")
+         + "\n")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Targeted Mininet cleanup")
+    parser.add_argument("command", choices=["cleanup"])
+    parser.add_argument("--name", default="default", help="manifest name")
+    parser.add_argument("--all", action="store_true",
+                        help="also delete switch links kept for the next run")
+    args = parser.parse_args()
+    setLogLevel("info")
+    if not cleanup(args.name, keep_links=not args.all):
+        info(f"  No manifest at {manifest_path(args.name)}\n")
+        sys.exit(1)
@@ -0,0 +1,125 @@
+"""
+Bulk OVS bridge configuration.
+
+Collect per-bridge settings with BridgeBatch.set() and commit them as one
+`ovs-vsctl -- set Bridge ... -- set Bridge ...` transaction (split only when
+the command line would get too long), instead of one process spawn and one
+OVSDB transaction per switch.
+
+Measure the difference on this machine with:
+    sudo python3 -m sdn_utils.ovs_batch --bridges 100
+"""
+
+import argparse
+import subprocess
+import time
+
+from mininet.log import info, setLogLevel
+
+
+# Stay well below ARG_MAX for one ovs-vsctl command line
+ARG_CHUNK = 100000
+
+# BridgeBatch.set() keyword -> Bridge table column
+BRIDGE_COLUMNS = {
+    "stp": "stp_enable",
+    "rstp": "rstp_enable",
+    "protocols": "protocols",
+    "fail_mode": "fail_mode",
+    "datapath_type": "datapath_type",
+}
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return ",".join(value)
+    return str(value)
+
+
+def run_vsctl(commands):
+    """Run ovs-vsctl commands joined with "--"; return the transaction count"""
+    transactions = 0
+    chunk = []
+    length = 0
+    for command in commands:
+        if chunk and length + len(command) > ARG_CHUNK:
+            subprocess.run(["ovs-vsctl"] + chunk, check=True)
+            transactions += 1
+            chunk, length = [], 0
+        chunk += ["--"] + command.split()
+        length += len(command) + 4
+    if chunk:
+        subprocess.run(["ovs-vsctl"] + chunk, check=True)
+        transactions += 1
+    return transactions
+
+
+class BridgeBatch:
+    """Per-bridge settings committed together"""
+
+    def __init__(self):
+        self.settings = {}
+
+    def set(self, bridge, **settings):
+        """Queue settings for a bridge, e.g. set("s1", stp=True, protocols="OpenFlow13")"""
+        columns = self.settings.setdefault(str(bridge), {})
+        for key, value in settings.items():
+            columns[BRIDGE_COLUMNS.get(key, key)] = _format(value)
+
+    def set_all(self, bridges, **settings):
+        for bridge in bridges:
+            self.set(bridge, **settings)
+
+    def commands(self):
+        return [
+            f"set Bridge {bridge} " + " ".join(f"{column}={value}" for column, value in columns.items())
+            for bridge, columns in self.settings.items()
+            if columns
+        ]
+
+    def commit(self):
+        """Apply everything queued so far; return the elapsed seconds"""
+        commands = self.commands()
+        if not commands:
+            return 0.0
+        start = time.time()
+        transactions = run_vsctl(commands)
+        elapsed = time.time() - start
+        info(f"  Configured {len(commands)} bridges in {elapsed * 1000:.0f}ms "
+             f"({elapsed * 1000 / len(commands):.2f}ms per bridge, "
+             f"{transactions} ovs-vsctl transaction(s))\n")
+        self.settings = {}
+        return elapsed
+
+
+def measure(count=50, prefix="bbench"):
+    """Per-bridge cost of one-by-one vs batched STP configuration"""
+    bridges = [f"{prefix}{i}" for i in range(count)]
+    run_vsctl([f"--may-exist add-br {bridge}" for bridge in bridges])
+    try:
+        start = time.time()
+        for bridge in bridges:
+            subprocess.run(["ovs-vsctl", "set", "Bridge", bridge, "stp_enable=true"],
+                           check=True)
+        sequential = (time.time() - start) / count
+
+        batch = BridgeBatch()
+        batch.set_all(bridges, stp=False)
+        batched = batch.commit() / count
+    finally:
+        run_vsctl([f"--if-exists del-br {bridge}" for bridge in bridges])
+
+    info(f"  one ovs-vsctl per bridge: {sequential * 1000:.2f}ms per bridge\n")
+    info(f"  one batched transaction:  {batched * 1000:.2f}ms per bridge "
+         f"({sequential / batched if batched else float('inf'):.0f}x faster)\n")
+    return {"sequential": sequential, "batched": batched}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure batched bridge configuration")
+    parser.add_argument("--bridges", type=int, default=50)
+    args = parser.parse_args()
+    setLogLevel("info")
+    measure(args.bridges)
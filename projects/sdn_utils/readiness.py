@@ -0,0 +1,209 @@
+"""
+Readiness probing for Mininet networks.
+
+wait_until_ready() takes the place of a fixed sleep after net.start(). It
+polls OVSDB for every switch at once (one ovs-vsctl run per round) until
+each bridge is connected to its controller and, with STP enabled, every STP
+port reports a state other than listening or learning. A switch counts as
+converged once that has held for hold_polls polls in a row, so a poll taken
+before ovs-vswitchd fills in Port.status cannot end the wait. It can then
+check reachability on a sample of host pairs with ping. It returns as soon
+as everything has converged and reports how long each switch took.
+"""
+
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mininet.log import info, warn
+
+
+SETTLING_STP_STATES = ("listening", "learning")
+
+
+def _cell(value):
+    """Decode an OVSDB JSON cell into plain Python values"""
+    if isinstance(value, list) and len(value) == 2:
+        kind, data = value
+        if kind == "uuid":
+            return data
+        if kind == "set":
+            return [_cell(item) for item in data]
+        if kind == "map":
+            return {_cell(k): _cell(v) for k, v in data}
+    return value
+
+
+def _tables(output):
+    """ovs-vsctl --format=json prints one JSON document per list command"""
+    decoder = json.JSONDecoder()
+    tables = []
+    position = 0
+    output = output.strip()
+    while position < len(output):
+        table, position = decoder.raw_decode(output, position)
+        headings = table["headings"]
+        tables.append([
+            {heading: _cell(cell) for heading, cell in zip(headings, row)}
+            for row in table["data"]
+        ])
+        while position < len(output) and output[position].isspace():
+            position += 1
+    return tables
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _runs_stp(port, internal):
+    """ovs-vswitchd leaves STP off on bonds, internal ports and stp-enable=false"""
+    interfaces = _as_list(port["interfaces"])
+    if len(interfaces) != 1 or interfaces[0] in internal:
+        return False
+    return (port["other_config"] or {}).get("stp-enable") != "false"
+
+
+def switch_states():
+    """{bridge: (connected, stp_settled)} for every bridge, from one query
+
+    connected is None for bridges without a controller (standalone or
+    controller-less networks), stp_settled is True when STP is off. A port
+    without an stp_state yet counts as not settled.
+    """
+    output = subprocess.run(
+        ["ovs-vsctl", "--format=json",
+         "--", "--columns=name,controller,ports,stp_enable", "list", "Bridge",
+         "--", "--columns=_uuid,is_connected", "list", "Controller",
+         "--", "--columns=_uuid,status,interfaces,other_config", "list", "Port",
+         "--", "--columns=_uuid,type", "list", "Interface"],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    bridges, controllers, ports, interfaces = _tables(output)
+    connected_by_uuid = {row["_uuid"]: row["is_connected"] is True for row in controllers}
+    internal = {row["_uuid"] for row in interfaces if row["type"] == "internal"}
+    port_by_uuid = {row["_uuid"]: row for row in ports}
+
+    states = {}
+    for bridge in bridges:
+        controller_uuids = _as_list(bridge["controller"])
+        connected = None
+        if controller_uuids:
+            connected = any(connected_by_uuid.get(uuid) for uuid in controller_uuids)
+        settled = True
+        if bridge["stp_enable"] is True:
+            for uuid in _as_list(bridge["ports"]):
+                port = port_by_uuid.get(uuid)
+                if port is None or not _runs_stp(port, internal):
+                    continue
+                state = (port["status"] or {}).get("stp_state")
+                if state is None or state in SETTLING_STP_STATES:
+                    settled = False
+                    break
+        states[bridge["name"]] = (connected, settled)
+    return states
+
+
+def ping_sample(net, pairs=10, seed=0, workers=16):
+    """Ping a random sample of host pairs in parallel; return the failures"""
+    hosts = list(net.hosts)
+    if len(hosts) < 2 or pairs <= 0:
+        return []
+    rng = random.Random(seed)
+    # Distinct sources: a Mininet node runs one command at a time
+    sources = rng.sample(hosts, min(pairs, len(hosts)))
+    sample = []
+    for src in sources:
+        dst = rng.choice(hosts)
+        while dst is src:
+            dst = rng.choice(hosts)
+        sample.append((src, dst))
+
+    def probe(pair):
+        src, dst = pair
+        output = src.cmd(f"ping -c1 -W1 {dst.IP()}")
+        return pair if " 0% packet loss" not in output else None
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(sample))) as executor:
+        return [pair for pair in executor.map(probe, sample) if pair is not None]
+
+
+def wait_until_ready(net=None, switches=None, timeout=120, interval=0.25,
+                     ping_pairs=0, hold_polls=3):
+    """Block until the switches converge; return a readiness report
+
+    switches defaults to the names of net.switches. A switch converges once
+    it has looked ready for hold_polls polls in a row. The report holds
+    "ready", "elapsed", "switches" ({name: seconds until converged, or None})
+    and "ping_failures" (pairs that still failed at the end).
+    """
+    names = switches or [switch.name for switch in net.switches]
+    start = time.time()
+    since = {}
+    streak = {}
+    ready_at = {}
+    states = {}
+
+    while True:
+        now = time.time() - start
+        states = switch_states()
+        for name in names:
+            connected, settled = states.get(name, (False, False))
+            if connected is not False and settled:
+                since.setdefault(name, now)
+                streak[name] = streak.get(name, 0) + 1
+                if streak[name] >= hold_polls:
+                    ready_at[name] = since[name]
+            else:
+                # STP can reopen a port: a switch is ready once it stays so
+                since.pop(name, None)
+                streak.pop(name, None)
+                ready_at.pop(name, None)
+        if len(ready_at) == len(names) or now > timeout:
+            break
+        time.sleep(interval)
+
+    ping_failures = []
+    if ping_pairs and net is not None and len(ready_at) == len(names):
+        while True:
+            ping_failures = ping_sample(net, ping_pairs)
+            if not ping_failures or time.time() - start > timeout:
+                break
+            time.sleep(interval)
+
+    elapsed = time.time() - start
+    report = {
+        "ready": len(ready_at) == len(names) and not ping_failures,
+        "elapsed": elapsed,
+        "switches": {name: ready_at.get(name) for name in names},
+        "ping_failures": [(src.name, dst.name) for src, dst in ping_failures],
+    }
+    print_report(report, states)
+    return report
+
+
+def print_report(report, states=None):
+    times = sorted(t for t in report["switches"].values() if t is not None)
+    if times:
+        info(f"  {len(times)}/{len(report['switches'])} switches converged in "
+             f"{report['elapsed']:.1f}s (median {times[len(times) // 2]:.1f}s, "
+             f"slowest {times[-1]:.1f}s)\n")
+        slowest = sorted(
+            ((t, name) for name, t in report["switches"].items() if t is not None),
+            reverse=True,
+        )[:5]
+        info("  Slowest: " + ", ".join(f"{name}={t:.1f}s" for t, name in slowest) + "\n")
+
+    pending = [name for name, t in report["switches"].items() if t is None]
+    if pending:
+        states = states or {}
+        for name in pending[:10]:
+            connected, settled = states.get(name, (False, False))
+            reason = "not connected" if connected is False else "STP not settled"
+            warn(f"  {name} not ready: {reason}\n")
+        if len(pending) > 10:
+            warn(f"  ... and {len(pending) - 10} more\n")
+    for src, dst in report["ping_failures"]:
+        warn(f"  ping {src} -> {dst} failed\n")
@@ -25,7 +25,9 @@ fi
 
 # Clean up any previous mininet state
 echo "Cleaning up previous mininet state..."
-mn -c >/dev/null 2>&1 || true
+if ! (cd /app/projects 2>/dev/null && python3 -m sdn_utils.lifecycle cleanup >/dev/null 2>&1); then
+    mn -c >/dev/null 2>&1 || true
+fi
 
 echo "Services started successfully!"
 echo ""